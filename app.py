@@ -2,17 +2,37 @@
 """
 Excel to PDF 轉換工具 - GUI 介面
 適用於臺北市政府衛生局統計報表自動化
+
+啟動速度：轉換引擎（pypdf、reportlab、toc_generator）不在啟動時載入，
+視窗顯示後才在背景執行緒預先載入（warm_up），按下「開始轉換」時多半已載入完成
 """
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 import threading
+import multiprocessing
 import os
 import sys
 
-# 匯入主程式
-from excel_to_pdf_with_bookmarks import run
+# 只匯入輕量模組；轉換引擎在 warm_up / do_conversion 才載入
+from export_backends import DEFAULT_BACKEND, get_backend
+from run_trace import Cancelled, CancelToken, ProgressEstimator
+from session_pool import SessionPool
+
+# 視窗顯示後多久開始在背景載入轉換引擎（毫秒）
+WARM_UP_DELAY_MS = 200
+
+
+def warm_up():
+    """背景預先載入轉換引擎與目次字型；失敗不影響（轉換時會再載入並回報錯誤）"""
+    try:
+        import excel_to_pdf_with_bookmarks  # noqa: F401
+        from toc_generator import ensure_fonts
+
+        ensure_fonts()
+    except Exception:
+        pass
 
 
 class ExcelToPdfApp:
@@ -29,8 +49,21 @@ class ExcelToPdfApp:
         self.excel_path = tk.StringVar()
         self.compile_date = tk.StringVar(value="114年11月編製")
         self.is_processing = False
+        self.cancel_token = None
+        self.estimator = None
+        
+        # 常駐的 Excel：開啟程式時就在背景啟動，之後每次轉換直接使用
+        # （一律獨立啟動，不占用使用者自己開著的 Excel）
+        self.session_pool = SessionPool(lambda: get_backend(DEFAULT_BACKEND).for_worker())
+        self.session_pool.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.setup_ui()
+        self.root.after(WARM_UP_DELAY_MS, self.start_warm_up)
+    
+    def start_warm_up(self):
+        """視窗已顯示：在背景載入轉換引擎"""
+        threading.Thread(target=warm_up, daemon=True).start()
     
     def center_window(self):
         """視窗置中"""
@@ -111,9 +144,12 @@ class ExcelToPdfApp:
             fg="gray"
         ).pack(side=tk.LEFT)
         
-        # 轉換按鈕
+        # 轉換 / 取消按鈕
+        button_frame = tk.Frame(content_frame)
+        button_frame.pack(pady=(10, 15))
+        
         self.convert_btn = tk.Button(
-            content_frame,
+            button_frame,
             text="開始轉換",
             command=self.start_conversion,
             font=("Microsoft JhengHei", 12, "bold"),
@@ -123,12 +159,24 @@ class ExcelToPdfApp:
             height=2,
             cursor="hand2"
         )
-        self.convert_btn.pack(pady=(10, 15))
+        self.convert_btn.pack(side=tk.LEFT)
+        
+        self.cancel_btn = tk.Button(
+            button_frame,
+            text="取消",
+            command=self.cancel_conversion,
+            font=("Microsoft JhengHei", 11),
+            width=8,
+            height=2,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=(10, 0))
         
         # 進度條
         self.progress = ttk.Progressbar(
             content_frame,
-            mode='indeterminate',
+            mode='determinate',
+            maximum=100,
             length=400
         )
         self.progress.pack(pady=(0, 10))
@@ -201,8 +249,11 @@ class ExcelToPdfApp:
             return
         
         self.is_processing = True
+        self.cancel_token = CancelToken()
+        self.estimator = ProgressEstimator()
         self.convert_btn.config(state=tk.DISABLED, text="轉換中...")
-        self.progress.start()
+        self.cancel_btn.config(state=tk.NORMAL, text="取消")
+        self.progress["value"] = 0
         self.status_label.config(text="正在處理，請稍候...", fg="blue")
         
         # 在背景執行緒中執行轉換
@@ -215,22 +266,75 @@ class ExcelToPdfApp:
         try:
             excel_path = Path(self.excel_path.get())
             compile_date = self.compile_date.get()
+            cancel_token = self.cancel_token
             
-            # 呼叫主程式的 run 函數
-            output_pdf = run(excel_path, compile_date)
+            # 通常已由 warm_up 載入；尚未載入完成時在這裡等待
+            from excel_to_pdf_with_bookmarks import run
+            
+            # 呼叫主程式的 run 函數（在常駐 Excel 的執行緒中執行）
+            output_pdf = self.session_pool.run(lambda backend: run(
+                excel_path,
+                compile_date,
+                backend=backend,
+                progress=self.report_progress,
+                cancel=cancel_token
+            ))
             
             # 成功
             self.root.after(0, self.conversion_success, output_pdf)
             
+        except Cancelled:
+            self.root.after(0, self.conversion_cancelled)
+            
         except Exception as e:
             # 失敗
             self.root.after(0, self.conversion_error, str(e))
     
-    def conversion_success(self, output_pdf):
-        """轉換成功"""
+    def report_progress(self, event):
+        """進度回呼（背景執行緒）：轉回主執行緒更新畫面"""
+        self.root.after(0, self.update_progress, event)
+    
+    def update_progress(self, event):
+        """更新進度條、百分比與預估剩餘時間"""
+        if not self.is_processing or self.estimator is None:
+            return
+        self.estimator.update(event)
+        percent = self.estimator.fraction * 100
+        self.progress["value"] = percent
+        
+        text = f"{percent:.0f}%  {self.estimator.message}"
+        eta = self.estimator.eta()
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f"｜約剩 {minutes} 分 {seconds} 秒" if minutes else f"｜約剩 {seconds} 秒"
+        self.status_label.config(text=text, fg="blue")
+    
+    def cancel_conversion(self):
+        """取消轉換：目前這張工作表匯出完就停止，並清理 Excel 與暫存檔"""
+        if not self.is_processing or self.cancel_token is None:
+            return
+        self.cancel_token.cancel()
+        self.cancel_btn.config(state=tk.DISABLED, text="取消中...")
+        self.status_label.config(text="正在取消，等待目前的工作表完成...", fg="orange")
+    
+    def finish_processing(self):
+        """恢復按鈕狀態"""
         self.is_processing = False
-        self.progress.stop()
+        self.cancel_token = None
+        self.estimator = None
         self.convert_btn.config(state=tk.NORMAL, text="開始轉換")
+        self.cancel_btn.config(state=tk.DISABLED, text="取消")
+    
+    def conversion_cancelled(self):
+        """已取消"""
+        self.finish_processing()
+        self.progress["value"] = 0
+        self.status_label.config(text="已取消轉換", fg="gray")
+    
+    def conversion_success(self, output_pdf):
+        """轉換成功"""
+        self.finish_processing()
+        self.progress["value"] = 100
         self.status_label.config(
             text=f"轉換完成：{output_pdf.name}",
             fg="green"
@@ -248,11 +352,17 @@ class ExcelToPdfApp:
             except Exception as e:
                 messagebox.showerror("錯誤", f"無法開啟檔案：{e}")
     
+    def on_close(self):
+        """關閉視窗：取消進行中的轉換，並關閉常駐的 Excel"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.session_pool.close(timeout=10)
+        self.root.destroy()
+    
     def conversion_error(self, error_msg):
         """轉換失敗"""
-        self.is_processing = False
-        self.progress.stop()
-        self.convert_btn.config(state=tk.NORMAL, text="開始轉換")
+        self.finish_processing()
+        self.progress["value"] = 0
         self.status_label.config(text="轉換失敗", fg="red")
         
         messagebox.showerror(
@@ -261,11 +371,24 @@ class ExcelToPdfApp:
         )
 
 
+def close_splash():
+    """打包版的啟動畫面（build_exe.spec 的 Splash）在主視窗出現後關閉"""
+    try:
+        import pyi_splash
+    except ImportError:
+        return
+    pyi_splash.close()
+
+
 def main():
     root = tk.Tk()
     app = ExcelToPdfApp(root)
+    root.update_idletasks()
+    close_splash()
     root.mainloop()
 
 
 if __name__ == "__main__":
+    # 打包成 exe 後，平行匯出的子行程需要這行才能正確啟動
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+效能量測（不需 Excel）
+- 產生合成活頁簿：N 張工作表、每張固定列數、長中文標題，
+  並依比例在部分工作表尾端加入「只有框線沒有值」的列（匯出後即為空白頁）
+- 以 SimulatedBackend 替代 Excel 執行 run()，分別計時各階段
+- 另外逐一計時舊版三步驟：merge_pdfs → add_global_page_numbers → apply_bookmarks
+- 結果輸出為 JSON，可用 --compare 與先前的結果比較，找出變慢的階段
+- --startup：量測 GUI 的 import app 時間，並檢查沒有載入轉換引擎等重量級模組
+
+用法：
+    python benchmark.py --sheets 40 --rows 120 --blank-fraction 0.2 --repeat 3 -o bench.json
+    python benchmark.py --compare bench.json
+    python benchmark.py --startup
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 量測時不使用工作表快取，否則第二輪起匯出時間為 0
+os.environ.pop("EXCEL_PDF_CACHE_DIR", None)
+# 記憶體交接 / 管線模式的空白頁清理不經過 remove_blank_pages_from_pdf（管線模式在子行程），
+# 量不到清理時間，匯出時間也扣不掉：一律以預設的逐張清理量測
+os.environ.pop("EXCEL_PDF_IN_MEMORY", None)
+os.environ.pop("EXCEL_PDF_PIPELINE", None)
+
+import excel_to_pdf_with_bookmarks as pipeline
+from export_backends import SimulatedBackend
+
+COMPILE_DATE = "114年11月編製"
+ROWS_PER_PAGE = 40
+
+# run() 內部計時的函式（以包裝函式暫時替換模組屬性）
+RUN_STAGES = ("export_sheets_to_pdfs", "remove_blank_pages_from_pdf",
+              "generate_toc_pdf", "assemble_report")
+
+_DISTRICTS = ["松山區", "信義區", "大安區", "中山區", "中正區", "大同區",
+              "萬華區", "文山區", "南港區", "內湖區", "士林區", "北投區"]
+_TOPICS = ["醫療院所及病床數", "執業醫事人員數", "法定傳染病確定病例數",
+           "十大死因死亡人數及死亡率", "預防接種完成率", "門診及住院醫療費用",
+           "長期照顧服務使用人數", "食品衛生稽查及抽驗結果"]
+
+
+# --------------------------------------------------
+# 合成活頁簿
+# --------------------------------------------------
+
+def make_workbook(path: Path, sheets: int = 20, rows: int = 120, blank_fraction: float = 0.2,
+                  cols: int = 8) -> dict:
+    """
+    產生合成活頁簿
+    rows：每張工作表的資料列數（不含標題列）
+    blank_fraction：空白頁佔匯出總頁數的比例；空白頁以整頁「有框線、無值」的列
+                    附加在工作表尾端，平均分配給各工作表
+    回傳：{"sheets", "content_pages", "blank_pages"}
+    """
+    import openpyxl
+    from openpyxl.styles import Border, Side
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    pages_per_sheet = -(-(rows + 1) // ROWS_PER_PAGE)
+    content_pages = pages_per_sheet * sheets
+    if blank_fraction >= 1:
+        raise ValueError("blank_fraction 必須小於 1")
+    blank_total = round(content_pages * blank_fraction / (1 - blank_fraction))
+
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for n in range(sheets):
+        ws = wb.create_sheet(f"表{n + 1}")
+        district = _DISTRICTS[n % len(_DISTRICTS)]
+        topic = _TOPICS[n % len(_TOPICS)]
+        ws.cell(row=1, column=1,
+                value=f"{n + 1}. 臺北市{district}{topic}按性別、年齡別及月份分（民國113年至114年累計）")
+        for r in range(2, rows + 2):
+            ws.cell(row=r, column=1, value=f"{district}第{r - 1}里")
+            for k in range(2, cols + 1):
+                ws.cell(row=r, column=k, value=(r * 37 + k * 101 + n) % 10000 + 0.5 * (k % 2))
+
+        # 尾端空白頁：資料結束後補到頁尾，再加整頁只有框線的列
+        blanks = blank_total // sheets + (1 if n < blank_total % sheets else 0)
+        if blanks:
+            last = pages_per_sheet * ROWS_PER_PAGE + blanks * ROWS_PER_PAGE
+            for r in range(rows + 2, last + 1):
+                for k in range(1, cols + 1):
+                    ws.cell(row=r, column=k).border = border
+
+    wb.save(str(path))
+    return {"sheets": sheets, "content_pages": content_pages, "blank_pages": blank_total}
+
+
+# --------------------------------------------------
+# 計時
+# --------------------------------------------------
+
+@contextlib.contextmanager
+def timed_stages(module, names, totals: dict):
+    """把 module 上的函式暫時換成計時版本，累計秒數到 totals[name]"""
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(name, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                totals[name] = totals.get(name, 0.0) + time.perf_counter() - t0
+        return timed
+
+    for name, fn in originals.items():
+        setattr(module, name, wrap(name, fn))
+    try:
+        yield totals
+    finally:
+        for name, fn in originals.items():
+            setattr(module, name, fn)
+
+
+def _clock(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def bench_once(xlsx: Path, work_dir: Path, latency: float = 0.0) -> dict:
+    """執行一輪，回傳 {階段: 秒數, ...} 與頁數等統計"""
+    backend = SimulatedBackend(latency=latency, rows_per_page=ROWS_PER_PAGE)
+    stages = {}
+
+    # 1) 透過 run() 執行完整流程（匯出 → 清空白頁 → 目次 → 單次組裝）
+    with timed_stages(pipeline, RUN_STAGES, stages):
+        t0 = time.perf_counter()
+        output_pdf = pipeline.run(xlsx, COMPILE_DATE, backend=backend, workers=1)
+        stages["run_total"] = time.perf_counter() - t0
+    # 匯出時間不含其中的空白頁清理
+    stages["export"] = stages.pop("export_sheets_to_pdfs") - stages["remove_blank_pages_from_pdf"]
+    output_bytes = output_pdf.stat().st_size
+    output_pages = len(pipeline.PdfReader(str(output_pdf)).pages)
+    output_pdf.unlink()
+
+    # 2) 舊版三步驟，逐一計時（工作表 PDF 重新匯出，不計時）
+    sheet_dir = work_dir / "sheets"
+    sheet_dir.mkdir(exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheets = pipeline.export_sheets_to_pdfs(xlsx, sheet_dir, backend=backend, workers=1)
+    toc_pdf = work_dir / "toc.pdf"
+    merged = work_dir / "merged.pdf"
+    pipeline.generate_toc_pdf(toc_pdf, pipeline.build_toc_items(sheets), COMPILE_DATE)
+    front_pages, stages["merge_pdfs"] = _clock(pipeline.merge_pdfs, toc_pdf, sheets, merged)
+    _, stages["add_global_page_numbers"] = _clock(pipeline.add_global_page_numbers, merged, front_pages)
+    _, stages["apply_bookmarks"] = _clock(pipeline.apply_bookmarks, merged, front_pages, sheets)
+
+    return {
+        "stages": stages,
+        "output_pages": output_pages,
+        "output_bytes": output_bytes,
+        "sheet_pages": sum(item["pages"] for item in sheets),
+    }
+
+
+def summarize(runs) -> dict:
+    names = sorted({name for r in runs for name in r["stages"]})
+    out = {}
+    for name in names:
+        values = [r["stages"][name] for r in runs if name in r["stages"]]
+        out[name] = {
+            "min": min(values),
+            "median": statistics.median(values),
+            "mean": statistics.fmean(values),
+        }
+    return out
+
+
+def environment() -> dict:
+    import pypdf
+    import reportlab
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pypdf": pypdf.__version__,
+        "reportlab": reportlab.Version,
+    }
+
+
+def run_benchmark(sheets=20, rows=120, blank_fraction=0.2, repeat=3, latency=0.0,
+                  verbose=False) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        xlsx = tmp / "bench.xlsx"
+        workbook = make_workbook(xlsx, sheets, rows, blank_fraction)
+
+        runs = []
+        for i in range(repeat):
+            work_dir = tmp / f"run{i}"
+            work_dir.mkdir()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(sys.stdout if verbose else out):
+                runs.append(bench_once(xlsx, work_dir, latency))
+
+    return {
+        "params": {"sheets": sheets, "rows": rows, "blank_fraction": blank_fraction,
+                   "repeat": repeat, "latency": latency, "rows_per_page": ROWS_PER_PAGE},
+        "workbook": workbook,
+        "environment": environment(),
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+
+
+# --------------------------------------------------
+# GUI 啟動時間
+# --------------------------------------------------
+
+# import app 時不應載入的模組（轉換引擎、PDF / Excel 相關套件）
+STARTUP_HEAVY_MODULES = ("excel_to_pdf_with_bookmarks", "toc_generator", "pypdf", "reportlab",
+                         "openpyxl", "pikepdf", "win32com", "pythoncom")
+
+# import app 的時間上限（秒，median）
+STARTUP_BUDGET_S = 0.5
+
+# 在乾淨的子行程中量測，避免受本程式已載入的模組影響
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t0
+heavy = sorted(m for m in sys.modules if m.split(".")[0] in {heavy!r})
+print(json.dumps({{"import_s": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_startup(repeat: int = 5) -> dict:
+    """回傳 {"import_s": {...}, "heavy_modules": [...]}；每次都在新的子行程中 import app"""
+    code = _STARTUP_PROBE.format(heavy=set(STARTUP_HEAVY_MODULES))
+    times = []
+    heavy = set()
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True)
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(probe["import_s"])
+        heavy.update(probe["heavy"])
+    return {
+        "import_s": {"median": statistics.median(times), "min": min(times), "max": max(times)},
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def check_startup(result: dict, budget: float = STARTUP_BUDGET_S):
+    """回傳問題清單；空清單表示通過"""
+    problems = []
+    if result["heavy_modules"]:
+        problems.append(f"import app 載入了 {', '.join(result['heavy_modules'])}")
+    if result["import_s"]["median"] > budget:
+        problems.append(f"import app 花了 {result['import_s']['median'] * 1000:.0f} ms，"
+                        f"超過上限 {budget * 1000:.0f} ms")
+    return problems
+
+
+# --------------------------------------------------
+# 比較
+# --------------------------------------------------
+
+def compare(current: dict, baseline: dict, threshold: float = 1.2):
+    """
+    以各階段的 median 比較；比 baseline 慢 threshold 倍以上的階段視為退步
+    回傳：[(階段, baseline 秒數, 目前秒數, 倍數, 是否退步), ...]
+    """
+    rows = []
+    for name, cur in current["summary"].items():
+        base = baseline.get("summary", {}).get(name)
+        if not base:
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] else float("inf")
+        rows.append((name, base["median"], cur["median"], ratio, ratio >= threshold))
+    return rows
+
+
+def print_summary(result: dict, comparison=None):
+    print(f"\n=== 效能量測（{result['environment']['commit'] or '未知版本'}）===")
+    print(f"工作表 {result['workbook']['sheets']} 張，內容 {result['workbook']['content_pages']} 頁，"
+          f"空白 {result['workbook']['blank_pages']} 頁，重複 {result['params']['repeat']} 次")
+    base = {row[0]: row for row in comparison or []}
+    for name, s in result["summary"].items():
+        line = f"{name:<28}{s['median'] * 1000:10.1f} ms"
+        if name in base:
+            _, b, _, ratio, slower = base[name]
+            line += f"   baseline {b * 1000:10.1f} ms  ×{ratio:.2f}{'  ← 變慢' if slower else ''}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成活頁簿效能量測")
+    parser.add_argument("--sheets", type=int, default=20, help="工作表數（預設 20）")
+    parser.add_argument("--rows", type=int, default=120, help="每張工作表資料列數（預設 120）")
+    parser.add_argument("--blank-fraction", type=float, default=0.2,
+                        help="空白頁佔匯出頁數的比例（預設 0.2）")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數（預設 3）")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="模擬每張工作表的 Excel 匯出秒數（預設 0）")
+    parser.add_argument("-o", "--output", help="結果 JSON 檔；未指定則輸出到 stdout")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="比 baseline 慢幾倍以上視為退步（預設 1.2）")
+    parser.add_argument("--verbose", action="store_true", help="顯示流程本身的輸出")
+    parser.add_argument("--startup", action="store_true",
+                        help="改為量測 GUI 啟動（import app），有問題時結束碼為 1")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_S,
+                        help=f"import app 的時間上限秒數（預設 {STARTUP_BUDGET_S}）")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        result = measure_startup(args.repeat)
+        problems = check_startup(result, args.startup_budget)
+        print(f"import app：{result['import_s']['median'] * 1000:.1f} ms（median）")
+        for problem in problems:
+            print(f"[失敗] {problem}")
+        return 1 if problems else 0
+
+    result = run_benchmark(args.sheets, args.rows, args.blank_fraction, args.repeat,
+                           args.latency, args.verbose)
+
+    comparison = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        comparison = compare(result, baseline, args.threshold)
+        result["comparison"] = {
+            "baseline": baseline.get("environment", {}).get("commit"),
+            "threshold": args.threshold,
+            "stages": {name: {"baseline": b, "current": c, "ratio": r, "regressed": bad}
+                       for name, b, c, r, bad in comparison},
+        }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        print_summary(result, comparison)
+    else:
+        print(text)
+
+    if comparison and any(row[4] for row in comparison):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
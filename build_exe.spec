@@ -12,6 +12,19 @@ a = Analysis(
     binaries=[],
     datas=[
         ('excel_to_pdf_with_bookmarks.py', '.'),
+        ('export_backends.py', '.'),
+        ('export_watchdog.py', '.'),
+        ('folder_watch.py', '.'),
+        ('sheet_cache.py', '.'),
+        ('cache_paths.py', '.'),
+        ('xlsx_titles.py', '.'),
+        ('page_plan.py', '.'),
+        ('text_index.py', '.'),
+        ('pdf_stream_writer.py', '.'),
+        ('pdf_spool.py', '.'),
+        ('pdf_linearize.py', '.'),
+        ('run_trace.py', '.'),
+        ('session_pool.py', '.'),
         ('toc_generator.py', '.'),
         ('cover.png', '.'),
         ('additionalinfo.png', '.'),
@@ -25,6 +38,7 @@ a = Analysis(
         'reportlab.lib',
         'reportlab.pdfbase',
         'reportlab.pdfbase.ttfonts',
+        'reportlab.pdfbase.cidfonts',
         'reportlab.lib.pagesizes',
         'reportlab.lib.utils',
         'reportlab.lib.colors',
@@ -41,8 +55,20 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# 啟動畫面：單一執行檔解壓縮期間就先顯示，主視窗出現後由 app.close_splash 關閉
+splash = Splash(
+    'cover.png',
+    binaries=a.binaries,
+    datas=a.datas,
+    text_pos=None,
+    minify_script=True,
+    always_on_top=False,
+)
+
 exe = EXE(
     pyz,
+    splash,
+    splash.binaries,
     a.scripts,
     a.binaries,
     a.zipfiles,
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+本機資料目錄（字型 / 範本快取、工作表快取、轉檔服務佇列共用）
+- Windows：%LOCALAPPDATA%\\health_stats_pdf
+- 其他：~/.cache/health_stats_pdf
+只用標準函式庫，GUI 啟動時 import 也不會拖慢
+"""
+
+import os
+from pathlib import Path
+
+APP_DIR_NAME = "health_stats_pdf"
+
+
+def cache_base() -> Path:
+    """Windows：%LOCALAPPDATA%；其他：~/.cache；其下的 health_stats_pdf 目錄（不建立）"""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / APP_DIR_NAME
@@ -5,80 +5,384 @@ Excel 多工作表 → PDF（舊版 CLI 穩定版）
 - 目次/書籤標題抓取：改為「抓每個分頁第一列，第一個非空白值」
 - 匯出失敗的工作表略過，不影響流程
 - 頁碼先疊加（會重寫 PDF），書籤最後加入（不會消失）
+- 合併、頁碼、書籤改為同一個 PdfWriter 一次寫出（assemble_report）
+- 工作表匯出改由 export_backends 的後端處理（Excel COM 或直接讀 .xlsx）
 """
 
+import os
 import re
 import tempfile
+import time
 from pathlib import Path
 
-import win32com.client as win32
 from pypdf import PdfReader, PdfWriter
-
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+)
+
+from export_watchdog import ExportWatchdog, SheetTimeout
+from page_plan import can_plan, predict_page_counts
+from pdf_linearize import linearize_pdf
+from pdf_spool import PdfSpool, pdf_size, pdf_source
+from pdf_stream_writer import StreamingPdfWriter
+from run_trace import Cancelled, CancelToken, Tracer, print_report, report_path_for, write_report
+from export_backends import (
+    DEFAULT_BACKEND,
+    clean_title,
+    get_backend,
+    get_title_from_first_row,
+    is_blank,
+)
+from sheet_cache import SheetCache
+from text_index import build_entries, index_path_for, write_index
+from xlsx_titles import read_sheet_titles
 from toc_generator import generate_toc_pdf
 
 
-# --------------------------------------------------
-# 工具
-# --------------------------------------------------
+# 平行匯出的行程數（每個行程各自一個 Excel / 後端），1 = 不平行
+# 可用環境變數 EXCEL_PDF_WORKERS 設定
+EXPORT_WORKERS = int(os.environ.get("EXCEL_PDF_WORKERS", "1"))
 
-def clean_title(text) -> str:
-    """去掉前置編號，例如 '1. xxx' -> 'xxx'"""
-    if not text:
-        return ""
-    return re.sub(r"^\s*\d+[\.\、\s]*", "", str(text)).strip()
+# 管線模式：Excel 匯出下一張的同時，由幾個行程清理已匯出工作表的空白頁；0 = 不使用
+# 可用環境變數 EXCEL_PDF_PIPELINE 設定（只在 EXPORT_WORKERS = 1 時有效）
+PIPELINE_WORKERS = int(os.environ.get("EXCEL_PDF_PIPELINE", "0"))
 
+# 匯出看門狗：每張工作表最多幾秒（0 = 不限），逾時就強制終止 Excel、重新啟動後重試
+# EXCEL_PDF_SHEET_RETRIES 次，仍失敗則略過；EXCEL_PDF_RUN_DEADLINE 為整個匯出階段的秒數上限
+SHEET_TIMEOUT_S = float(os.environ.get("EXCEL_PDF_SHEET_TIMEOUT", "300"))
+SHEET_RETRIES = int(os.environ.get("EXCEL_PDF_SHEET_RETRIES", "1"))
+RUN_DEADLINE_S = float(os.environ.get("EXCEL_PDF_RUN_DEADLINE", "0"))
 
-def is_blank(v) -> bool:
-    if v is None:
-        return True
-    s = str(v).strip()
-    return s == ""
+# 工作表 PDF 快取目錄（跨次執行保留）；未設定則不使用快取
+# 可用環境變數 EXCEL_PDF_CACHE_DIR 設定，容量上限 EXCEL_PDF_CACHE_MB
+SHEET_CACHE_DIR = os.environ.get("EXCEL_PDF_CACHE_DIR", "")
+SHEET_CACHE_MAX_BYTES = int(os.environ.get("EXCEL_PDF_CACHE_MB", "2048")) * 1024 * 1024
+
+# 記憶體內交接：清理好的工作表 PDF 與目次以記憶體緩衝區傳給下一個階段，
+# 只有最後的輸出 PDF 寫入磁碟；緩衝區合計超過 EXCEL_PDF_SPOOL_MB（預設 256）後改寫暫存檔
+# 以環境變數 EXCEL_PDF_IN_MEMORY=1 啟用
+IN_MEMORY_HANDOFF = os.environ.get("EXCEL_PDF_IN_MEMORY", "0") == "1"
+SPOOL_BUDGET_BYTES = int(os.environ.get("EXCEL_PDF_SPOOL_MB", "256")) * 1024 * 1024
 
+# 線性化（Fast Web View）輸出：瀏覽器可先顯示封面、目次與書籤，不必等整份下載完
+# 需要 pikepdf 或 qpdf；以環境變數 EXCEL_PDF_LINEARIZE=1 啟用
+LINEARIZE_OUTPUT = os.environ.get("EXCEL_PDF_LINEARIZE", "0") == "1"
 
-def get_title_from_first_row(ws, max_cols=80) -> str:
+# 全文索引：空白頁清理時保留各頁文字，在輸出 PDF 旁寫出 xxx_merged.search.db（SQLite FTS5），
+# 可用 text_index.search 跨報表查詢；每頁都要完整擷取文字，以環境變數 EXCEL_PDF_TEXT_INDEX=1 啟用
+TEXT_INDEX = os.environ.get("EXCEL_PDF_TEXT_INDEX", "0") == "1"
+
+# 執行紀錄（各階段耗時，JSON）寫在輸出 PDF 旁：xxx_merged.run.json
+# EXCEL_PDF_RUN_REPORT=0 不寫出；EXCEL_PDF_TRACE_PRINT=1 另在終端機顯示摘要
+RUN_REPORT = os.environ.get("EXCEL_PDF_RUN_REPORT", "1") != "0"
+TRACE_PRINT = os.environ.get("EXCEL_PDF_TRACE_PRINT", "0") == "1"
+
+
+# --------------------------------------------------
+# Excel → 工作表 PDF
+# --------------------------------------------------
+
+def _sheet_cache_key(cache, backend, ws):
+    """快取鍵：工作表指紋 + 後端名稱 / 版本 + 空白頁門檻；不支援指紋時回傳 None"""
+    if cache is None:
+        return None
+    try:
+        fingerprint = backend.sheet_fingerprint(ws)
+    except Exception:
+        return None
+    if fingerprint is None:
+        return None
+    return cache.make_key(fingerprint, backend.name, backend.version, BLANK_TEXT_THRESHOLD)
+
+
+def _clean_sheet(pdf_path: Path, sheet_name: str, tracer, in_memory: bool = False,
+                 index_text: bool = False) -> tuple:
     """
-    依規則：抓「第一列」從左到右掃描，第一個非空白儲存格的值做為表頭
-    若第一列找不到，再退回使用 A1 或 sheet name
+    空白頁清理（記一筆 remove_blank）
+    in_memory=True：讀入匯出檔後即刪除，清理結果留在記憶體（不覆寫檔案）
+    index_text=True：保留各頁擷取的文字（全文索引用）
+    回傳：(清理後的 PDF：路徑或 bytes, 實際頁數, 移除的頁數, 各頁文字或 None)
     """
-    # 1) 掃第一列 1..max_cols
+    texts = [] if index_text else None
+    with tracer.stage("remove_blank", sheet=sheet_name) as rec:
+        if in_memory:
+            data = pdf_path.read_bytes()
+            pdf_path.unlink()
+            pdf, actual_pages, removed = remove_blank_pages_from_bytes(data, sheet_name, texts=texts)
+            rec["bytes_buffered"] = len(pdf)
+        else:
+            actual_pages, removed = remove_blank_pages_from_pdf(pdf_path, sheet_name, texts=texts)
+            pdf = pdf_path
+            rec["bytes_written"] = pdf_path.stat().st_size if removed else 0
+        rec["pages_in"] = actual_pages + removed
+        rec["pages_out"] = actual_pages
+        if texts is not None:
+            rec["text_chars"] = sum(len(t) for t in texts)
+    return pdf, actual_pages, removed, texts
+
+
+def _clean_sheet_worker(pdf_path: Path, sheet_name: str, in_memory: bool = False,
+                        index_text: bool = False) -> tuple:
+    """管線模式的子行程進入點；執行紀錄隨結果一併回傳"""
+    tracer = Tracer()
+    pdf, actual_pages, removed, texts = _clean_sheet(pdf_path, sheet_name, tracer, in_memory,
+                                                     index_text)
+    return pdf, actual_pages, removed, texts, tracer.records
+
+
+def _export_workbook_sheets(backend, excel_path: Path, temp_dir: Path,
+                            worker_index: int = 0, workers: int = 1, cache=None, titles=None,
+                            tracer=None, post_pool=None, max_pending: int = 4, spool=None,
+                            watchdog=None, index_text: bool = False):
+    """
+    以已啟動的 backend 匯出活頁簿中第 idx 張（idx % workers == worker_index）工作表
+    titles：{工作表名稱: 標題}，有的話就不必再向後端讀取
+    tracer：每張工作表的匯出 / 空白頁清理各記一筆；每張工作表開始前檢查取消，
+            結束後送出 sheet 進度事件
+    post_pool：管線模式；匯出完的工作表 PDF 交給這個行程池做空白頁清理，
+               同時繼續匯出下一張。等待中的工作表超過 max_pending 張時，
+               先收回最早的一張（依序收回，結果順序不變）
+    spool：pdf_spool.PdfSpool；有的話清理好的工作表 PDF 存入記憶體緩衝區，
+           item["pdf"] 為緩衝區而非路徑，匯出的暫存檔讀入後即刪除
+    watchdog：export_watchdog.ExportWatchdog；每張工作表的匯出受其時限保護，
+              逾時則重新啟動後端、重新開啟活頁簿後重試；整體時限到期後其餘工作表略過
+    index_text：空白頁清理時保留各頁文字，item["text"] 為保留頁的文字 list（全文索引用）
+    回傳：([(idx, item), ...], 移除的空白頁數)
+    """
+    from collections import deque
+
+    if tracer is None:
+        tracer = Tracer()
+    results = []
+    total_blank_removed = 0
+    pending = deque()  # 管線模式：(idx, event, title, pdf_path, cache_key, future)
+
+    def done(idx, event, title, pdf, cache_key, actual_pages, removed, texts):
+        nonlocal total_blank_removed
+        total_blank_removed += removed
+        sheet_name = event["sheet"]
+        if isinstance(pdf, bytes):
+            pdf = spool.store(pdf)
+
+        item = {
+            "sheet": sheet_name,
+            "title": title,
+            "pdf": pdf,
+            "pages": actual_pages  # 使用移除空白頁後的實際頁數
+        }
+        if texts is not None:
+            item["text"] = texts
+        results.append((idx, item))
+
+        if cache_key:
+            cache.put(cache_key, pdf, title, actual_pages, texts)
+
+        print(f"[OK] {sheet_name} → {actual_pages} 頁 | 標題：{title}")
+        tracer.emit({**event, "status": "ok", "pages": actual_pages})
+
+    def collect(entry):
+        idx, event, title, pdf_path, cache_key, fut = entry
+        try:
+            pdf, actual_pages, removed, texts, records = fut.result()
+        except Exception as e:
+            print(f"[略過] {event['sheet']} 空白頁清理失敗：{e}")
+            tracer.emit({**event, "status": "skip", "pages": 0})
+            return
+        tracer.extend(records)
+        done(idx, event, title, pdf, cache_key, actual_pages, removed, texts)
+
+    def restart():
+        """看門狗終止後端後：重新啟動、重新開啟活頁簿（舊的工作表物件已失效）"""
+        nonlocal wb, all_sheets
+        try:
+            backend.stop()
+        except Exception:
+            pass
+        backend.start()
+        wb = backend.open_workbook(excel_path)
+        all_sheets = backend.iter_sheets(wb)
+
+    def export_guarded(idx, sheet_name, pdf_path):
+        if watchdog is None:
+            backend.export_sheet(all_sheets[idx], pdf_path)
+            return
+        for attempt in range(watchdog.retries + 1):
+            try:
+                with watchdog.guard(backend, sheet_name):
+                    backend.export_sheet(all_sheets[idx], pdf_path)
+                return
+            except SheetTimeout as e:
+                if not e.killed:
+                    # 後端無法終止（例如使用者自己開啟的 Excel）：不重新啟動，略過該工作表
+                    print(f"[逾時] {e}，後端無法終止，不重試")
+                    raise
+                last = attempt == watchdog.retries or watchdog.expired()
+                retry = "" if last else f" 後重試（第 {attempt + 1} 次）"
+                print(f"[逾時] {e}，重新啟動 Excel{retry}")
+                with tracer.stage("backend_restart", sheet=sheet_name, attempt=attempt + 1):
+                    restart()
+                if last:
+                    raise
+
+    wb = backend.open_workbook(excel_path)
     try:
-        row1 = ws.Range(ws.Cells(1, 1), ws.Cells(1, max_cols)).Value
-        # row1 可能是 tuple(tuple(...)) 或 tuple(...)
-        if row1:
-            # 轉成一維
-            if isinstance(row1, tuple) and len(row1) == 1 and isinstance(row1[0], tuple):
-                vals = list(row1[0])
-            elif isinstance(row1, tuple):
-                vals = list(row1)
+        all_sheets = backend.iter_sheets(wb)
+        total = len(all_sheets)
+        for idx in range(total):
+            if idx % workers != worker_index:
+                continue
+            tracer.check()
+
+            ws = all_sheets[idx]
+            sheet_name = backend.sheet_name(ws)
+            event = {"type": "sheet", "sheet": sheet_name, "index": idx, "total": total}
+
+            if watchdog is not None and watchdog.expired():
+                print(f"[略過] {sheet_name} 已超過整體匯出時限")
+                tracer.emit({**event, "status": "skip", "pages": 0})
+                continue
+
+            safe_name = re.sub(r'[\\/:*?"<>|]', "_", sheet_name)
+            pdf_path = temp_dir / f"{excel_path.stem}_{safe_name}.pdf"
+
+            # 快取：內容沒變的工作表直接沿用上次清理好的 PDF
+            cache_key = _sheet_cache_key(cache, backend, ws)
+            hit = None
+            if cache_key:
+                with tracer.stage("cache_get", sheet=sheet_name) as rec:
+                    if spool is not None:
+                        got = cache.get_bytes(cache_key)
+                        hit = got[1] if got else None
+                        pdf = spool.store(got[0]) if got else None
+                    else:
+                        hit = cache.get(cache_key, pdf_path)
+                        pdf = pdf_path
+                    rec["hit"] = bool(hit)
+                    if hit:
+                        rec["pages_out"] = hit["pages"]
+                        rec["bytes_written"] = pdf_size(pdf)
+            if hit:
+                item = {
+                    "sheet": sheet_name,
+                    "title": hit["title"],
+                    "pdf": pdf,
+                    "pages": hit["pages"]
+                }
+                if index_text:
+                    item["text"] = hit.get("text")
+                    if item["text"] is None:
+                        # 開啟全文索引前存入的快取：補擷取一次並寫回
+                        item["text"] = extract_page_texts(pdf)
+                        cache.put(cache_key, pdf, hit["title"], hit["pages"], item["text"])
+                results.append((idx, item))
+                print(f"[快取] {sheet_name} → {hit['pages']} 頁 | 標題：{hit['title']}")
+                tracer.emit({**event, "status": "cache", "pages": hit["pages"]})
+                continue
+
+            # ★ 修正：從第一列抓第一個非空白值當表頭
+            if titles is not None and sheet_name in titles:
+                title = titles[sheet_name] or sheet_name
             else:
-                vals = [row1]
+                title = backend.get_title(ws) or sheet_name
 
-            for v in vals:
-                if not is_blank(v):
-                    t = clean_title(v)
-                    if t:
-                        return t
-    except Exception:
-        pass
+            try:
+                with tracer.stage("export_sheet", sheet=sheet_name) as rec:
+                    export_guarded(idx, sheet_name, pdf_path)
+                    rec["bytes_written"] = pdf_path.stat().st_size
+
+                # ★ 重要：先移除空白頁，再計算實際頁數
+                in_memory = spool is not None
+                if post_pool is not None:
+                    fut = post_pool.submit(_clean_sheet_worker, pdf_path, sheet_name, in_memory,
+                                           index_text)
+                    pending.append((idx, event, title, pdf_path, cache_key, fut))
+                    while len(pending) > max_pending:
+                        collect(pending.popleft())
+                    continue
+
+                pdf, actual_pages, removed, texts = _clean_sheet(pdf_path, sheet_name, tracer,
+                                                                 in_memory, index_text)
+                done(idx, event, title, pdf, cache_key, actual_pages, removed, texts)
+
+            except Cancelled:
+                raise
+            except Exception as e:
+                print(f"[略過] {sheet_name} 匯出失敗：{e}")
+                tracer.emit({**event, "status": "skip", "pages": 0})
+
+        while pending:
+            collect(pending.popleft())
+    finally:
+        for entry in pending:
+            entry[-1].cancel()
+        backend.close_workbook(wb)
 
-    # 2) fallback：A1
+    # 快取命中的工作表不經管線，可能先於前面的工作表完成 → 依原順序排列
+    results.sort(key=lambda pair: pair[0])
+    return results, total_blank_removed
+
+
+def _export_worker(backend, excel_path: Path, temp_dir: Path, worker_index: int, workers: int,
+                   cache=None, titles=None, progress_queue=None, cancel=None, watchdog=None,
+                   index_text: bool = False):
+    """
+    子行程進入點：自行啟動 / 關閉後端；執行紀錄隨結果一併回傳
+    progress_queue：進度事件放入此佇列，由主行程轉交 progress 回呼
+    cancel：跨行程的 CancelToken（Manager().Event()）
+    """
+    tracer = Tracer(progress=progress_queue.put if progress_queue is not None else None,
+                    cancel=cancel)
+    with tracer.stage("backend_start", worker=worker_index):
+        backend.start()
     try:
-        v = ws.Range("A1").Value
-        t = clean_title(v)
-        if t:
-            return t
-    except Exception:
-        pass
+        part, removed = _export_workbook_sheets(backend, excel_path, temp_dir, worker_index,
+                                                workers, cache, titles, tracer, watchdog=watchdog,
+                                                index_text=index_text)
+        return part, removed, tracer.records
+    finally:
+        backend.stop()
 
-    return ""
 
+def read_titles(excel_path: Path):
+    """
+    直接從 .xlsx / .xlsm 讀出所有工作表標題（不經過 COM）
+    其他格式或讀取失敗時回傳 None，改由後端逐張讀取
+    """
+    if excel_path.suffix.lower() not in (".xlsx", ".xlsm"):
+        return None
+    try:
+        return read_sheet_titles(excel_path)
+    except Exception as e:
+        print(f"[info] 無法直接讀取標題，改由匯出後端讀取：{e}")
+        return None
 
-# --------------------------------------------------
-# Excel → 工作表 PDF
-# --------------------------------------------------
 
-def export_sheets_to_pdfs(excel_path: Path, temp_dir: Path):
+def export_sheets_to_pdfs(excel_path: Path, temp_dir: Path, backend=None, workers: int = None,
+                          cache=None, titles=None, tracer=None, pipeline: int = None, spool=None,
+                          watchdog=None, index_text: bool = False):
     """
+    backend：後端名稱、類別或實例（見 export_backends.get_backend），None → DEFAULT_BACKEND
+             傳入實例時由呼叫端負責 start / stop
+    workers：平行匯出的行程數，None → EXPORT_WORKERS
+             > 1 時工作表依序輪流分給各行程，每個行程各自啟動一個後端
+             （backend.for_worker()），結果依原工作表順序合併
+    cache：SheetCache；None → 依 SHEET_CACHE_DIR 設定（未設定則不使用快取）
+           內容指紋相同的工作表直接取用快取，不重新匯出與清理
+    titles：{工作表名稱: 標題}；None → 以 read_titles 直接從檔案讀取
+    tracer：run_trace.Tracer；整體（export）與每張工作表各記一筆，
+            平行匯出時子行程的紀錄也會併入
+    pipeline：空白頁清理的行程數，None → PIPELINE_WORKERS；> 0 時匯出與清理同時進行
+              （總時間約為兩者中較長的一個，而非相加）；workers > 1 時不使用
+    spool：pdf_spool.PdfSpool；有的話清理好的工作表 PDF 留在記憶體，item["pdf"] 為緩衝區
+           （workers > 1 時各子行程仍寫入暫存目錄，item["pdf"] 為路徑）
+    watchdog：export_watchdog.ExportWatchdog；None → 依 SHEET_TIMEOUT_S / SHEET_RETRIES /
+              RUN_DEADLINE_S 建立（整體時限從此時起算；SHEET_TIMEOUT_S 與 RUN_DEADLINE_S 皆為 0 則不使用）
+    index_text：空白頁清理時保留各頁文字（item["text"]），供 build_report 寫出全文索引
+
     回傳：
     [
         {
@@ -90,51 +394,107 @@ def export_sheets_to_pdfs(excel_path: Path, temp_dir: Path):
         ...
     ]
     """
-    excel = win32.Dispatch("Excel.Application")
-    excel.Visible = False
-    excel.DisplayAlerts = False
-
-    wb = excel.Workbooks.Open(str(excel_path))
-    results = []
-    total_blank_removed = 0  # 統計總共移除的空白頁
-
-    try:
-        for ws in wb.Worksheets:
-            sheet_name = ws.Name
-
-            # ★ 修正：從第一列抓第一個非空白值當表頭
-            title = get_title_from_first_row(ws) or sheet_name
-
-            safe_name = re.sub(r'[\\/:*?"<>|]', "_", sheet_name)
-            pdf_path = temp_dir / f"{excel_path.stem}_{safe_name}.pdf"
+    workers = EXPORT_WORKERS if workers is None else workers
+    pipeline = PIPELINE_WORKERS if pipeline is None else pipeline
+    if tracer is None:
+        tracer = Tracer()
+    if watchdog is None and (SHEET_TIMEOUT_S or RUN_DEADLINE_S):
+        watchdog = ExportWatchdog(SHEET_TIMEOUT_S, SHEET_RETRIES, RUN_DEADLINE_S)
+    with tracer.stage("export", workers=workers, pipeline=pipeline) as rec:
+        results = _export_sheets(excel_path, temp_dir, backend, workers, cache, titles, tracer,
+                                 pipeline, spool, watchdog, index_text)
+        rec["sheets"] = len(results)
+        rec["pages_out"] = sum(item["pages"] for item in results)
+        rec["bytes_written"] = sum(pdf_size(item["pdf"]) for item in results)
+    return results
 
-            try:
-                ws.ExportAsFixedFormat(
-                    Type=0,  # xlTypePDF
-                    Filename=str(pdf_path),
-                    OpenAfterPublish=False
-                )
 
-                # ★ 重要：先移除空白頁，再計算實際頁數
-                actual_pages, removed = remove_blank_pages_from_pdf(pdf_path, sheet_name)
+def _mp_context():
+    """
+    子行程一律以 spawn 啟動（同 Windows；Linux 預設為 fork）：
+    目次規劃等背景執行緒持有鎖時 fork，子行程會卡在同一個鎖上
+    """
+    import multiprocessing
+
+    return multiprocessing.get_context("spawn")
+
+
+def _export_sheets(excel_path: Path, temp_dir: Path, backend, workers: int, cache, titles, tracer,
+                   pipeline: int = 0, spool=None, watchdog=None, index_text: bool = False):
+    """export_sheets_to_pdfs 的本體（整體計時由呼叫端負責）"""
+    if cache is None and SHEET_CACHE_DIR:
+        cache = SheetCache(SHEET_CACHE_DIR, SHEET_CACHE_MAX_BYTES)
+    if titles is None:
+        with tracer.stage("read_titles"):
+            titles = read_titles(excel_path)
+    owns_backend = backend is None or isinstance(backend, (str, type))
+    backend = get_backend(DEFAULT_BACKEND if backend is None else backend)
+    if owns_backend and watchdog is not None:
+        # 逾時須能強制終止：改用自己啟動的實例（com → DispatchEx，不連到使用者的 Excel）
+        backend = backend.for_worker()
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor, wait
+        from contextlib import ExitStack
+
+        indexed = []
+        total_blank_removed = 0
+        with ExitStack() as stack:
+            # 有進度回呼或可取消時，才需要跨行程的佇列 / 事件
+            queue = child_cancel = None
+            if tracer.progress is not None or tracer.cancel is not None:
+                manager = stack.enter_context(_mp_context().Manager())
+                queue = manager.Queue() if tracer.progress is not None else None
+                child_cancel = CancelToken(manager.Event()) if tracer.cancel is not None else None
+
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers,
+                                                           mp_context=_mp_context()))
+            futures = [
+                pool.submit(_export_worker, backend.for_worker(), excel_path, temp_dir, k, workers,
+                            cache, titles, queue, child_cancel, watchdog, index_text)
+                for k in range(workers)
+            ]
+
+            def drain():
+                while queue is not None and not queue.empty():
+                    tracer.emit(queue.get())
+
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.2)
+                drain()
+                if child_cancel is not None and tracer.cancelled:
+                    child_cancel.cancel()  # 子行程在下一張工作表前停止，並關閉各自的後端
+            drain()
+
+            for fut in futures:
+                part, removed, records = fut.result()
+                indexed.extend(part)
                 total_blank_removed += removed
+                tracer.extend(records)
+        indexed.sort(key=lambda pair: pair[0])
+    else:
+        post_pool = None
+        if pipeline > 0:
+            from concurrent.futures import ProcessPoolExecutor
+
+            post_pool = ProcessPoolExecutor(max_workers=pipeline, mp_context=_mp_context())
+        with tracer.stage("backend_start"):
+            backend.start()
+        try:
+            indexed, total_blank_removed = _export_workbook_sheets(
+                backend, excel_path, temp_dir, cache=cache, titles=titles, tracer=tracer,
+                post_pool=post_pool, max_pending=2 * pipeline, spool=spool, watchdog=watchdog,
+                index_text=index_text,
+            )
+        finally:
+            if post_pool is not None:
+                post_pool.shutdown(wait=True, cancel_futures=True)
+            if owns_backend:
+                backend.stop()
+
+    results = [item for _, item in indexed]
 
-                results.append({
-                    "sheet": sheet_name,
-                    "title": title,
-                    "pdf": pdf_path,
-                    "pages": actual_pages  # 使用移除空白頁後的實際頁數
-                })
-
-                print(f"[OK] {sheet_name} → {actual_pages} 頁 | 標題：{title}")
-
-            except Exception as e:
-                print(f"[略過] {sheet_name} 匯出失敗：{e}")
-
-    finally:
-        wb.Close(False)
-        excel.Quit()
-    
     # 顯示統計
     if total_blank_removed > 0:
         print(f"\n[✓] 總共移除 {total_blank_removed} 個空白頁")
@@ -146,51 +506,290 @@ def export_sheets_to_pdfs(excel_path: Path, temp_dir: Path):
 # 空白頁檢測
 # --------------------------------------------------
 
-def is_blank_page(page) -> bool:
+# 判斷標準：文字內容少於 BLANK_TEXT_THRESHOLD 個字元即視為空白頁
+# 判斷策略：
+#   "fast"  ─ 先掃描內容串流的運算子，只有無法確定時才做完整文字擷取（預設）
+#   "exact" ─ 每頁都做完整文字擷取（舊版行為）
+BLANK_TEXT_THRESHOLD = 10
+BLANK_PAGE_STRATEGY = "fast"
+
+_TEXT_SHOW_OPS = {b"Tj", b"TJ", b"'", b'"'}
+
+# 內容串流的 token：註解、字典括號、16 進位字串、名稱、其他（數字 / 運算子）
+# 字面字串 ( ... ) 可巢狀，另外處理
+_CONTENT_TOKEN_RE = re.compile(
+    rb"%[^\r\n]*|<<|>>|<[0-9A-Fa-f\s]*>|/[^\s/\[\]()<>{}%]*|[\[\]{}]|[^\s/\[\]()<>{}%]+|\("
+)
+_LITERAL_STRING_RE = re.compile(rb"\\(?:[0-7]{1,3}|\r\n|.)|[()]", re.S)
+_INLINE_IMAGE_END_RE = re.compile(rb"\sEI(?=[\s]|$)")
+
+# PDF 的空白字元（NUL、TAB、LF、FF、CR、空格）；只顯示這些字元的文字擷取後會被 strip 掉
+_PDF_WHITESPACE = b"\x00\t\n\x0c\r "
+_STRING_ESCAPES = {b"n": 0x0A, b"r": 0x0D, b"t": 0x09, b"b": 0x08, b"f": 0x0C}
+
+
+def _nonblank_bytes(chunk: bytes) -> int:
+    return len(chunk.translate(None, _PDF_WHITESPACE))
+
+
+def _skip_literal_string(data: bytes, pos: int):
+    """pos 指向 '(' 之後；回傳 (字串結束位置, 字串中非空白字元的位元組數)"""
+    depth = 1
+    count = 0
+    last = pos
+    for m in _LITERAL_STRING_RE.finditer(data, pos):
+        count += _nonblank_bytes(data[last:m.start()])
+        last = m.end()
+        tok = m.group()
+        if tok == b"(":
+            depth += 1
+            count += 1
+        elif tok == b")":
+            depth -= 1
+            if depth == 0:
+                return m.end(), count
+            count += 1
+        elif tok[1:2] in (b"\r", b"\n"):
+            continue  # 行接續，不產生位元組
+        else:
+            esc = tok[1:]
+            if esc[:1].isdigit():
+                value = int(esc, 8) & 0xFF
+            else:
+                value = _STRING_ESCAPES.get(esc, esc[0])
+            if value not in _PDF_WHITESPACE:
+                count += 1
+    return len(data), count + _nonblank_bytes(data[last:])
+
+
+def scan_content_stream(data: bytes) -> dict:
+    """
+    只做 token 掃描（不建立物件、不解字型），統計：
+    - text_ops：文字輸出運算子（Tj / TJ / ' / "）數量
+    - text_bytes：文字輸出運算子所帶字串中，非空白字元（見 _PDF_WHITESPACE）的位元組數
+    - xobjects：Do 繪製的 XObject 名稱
+    - ops：運算子總數
+    """
+    text_ops = 0
+    text_bytes = 0
+    pending_bytes = 0
+    xobjects = []
+    last_name = None
+    ops = 0
+
+    pos = 0
+    n = len(data)
+    while pos < n:
+        m = _CONTENT_TOKEN_RE.search(data, pos)
+        if not m:
+            break
+        tok = m.group()
+        pos = m.end()
+        c = tok[:1]
+
+        if c == b"(":
+            pos, length = _skip_literal_string(data, pos)
+            pending_bytes += length
+        elif c == b"<" and tok != b"<<":
+            digits = re.sub(rb"\s", b"", tok[1:-1])
+            if len(digits) % 2:
+                digits += b"0"
+            pending_bytes += _nonblank_bytes(bytes.fromhex(digits.decode("ascii")))
+        elif c == b"/":
+            last_name = tok
+        elif c == b"%" or tok in (b"<<", b">>", b"[", b"]", b"{", b"}"):
+            continue
+        elif c.isalpha() or c in (b"'", b'"'):
+            ops += 1
+            if tok in _TEXT_SHOW_OPS:
+                text_ops += 1
+                text_bytes += pending_bytes
+            elif tok == b"Do" and last_name is not None:
+                xobjects.append(last_name.decode("latin-1"))
+            elif tok == b"ID":
+                # 內嵌影像資料為二進位，直接跳到 EI
+                e = _INLINE_IMAGE_END_RE.search(data, pos)
+                pos = e.end() if e else n
+            pending_bytes = 0
+            last_name = None
+        # 數字：保留 pending 狀態，繼續掃描
+
+    return {
+        "ops": ops,
+        "text_ops": text_ops,
+        "text_bytes": text_bytes,
+        "xobjects": xobjects,
+    }
+
+
+def _draws_non_image_xobject(page, names) -> bool:
+    """Do 繪製的若全是影像，則不會產生文字；Form XObject 則可能含文字"""
+    if not names:
+        return False
+    resources = page.get("/Resources")
+    xobjs = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjs is None:
+        return True
+    xobjs = xobjs.get_object()
+    for name in names:
+        xobj = xobjs.get(name)
+        if xobj is None or xobj.get_object().get("/Subtype") != "/Image":
+            return True
+    return False
+
+
+# 1 位元組 = 1 字、空白只有 _PDF_WHITESPACE 的編碼
+_STANDARD_ENCODINGS = {"/WinAnsiEncoding", "/MacRomanEncoding", "/StandardEncoding"}
+
+
+def _uses_simple_fonts_only(page) -> bool:
+    """
+    頁面字型全為標準編碼的單位元組字型（Type1 / TrueType，無 /Differences、無 /ToUnicode）
+    Type0 / CID 字型（例如 UniCNS-UCS2-H 的全形空格 0x30 0x00、Identity-H 的空格字形）
+    與自訂編碼的字型，非空白位元組不代表非空白字
+    """
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources is not None else None
+    if fonts is None:
+        return False
+    for font in fonts.get_object().values():
+        font = font.get_object()
+        if font.get("/Subtype") not in ("/Type1", "/TrueType") or "/ToUnicode" in font:
+            return False
+        encoding = font.get("/Encoding")
+        if encoding is not None and str(encoding.get_object()) not in _STANDARD_ENCODINGS:
+            return False  # 編碼字典（/Differences）或其他名稱
+    return True
+
+
+def _is_blank_by_text(page, threshold: int) -> bool:
+    text = page.extract_text() or ""
+    return len(text.strip()) < threshold
+
+
+def is_blank_page(page, threshold: int = None, strategy: str = None) -> bool:
     """
     檢測 PDF 頁面是否為空白
-    判斷標準：文字內容少於 10 個字元
+    判斷標準：文字內容少於 threshold（預設 10）個字元
+
+    fast 策略與 exact 的判斷一致：
+    - 沒有任何文字輸出運算子，也沒有繪製 Form XObject → 擷取結果必為空字串 → 空白
+    - 字型全為標準編碼的單位元組字型（見 _uses_simple_fonts_only），且文字輸出的字串中
+      非空白位元組數 ≥ 2 × threshold → strip 後仍至少 threshold 個字 → 非空白
+      （只顯示空格的頁面不會走這條捷徑，改做完整擷取，與 exact 一致）
+    - 其餘（少量文字、Form XObject、Type0 / CID 等多位元組或自訂編碼字型）→ 退回完整文字擷取
     """
+    threshold = BLANK_TEXT_THRESHOLD if threshold is None else threshold
+    strategy = strategy or BLANK_PAGE_STRATEGY
+
+    if strategy not in ("fast", "exact"):
+        raise ValueError(f"未知的空白頁判斷策略：{strategy}")
+
     try:
-        text = page.extract_text() or ""
-        text = text.strip()
-        
-        if len(text) < 10:
+        if strategy == "exact":
+            return _is_blank_by_text(page, threshold)
+
+        contents = page.get_contents()
+        data = contents.get_data() if contents is not None else b""
+        stats = scan_content_stream(data)
+
+        has_form = _draws_non_image_xobject(page, stats["xobjects"])
+        if stats["text_ops"] == 0 and not has_form:
             return True
-        
-        return False
+        if (not has_form and stats["text_bytes"] >= 2 * threshold
+                and _uses_simple_fonts_only(page)):
+            return False
+
+        return _is_blank_by_text(page, threshold)
     except Exception:
         return False
 
 
-def remove_blank_pages_from_pdf(pdf_path: Path, sheet_name: str) -> tuple:
+def _page_text(page):
+    """完整文字擷取；失敗回傳 None（同 is_blank_page，視為非空白）"""
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return None
+
+
+def extract_page_texts(pdf) -> list:
+    """各頁文字；pdf 可為路徑或緩衝區（快取中沒有文字的舊項目用）"""
+    return [_page_text(page) or "" for page in PdfReader(pdf_source(pdf)).pages]
+
+
+def _drop_blank_pages(reader, sheet_name: str, threshold: int = None, strategy: str = None,
+                      texts=None):
     """
-    從單一 PDF 檔案中移除空白頁
-    回傳：(實際頁數, 移除的頁數)
+    回傳 (只含非空白頁的 PdfWriter, 原頁數, 移除的頁數)
+    texts：list；有的話每頁做一次完整文字擷取，同一份文字用來判斷空白頁（同 exact 策略）
+           並依序存入保留頁的文字（全文索引用），不必另外再擷取一次
     """
-    reader = PdfReader(str(pdf_path))
     writer = PdfWriter()
+    threshold = BLANK_TEXT_THRESHOLD if threshold is None else threshold
     
     original_count = len(reader.pages)
     removed_count = 0
     
     for page_num, page in enumerate(reader.pages, start=1):
-        if is_blank_page(page):
+        if texts is not None:
+            text = _page_text(page)
+            blank = text is not None and len(text.strip()) < threshold
+        else:
+            blank = is_blank_page(page, threshold, strategy)
+        if blank:
             removed_count += 1
             print(f"  [略過] {sheet_name} 第 {page_num} 頁（空白頁）")
         else:
             writer.add_page(page)
+            if texts is not None:
+                texts.append(text or "")
+    
+    if removed_count > 0:
+        print(f"  [info] {sheet_name} 移除了 {removed_count} 個空白頁")
+    return writer, original_count, removed_count
+
+
+def remove_blank_pages_from_pdf(pdf_path: Path, sheet_name: str,
+                                threshold: int = None, strategy: str = None, texts=None) -> tuple:
+    """
+    從單一 PDF 檔案中移除空白頁
+    threshold / strategy 見 is_blank_page（None → 使用模組預設值）
+    texts：見 _drop_blank_pages（保留頁的文字依序存入）
+    回傳：(實際頁數, 移除的頁數)
+    """
+    reader = PdfReader(str(pdf_path))
+    writer, original_count, removed_count = _drop_blank_pages(reader, sheet_name, threshold, strategy,
+                                                              texts)
     
     # 如果有移除空白頁，覆寫原檔案
     if removed_count > 0:
         with open(pdf_path, "wb") as f:
             writer.write(f)
-        print(f"  [info] {sheet_name} 移除了 {removed_count} 個空白頁")
     
     actual_pages = original_count - removed_count
     return actual_pages, removed_count
 
 
+def remove_blank_pages_from_bytes(data: bytes, sheet_name: str,
+                                  threshold: int = None, strategy: str = None, texts=None) -> tuple:
+    """
+    同 remove_blank_pages_from_pdf，但輸入 / 輸出都是記憶體中的 PDF
+    沒有空白頁時原樣回傳 data
+    回傳：(PDF 內容, 實際頁數, 移除的頁數)
+    """
+    from io import BytesIO
+
+    reader = PdfReader(BytesIO(data))
+    writer, original_count, removed_count = _drop_blank_pages(reader, sheet_name, threshold, strategy,
+                                                              texts)
+    if removed_count > 0:
+        out = BytesIO()
+        writer.write(out)
+        data = out.getvalue()
+    return data, original_count - removed_count, removed_count
+
+
 # --------------------------------------------------
 # 合併 PDF（不加書籤）
 # --------------------------------------------------
@@ -230,49 +829,117 @@ def merge_pdfs(toc_pdf: Path, sheets, output_pdf: Path) -> int:
 # 疊加頁碼（不使用外部字型）
 # --------------------------------------------------
 
-def add_global_page_numbers(pdf_path: Path, front_pages: int):
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.colors import black
+# ★ 字型 12、黑色、距頁面底緣 30，水平置中（依各頁實際 MediaBox）
+PAGE_NUMBER_FONT_SIZE = 12
+PAGE_NUMBER_Y = 30
 
-    PAGE_W, PAGE_H = A4
+_PNUM_FONT = "/PgNoHelv"
+_HELVETICA_DIGIT_WIDTH = 0.556  # Helvetica 數字字寬皆為 556/1000
 
-    reader = PdfReader(str(pdf_path))
-    total = len(reader.pages)
 
-    overlay = pdf_path.with_suffix(".pnum.pdf")
-    c = canvas.Canvas(str(overlay), pagesize=A4)
-    
-    # ★ 修正：明確設定字型和顏色
-    c.setFont("Helvetica", 12)  # 字型稍微放大到 12
-    c.setFillColor(black)        # 設定為黑色，確保可見
+def page_number_font_dict() -> DictionaryObject:
+    """頁碼用 Helvetica（標準 14 字型，不需內嵌）"""
+    return DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    })
+
+
+def page_number_font(writer: PdfWriter) -> IndirectObject:
+    """整份文件共用一個頁碼字型物件"""
+    return writer._add_object(page_number_font_dict())
+
 
-    for i in range(total):
-        if i >= front_pages:
-            # ★ 修正：位置從 18 調高到 30，更清楚可見
-            c.drawCentredString(PAGE_W / 2, 30, str(i - front_pages + 1))
-        c.showPage()
+def page_number_content(box, text: str) -> bytes:
+    """在 box（MediaBox）底部置中畫出 text 的內容串流"""
+    width = _HELVETICA_DIGIT_WIDTH * PAGE_NUMBER_FONT_SIZE * len(text)
+    x = float(box.left) + float(box.width) / 2 - width / 2
+    y = float(box.bottom) + PAGE_NUMBER_Y
+    return (
+        f"q BT {_PNUM_FONT} {PAGE_NUMBER_FONT_SIZE} Tf 0 g "
+        f"1 0 0 1 {x:.2f} {y:.2f} Tm ({text}) Tj ET Q\n"
+    ).encode("ascii")
 
-    c.save()
 
-    over_reader = PdfReader(str(overlay))
+def _content_stream(writer: PdfWriter, data: bytes) -> IndirectObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+
+def stamp_page_number(writer: PdfWriter, page, text: str, font_ref: IndirectObject):
+    """
+    直接在頁面加上一小段內容串流畫出頁碼
+    - 原內容前後以 q / Q 包住，避免原頁面的繪圖狀態影響頁碼
+    - 不解析、不改寫原內容串流，成本與頁面內容大小無關
+    page 必須是已加入 writer 的頁面
+    """
+    # Resources 可能與其他頁共用 → 複製一層再加入頁碼字型
+    resources = page.get("/Resources")
+    resources = DictionaryObject(resources.get_object()) if resources is not None else DictionaryObject()
+    fonts = resources.get("/Font")
+    fonts = DictionaryObject(fonts.get_object()) if fonts is not None else DictionaryObject()
+    fonts[NameObject(_PNUM_FONT)] = font_ref
+    resources[NameObject("/Font")] = fonts
+    page[NameObject("/Resources")] = resources
+
+    contents = page.get("/Contents")
+    if contents is None:
+        parts = []
+    elif isinstance(contents.get_object(), ArrayObject):
+        parts = list(contents.get_object())
+    else:
+        parts = [contents if isinstance(contents, IndirectObject) else writer._add_object(contents)]
+
+    page[NameObject("/Contents")] = ArrayObject([
+        _content_stream(writer, b"q\n"),
+        *parts,
+        _content_stream(writer, b"Q\n" + page_number_content(page.mediabox, text)),
+    ])
+
+
+def stamp_page_numbers(writer: PdfWriter, front_pages: int):
+    """前置頁（封面、目次）之後的頁面依序編號 1, 2, 3..."""
+    font_ref = page_number_font(writer)
+    for i in range(front_pages, len(writer.pages)):
+        stamp_page_number(writer, writer.pages[i], str(i - front_pages + 1), font_ref)
+
+
+def add_global_page_numbers(pdf_path: Path, front_pages: int):
+    reader = PdfReader(str(pdf_path))
     writer = PdfWriter()
 
-    for i in range(total):
-        page = reader.pages[i]
-        page.merge_page(over_reader.pages[i])
+    for page in reader.pages:
         writer.add_page(page)
 
+    stamp_page_numbers(writer, front_pages)
+
     with open(pdf_path, "wb") as f:
         writer.write(f)
 
-    overlay.unlink(missing_ok=True)
-
 
 # --------------------------------------------------
 # ⭐最後一步：加入書籤
 # --------------------------------------------------
 
+def outline_entries(front_pages: int, sheets):
+    """封面、目次與各工作表書籤：[(標題, 實體頁 index), ...]"""
+    entries = [("封面", 0), ("目次", 1 if front_pages > 1 else 0)]
+
+    current = front_pages
+    for idx, item in enumerate(sheets, start=1):
+        entries.append((f"{idx}. {item['title']}", current))
+        current += item["pages"]
+    return entries
+
+
+def add_outline(writer: PdfWriter, front_pages: int, sheets):
+    for title, page_index in outline_entries(front_pages, sheets):
+        writer.add_outline_item(title, page_index)
+
+
 def apply_bookmarks(pdf_path: Path, front_pages: int, sheets):
     reader = PdfReader(str(pdf_path))
     writer = PdfWriter()
@@ -280,13 +947,7 @@ def apply_bookmarks(pdf_path: Path, front_pages: int, sheets):
     for p in reader.pages:
         writer.add_page(p)
 
-    writer.add_outline_item("封面", 0)
-    writer.add_outline_item("目次", 1 if front_pages > 1 else 0)
-
-    current = front_pages
-    for idx, item in enumerate(sheets, start=1):
-        writer.add_outline_item(f"{idx}. {item['title']}", current)
-        current += item["pages"]
+    add_outline(writer, front_pages, sheets)
 
     tmp = pdf_path.with_suffix(".bm.pdf")
     with open(tmp, "wb") as f:
@@ -296,96 +957,668 @@ def apply_bookmarks(pdf_path: Path, front_pages: int, sheets):
     tmp.rename(pdf_path)
 
 
+# --------------------------------------------------
+# 單次組裝：合併 + 頁碼 + 書籤，只寫出一次
+# --------------------------------------------------
+
+# 輸入 PDF 總大小超過此值時改用串流組裝，記憶體用量與頁數無關
+# 可用環境變數 EXCEL_PDF_MEMORY_MB 設定；0 = 一律串流
+MEMORY_BUDGET_BYTES = int(os.environ.get("EXCEL_PDF_MEMORY_MB", "512")) * 1024 * 1024
+
+# 共用資源：各工作表 PDF 各自內嵌的相同字型、圖片只保留一份，未壓縮的串流重新壓縮
+# 啟用時一律以串流組裝；以環境變數 EXCEL_PDF_DEDUP=1 啟用
+DEDUP_RESOURCES = os.environ.get("EXCEL_PDF_DEDUP", "0") == "1"
+
+
+def stream_assemble_report(toc_pdf: Path, sheets, output_pdf: Path, tracer=None,
+                           dedup: bool = False) -> int:
+    """
+    與 assemble_report 輸出相同（頁面、頁碼、書籤），但逐份寫出：
+    每份工作表 PDF 讀入 → 寫出 → 丟棄，同一時間只有一份在記憶體中
+    tracer：merge（含頁碼，邊讀邊寫）與 bookmarks（書籤 + 收尾）各記一筆
+    dedup：相同的字型、圖片等物件只寫一次（見 StreamingPdfWriter），
+           省下的位元組記在 merge 紀錄的 bytes_saved
+    回傳：前置頁數（封面 + 目次）
+    """
+    if tracer is None:
+        tracer = Tracer()
+    tmp = output_pdf.with_suffix(".tmp.pdf")
+    try:
+        with open(tmp, "wb", buffering=1024 * 1024) as f:
+            writer = StreamingPdfWriter(f, dedup=dedup)
+
+            with tracer.stage("merge", streaming=True, dedup=dedup) as rec:
+                front_pages = writer.add_pages(PdfReader(pdf_source(toc_pdf)))
+
+                font_ref = writer.add_object(page_number_font_dict())
+                fonts = {_PNUM_FONT: font_ref}
+
+                def stamp(page_index, box):
+                    return page_number_content(box, str(page_index - front_pages + 1))
+
+                for item in sheets:
+                    tracer.check()
+                    writer.add_pages(PdfReader(pdf_source(item["pdf"])), stamp=stamp, stamp_fonts=fonts)
+                rec["pages_in"] = rec["pages_out"] = len(writer.page_refs)
+                rec["bytes_written"] = f.tell()
+                if dedup:
+                    stats = writer.stats
+                    rec.update(stats)
+                    rec["bytes_saved"] = stats["dedup_bytes"] + stats["recompress_bytes"]
+                    if stats["shared_objects"]:
+                        print(f"  [info] 共用 {stats['shared_objects']} 個重複的字型 / 圖片等物件，"
+                              f"省下約 {rec['bytes_saved'] / 1024:.0f} KB")
+
+            with tracer.stage("bookmarks", streaming=True) as rec:
+                start = f.tell()
+                writer.add_outline(outline_entries(front_pages, sheets))
+                writer.close()
+                rec["bytes_written"] = f.tell() - start
+    except BaseException:
+        # 失敗或取消：不留下寫到一半的檔案
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if output_pdf.exists():
+        output_pdf.unlink()
+    tmp.rename(output_pdf)
+
+    return front_pages
+
+
+def assemble_report(toc_pdf: Path, sheets, output_pdf: Path, memory_budget: int = None,
+                    tracer=None, dedup: bool = None) -> int:
+    """
+    在同一個 PdfWriter 內完成：封面/目次 + 各工作表頁面 + 頁碼 + 書籤
+    只解析輸入檔一次、只寫出一次
+    等同依序呼叫 merge_pdfs → add_global_page_numbers → apply_bookmarks
+    memory_budget：輸入總大小超過此值（bytes）時改用 stream_assemble_report，
+                   None → MEMORY_BUDGET_BYTES
+    tracer：merge / page_numbers / bookmarks / write 各記一筆
+    toc_pdf 與 item["pdf"] 可為路徑或記憶體緩衝區（見 pdf_spool）
+    dedup：共用重複的字型 / 圖片（一律改用 stream_assemble_report），None → DEDUP_RESOURCES
+    回傳：前置頁數（封面 + 目次）
+    """
+    if tracer is None:
+        tracer = Tracer()
+    budget = MEMORY_BUDGET_BYTES if memory_budget is None else memory_budget
+    if dedup is None:
+        dedup = DEDUP_RESOURCES
+    total_size = pdf_size(toc_pdf) + sum(pdf_size(item["pdf"]) for item in sheets)
+    if dedup or total_size > budget:
+        return stream_assemble_report(toc_pdf, sheets, output_pdf, tracer, dedup=dedup)
+
+    writer = PdfWriter()
+
+    with tracer.stage("merge") as rec:
+        toc_reader = PdfReader(pdf_source(toc_pdf))
+        for p in toc_reader.pages:
+            writer.add_page(p)
+
+        front_pages = len(toc_reader.pages)
+
+        for item in sheets:
+            tracer.check()
+            r = PdfReader(pdf_source(item["pdf"]))
+            for p in r.pages:
+                writer.add_page(p)
+        rec["pages_in"] = rec["pages_out"] = len(writer.pages)
+
+    # 頁碼（前置頁不編號）
+    with tracer.stage("page_numbers") as rec:
+        stamp_page_numbers(writer, front_pages)
+        rec["pages_out"] = len(writer.pages) - front_pages
+
+    with tracer.stage("bookmarks") as rec:
+        add_outline(writer, front_pages, sheets)
+        rec["entries"] = len(sheets) + 2
+
+    tmp = output_pdf.with_suffix(".tmp.pdf")
+    with tracer.stage("write") as rec:
+        with open(tmp, "wb") as f:
+            writer.write(f)
+        rec["pages_out"] = len(writer.pages)
+        rec["bytes_written"] = tmp.stat().st_size
+
+    if output_pdf.exists():
+        output_pdf.unlink()
+    tmp.rename(output_pdf)
+
+    return front_pages
+
+
+# --------------------------------------------------
+# 目次 + 組裝（匯出完成之後的步驟）
+# --------------------------------------------------
+
+def build_toc_items(sheets):
+    """目次項目：頁碼為邏輯頁碼（不含封面、目次）"""
+    toc_items = []
+    logical_page = 1
+    for idx, item in enumerate(sheets, start=1):
+        toc_items.append({
+            "index": idx,
+            "title": item["title"],
+            "page": logical_page
+        })
+        logical_page += item["pages"]
+    return toc_items
+
+
+# 匯出前預估各工作表頁數，目次與封面在背景與匯出同時產生；
+# 匯出完成後核對，預估全對才沿用，否則照舊重新產生
+# 預估以 xlsx 後端的版面計算，與 Excel 的分頁常有差異，且須以 openpyxl 完整載入活頁簿：
+# 以環境變數 EXCEL_PDF_TOC_PLAN=1 啟用；超過 EXCEL_PDF_TOC_PLAN_MAX_MB（預設 20）的活頁簿不預估
+TOC_PLANNING = os.environ.get("EXCEL_PDF_TOC_PLAN", "0") == "1"
+TOC_PLAN_MAX_BYTES = int(os.environ.get("EXCEL_PDF_TOC_PLAN_MAX_MB", "20")) * 1024 * 1024
+
+
+def plan_toc(excel_path: Path, compile_date: str, titles, tracer) -> dict:
+    """
+    依預估頁數先產生目次（含封面）；在背景執行緒中與匯出同時執行
+    預估為 0 頁的工作表（沒有任何值）視為匯出時會略過，不列入目次
+    回傳：{"pages": {工作表名稱: 預估頁數}, "items": 目次項目, "toc": 目次 PDF bytes}
+    """
+    from io import BytesIO
+
+    with tracer.stage("plan_pages") as rec:
+        predicted = predict_page_counts(excel_path)
+        rec["sheets"] = len(predicted)
+        rec["pages_out"] = sum(predicted.values())
+    planned = [
+        {"sheet": name, "title": (titles or {}).get(name) or name, "pages": pages}
+        for name, pages in predicted.items() if pages > 0
+    ]
+    toc_items = build_toc_items(planned)
+    with tracer.stage("toc_prerender") as rec:
+        buf = BytesIO()
+        generate_toc_pdf(buf, toc_items, compile_date)
+        rec["bytes_buffered"] = buf.tell()
+    return {"pages": predicted, "items": toc_items, "toc": buf.getvalue()}
+
+
+def start_toc_plan(excel_path: Path, compile_date: str, titles, tracer):
+    """在背景執行緒啟動 plan_toc；無法預估的格式（.xls 等）或檔案太大時回傳 None"""
+    if not can_plan(excel_path, TOC_PLAN_MAX_BYTES):
+        return None
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="toc-plan")
+    future = pool.submit(plan_toc, excel_path, compile_date, titles, tracer)
+    pool.shutdown(wait=False)  # 工作仍會完成；執行緒在結束後自行回收
+    return future
+
+
+def toc_plan_result(future):
+    """等待背景的目次規劃；失敗時只提示，回傳 None（改為匯出後產生目次）"""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Cancelled:
+        raise
+    except Exception as e:
+        print(f"[info] 無法預先產生目次，改為匯出後產生：{e}")
+        return None
+
+
+def build_report(sheets, compile_date: str, temp_dir: Path, output_pdf: Path,
+                 tracer=None, spool=None, linearize: bool = False, toc_plan=None,
+                 index: bool = False) -> Path:
+    """
+    產生目次，再一次完成合併、頁碼、書籤（須在暫存目錄刪除前呼叫）
+    spool：pdf_spool.PdfSpool；有的話目次存入記憶體緩衝區，不寫 toc.pdf
+    linearize：最後把輸出改寫成線性化 PDF 並檢查（見 pdf_linearize）
+    toc_plan：plan_toc 的結果；目次項目與實際完全相同就直接沿用預先產生的目次，
+              否則重新產生。預估命中的工作表數記在 toc 階段（plan_hits / plan_sheets）
+    index：以 item["text"]（export_sheets_to_pdfs 的 index_text）寫出全文索引（見 text_index）
+    """
+    if tracer is None:
+        tracer = Tracer()
+    toc_items = build_toc_items(sheets)
+    with tracer.stage("toc") as rec:
+        toc_data = None
+        if toc_plan is not None:
+            predicted = toc_plan["pages"]
+            hits = sum(1 for item in sheets if predicted.get(item["sheet"]) == item["pages"])
+            rec["plan_sheets"] = len(sheets)
+            rec["plan_hits"] = hits
+            rec["plan_accuracy"] = hits / len(sheets) if sheets else None
+            rec["plan_reused"] = toc_plan["items"] == toc_items
+            if rec["plan_reused"]:
+                toc_data = toc_plan["toc"]
+            else:
+                print(f"[info] 頁數預估命中 {hits}/{len(sheets)} 張工作表，重新產生目次")
+
+        if spool is not None:
+            if toc_data is None:
+                from io import BytesIO
+
+                buf = BytesIO()
+                generate_toc_pdf(buf, toc_items, compile_date)
+                toc_data = buf.getvalue()
+            toc_pdf = spool.store(toc_data)
+            rec["bytes_buffered"] = pdf_size(toc_pdf)
+        else:
+            toc_pdf = temp_dir / "toc.pdf"
+            if toc_data is not None:
+                toc_pdf.write_bytes(toc_data)
+            else:
+                generate_toc_pdf(toc_pdf, toc_items, compile_date)
+            rec["bytes_written"] = toc_pdf.stat().st_size
+    front_pages = assemble_report(toc_pdf, sheets, output_pdf, tracer=tracer)
+    if linearize:
+        tracer.check()
+        with tracer.stage("linearize") as rec:
+            linearize_pdf(output_pdf)
+            rec["bytes_written"] = output_pdf.stat().st_size
+    if index:
+        with tracer.stage("text_index") as rec:
+            entries = build_entries(sheets, front_pages)
+            path = write_index(index_path_for(output_pdf), entries,
+                               pdf=output_pdf.name, compile_date=compile_date)
+            rec["pages_in"] = len(entries)
+            rec["bytes_written"] = path.stat().st_size
+    return output_pdf
+
+
+def write_run_report(tracer, excel_path: Path, output_pdf: Path, compile_date: str, status: str):
+    """依 RUN_REPORT / TRACE_PRINT 寫出執行紀錄 JSON、顯示摘要；寫不出來只提示，不影響結果"""
+    if not (RUN_REPORT or TRACE_PRINT):
+        return None
+    report = tracer.report(
+        excel=str(excel_path),
+        output=str(output_pdf),
+        compile_date=compile_date,
+        status=status,
+    )
+    if RUN_REPORT:
+        path = report_path_for(output_pdf)
+        try:
+            write_report(report, path)
+        except OSError as e:
+            print(f"[info] 無法寫出執行紀錄 {path}：{e}")
+    if TRACE_PRINT:
+        print_report(report)
+    return report
+
+
+def output_path_for(excel_path: Path) -> Path:
+    return excel_path.with_name(f"{excel_path.stem}_merged.pdf")
+
+
 # --------------------------------------------------
 # 主程式（舊版 CLI）
 # --------------------------------------------------
 
-def main():
+def legacy_main():
+    """舊版行為：程式目錄中只放一個 .xlsx"""
     base_dir = Path(__file__).parent
     excel_files = [p for p in base_dir.glob("*.xlsx") if not p.name.startswith("~$")]
 
     if len(excel_files) != 1:
         raise RuntimeError("請在目錄中只保留一個 Excel 檔")
 
-    excel_path = excel_files[0]
-    output_pdf = excel_path.with_name(f"{excel_path.stem}_merged.pdf")
+    # 舊版先固定值（你可自行改）
+    output_pdf = run(excel_files[0], "114年11月編製")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        temp_dir = Path(tmpdir)
+    print("\n=== 完成 ===")
+    print("輸出 PDF：", output_pdf)
 
-        sheets = export_sheets_to_pdfs(excel_path, temp_dir)
-        if not sheets:
-            raise RuntimeError("沒有任何工作表成功匯出 PDF")
 
-        # 建立 TOC（使用已算好的 pages 與 title）
-        toc_items = []
-        logical_page = 1
-        for idx, item in enumerate(sheets, start=1):
-            toc_items.append({
-                "index": idx,
-                "title": item["title"],
-                "page": logical_page
-            })
-            logical_page += item["pages"]
+def run(excel_path: Path, compile_date: str, backend=None, workers: int = None,
+        tracer=None, progress=None, cancel=None, in_memory: bool = None,
+        linearize: bool = None, cache=None, index: bool = None) -> Path:
+    """
+    GUI 專用入口
+    backend / workers：同 export_sheets_to_pdfs（None → 預設值）
+    tracer：run_trace.Tracer；None → 自行建立
+            結束時（含失敗）依 RUN_REPORT 在輸出 PDF 旁寫出執行紀錄 JSON
+    progress：progress(event) 回呼，收到每張工作表與每個階段的進度事件（見 run_trace）
+    cancel：run_trace.CancelToken；工作表之間、階段之間檢查，
+            取消時關閉後端（Excel）、刪除暫存檔後拋出 Cancelled
+    in_memory：各階段之間以記憶體緩衝區交接，只寫出最後的 PDF；None → IN_MEMORY_HANDOFF
+    linearize：輸出線性化（Fast Web View）PDF；None → LINEARIZE_OUTPUT
+    cache：SheetCache；同 export_sheets_to_pdfs（None → 依 SHEET_CACHE_DIR）
+    index：在輸出 PDF 旁寫出全文索引（xxx_merged.search.db）；None → TEXT_INDEX
+    TOC_PLANNING（預設關閉）開啟時，目次依預估頁數在背景與匯出同時產生（見 plan_toc）
+    """
+    excel_path = Path(excel_path)
+    if in_memory is None:
+        in_memory = IN_MEMORY_HANDOFF
+    if linearize is None:
+        linearize = LINEARIZE_OUTPUT
+    if index is None:
+        index = TEXT_INDEX
+    if tracer is None:
+        tracer = Tracer()
+    if progress is not None:
+        tracer.progress = progress
+    if cancel is not None:
+        tracer.cancel = cancel
 
-        toc_pdf = temp_dir / "toc.pdf"
-        # 舊版先固定值（你可自行改）
-        generate_toc_pdf(toc_pdf, toc_items, "114年11月編製")
+    # ★ 一開始就定義，避免 NameError
+    output_pdf = output_path_for(excel_path)
 
-        front_pages = merge_pdfs(toc_pdf, sheets, output_pdf)
+    status = "失敗"
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                PdfSpool(SPOOL_BUDGET_BYTES, tmpdir) as spool:
+            temp_dir = Path(tmpdir)
+            spool = spool if in_memory else None
+
+            titles = plan = None
+            if TOC_PLANNING and can_plan(excel_path, TOC_PLAN_MAX_BYTES):
+                # 標題在這裡讀一次，目次規劃與匯出共用
+                with tracer.stage("read_titles"):
+                    titles = read_titles(excel_path)
+                plan = start_toc_plan(excel_path, compile_date, titles, tracer)
+
+            sheets = export_sheets_to_pdfs(excel_path, temp_dir, backend=backend, workers=workers,
+                                           cache=cache, titles=titles, tracer=tracer, spool=spool,
+                                           index_text=index)
+            if not sheets:
+                raise RuntimeError("沒有任何工作表成功匯出 PDF")
+
+            build_report(sheets, compile_date, temp_dir, output_pdf, tracer=tracer, spool=spool,
+                         linearize=linearize, toc_plan=toc_plan_result(plan), index=index)
+        status = "OK"
+    except Cancelled:
+        status = "已取消"
+        raise
+    except Exception as e:
+        status = f"失敗：{e}"
+        raise
+    finally:
+        write_run_report(tracer, excel_path, output_pdf, compile_date, status)
 
-    add_global_page_numbers(output_pdf, front_pages)
-    apply_bookmarks(output_pdf, front_pages, sheets)
+    return output_pdf
 
-    print("\n=== 完成 ===")
-    print("輸出 PDF：", output_pdf)
 
+# --------------------------------------------------
+# 批次模式：多本活頁簿共用同一個匯出工作階段
+# --------------------------------------------------
 
-def main():
-    ...
-    print("完成：", output_pdf)
+def expand_batch_jobs(specs, default_date: str = None):
+    """
+    specs：活頁簿路徑或萬用字元，可用「路徑=編製日期」指定個別日期
+           例如 ["2024/*.xlsx", "114年1月.xlsx=114年1月編製"]
+    回傳：[(excel_path, compile_date), ...]（依路徑排序、去除重複與 ~$ 暫存檔）
+    """
+    import glob
+
+    jobs = {}
+    for spec in specs:
+        pattern, _, date = str(spec).partition("=")
+        date = date or default_date
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        for m in matches:
+            path = Path(m)
+            if path.name.startswith("~$"):
+                continue
+            if not date:
+                raise ValueError(f"未指定編製日期：{path}")
+            jobs[path.resolve()] = date
+
+    return sorted(jobs.items(), key=lambda kv: str(kv[0]))
+
+
+def _finish_batch_job(row, sheets, compile_date, tmp, tracer, spool=None, linearize=False,
+                      index=False):
+    """背景執行：目次 + 組裝，完成後釋放緩衝區、刪除該活頁簿的暫存目錄並寫出執行紀錄"""
+    t0 = time.perf_counter()
+    output_pdf = row["output"]
+    try:
+        build_report(sheets, compile_date, Path(tmp.name), output_pdf, tracer=tracer, spool=spool,
+                     linearize=linearize, index=index)
+        row["status"] = "OK"
+    except Exception as e:
+        row["status"] = f"失敗：{e}"
+        row["output"] = None
+    finally:
+        if spool is not None:
+            spool.close()
+        tmp.cleanup()
+        row["post_s"] = time.perf_counter() - t0
+        write_run_report(tracer, row["excel"], output_pdf, compile_date, row["status"])
+    return row
 
 
-def run(excel_path: Path, compile_date: str) -> Path:
+def run_batch(jobs, backend=None, workers: int = None, cache=None, pipeline: int = None,
+              in_memory: bool = None, linearize: bool = None, index: bool = None):
     """
-    GUI 專用入口
+    依序處理多本活頁簿：
+    - 整批只啟動一次後端（Excel），不必每本重新開關
+    - 第 k 本的目次 / 合併 / 頁碼 / 書籤在背景執行緒進行，同時匯出第 k+1 本
+    jobs：[(excel_path, compile_date), ...]（見 expand_batch_jobs）
+    in_memory：同 run()（每本各自一個緩衝區，組裝完成後釋放）
+    linearize / index：同 run()
+    回傳：每本活頁簿一筆結果 dict（excel / output / sheets / pages / export_s / post_s / status）
     """
-    excel_path = Path(excel_path)
+    from concurrent.futures import ThreadPoolExecutor
+
+    if in_memory is None:
+        in_memory = IN_MEMORY_HANDOFF
+    if linearize is None:
+        linearize = LINEARIZE_OUTPUT
+    if index is None:
+        index = TEXT_INDEX
+    owns_backend = backend is None or isinstance(backend, (str, type))
+    backend = get_backend(DEFAULT_BACKEND if backend is None else backend)
+    if owns_backend and (SHEET_TIMEOUT_S or RUN_DEADLINE_S):
+        backend = backend.for_worker()  # 同 _export_sheets：看門狗須能強制終止
+    backend.start()
+
+    rows = []
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=1) as post:
+            for excel_path, compile_date in jobs:
+                excel_path = Path(excel_path)
+                row = {
+                    "excel": excel_path,
+                    "output": output_path_for(excel_path),
+                    "sheets": 0,
+                    "pages": 0,
+                    "export_s": 0.0,
+                    "post_s": 0.0,
+                    "status": "",
+                }
+                rows.append(row)
+                print(f"\n=== {excel_path.name} ===")
+
+                tmp = tempfile.TemporaryDirectory()
+                spool = PdfSpool(SPOOL_BUDGET_BYTES, tmp.name) if in_memory else None
+                tracer = Tracer()
+                t0 = time.perf_counter()
+                try:
+                    sheets = export_sheets_to_pdfs(excel_path, Path(tmp.name), backend=backend,
+                                                   workers=workers, cache=cache, tracer=tracer,
+                                                   pipeline=pipeline, spool=spool,
+                                                   index_text=index)
+                    if not sheets:
+                        raise RuntimeError("沒有任何工作表成功匯出 PDF")
+                except Exception as e:
+                    if spool is not None:
+                        spool.close()
+                    tmp.cleanup()
+                    row["status"] = f"失敗：{e}"
+                    write_run_report(tracer, excel_path, row["output"], compile_date, row["status"])
+                    row["output"] = None
+                    # 後端可能已不可用（例如 Excel 當掉），重新啟動再處理下一本
+                    try:
+                        backend.stop()
+                    except Exception:
+                        pass
+                    backend.start()
+                    continue
+                finally:
+                    row["export_s"] = time.perf_counter() - t0
+
+                row["sheets"] = len(sheets)
+                row["pages"] = sum(item["pages"] for item in sheets)
+                futures.append(post.submit(_finish_batch_job, row, sheets, compile_date, tmp, tracer,
+                                           spool, linearize, index))
+
+            for fut in futures:
+                fut.result()
+    finally:
+        if owns_backend:
+            backend.stop()
+
+    return rows
 
-    # ★ 一開始就定義，避免 NameError
-    output_pdf = excel_path.with_name(f"{excel_path.stem}_merged.pdf")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        temp_dir = Path(tmpdir)
+# --------------------------------------------------
+# 監看模式：活頁簿存檔後自動重新產生 PDF
+# --------------------------------------------------
 
-        sheets = export_sheets_to_pdfs(excel_path, temp_dir)
-        if not sheets:
-            raise RuntimeError("沒有任何工作表成功匯出 PDF")
+# 存檔後安靜幾秒才重新轉換（Excel 一次存檔會寫入好幾次）、每隔幾秒檢查一次
+WATCH_DEBOUNCE_S = float(os.environ.get("EXCEL_PDF_WATCH_DEBOUNCE", "2"))
+WATCH_POLL_S = 1.0
 
-        # 建立 TOC
-        toc_items = []
-        logical_page = 1
-        for idx, item in enumerate(sheets, start=1):
-            toc_items.append({
-                "index": idx,
-                "title": item["title"],
-                "page": logical_page
-            })
-            logical_page += item["pages"]
 
-        toc_pdf = temp_dir / "toc.pdf"
-        generate_toc_pdf(toc_pdf, toc_items, compile_date)
+def watch_folder(folder: Path, compile_date: str, backend=None, cache=None,
+                 debounce: float = None, poll: float = None, stop=None):
+    """
+    監看 folder 中的 .xlsx / .xlsm（略過 ~$ 鎖定檔），存檔後只重新轉換該本活頁簿
+    - 連續存檔只在最後一次存檔安靜 debounce 秒後轉換一次
+    - 轉換途中同一本又存檔：取消進行中的轉換（下一張工作表前停止），等安靜後再轉
+    - 一次只轉換一本，其餘依序排隊；後端（Excel）整段時間保持開啟，
+      且一律獨立啟動（for_worker），不會動到使用者正在編輯的 Excel
+    cache：SheetCache；None → SHEET_CACHE_DIR 或 sheet_cache.default_cache_dir()，
+           沒改到的工作表直接沿用上次的結果
+    stop：threading.Event；設定後結束監看（None → 直到 KeyboardInterrupt）
+    """
+    from folder_watch import FolderWatcher
+    from session_pool import SessionPool
+    from sheet_cache import default_cache_dir
+
+    folder = Path(folder)
+    debounce = WATCH_DEBOUNCE_S if debounce is None else debounce
+    poll = WATCH_POLL_S if poll is None else poll
+    if cache is None:
+        cache = SheetCache(SHEET_CACHE_DIR or default_cache_dir(), SHEET_CACHE_MAX_BYTES)
+
+    watcher = FolderWatcher(folder, debounce=debounce)
+    backend = DEFAULT_BACKEND if backend is None else backend
+    pool = SessionPool(lambda: get_backend(backend).for_worker())
+    pool.start()
+    queued = []
+    current = None  # (路徑, Future, CancelToken, 開始時間)
+    print(f"[監看] {folder}（存檔後 {debounce:g} 秒重新轉換，Ctrl+C 結束）")
+
+    try:
+        while stop is None or not stop.is_set():
+            changed, ready = watcher.poll()
+
+            if current is not None and current[0] in changed and not current[2].cancelled:
+                print(f"[監看] {current[0].name} 又存檔了，取消進行中的轉換")
+                current[2].cancel()
+            for path in ready:
+                if path not in queued:
+                    queued.append(path)
+
+            if current is not None and current[1].done():
+                path, fut, token, t0 = current
+                current = None
+                try:
+                    output_pdf = fut.result()
+                    print(f"[監看] 已更新 {output_pdf.name}（{time.perf_counter() - t0:.1f} 秒）")
+                except Cancelled:
+                    pass
+                except Exception as e:
+                    print(f"[監看] {path.name} 轉換失敗：{e}")
+
+            if current is None and queued:
+                path = queued.pop(0)
+                token = CancelToken()
+                print(f"[監看] {path.name} 已變更，重新轉換")
+                fut = pool.submit(lambda backend, path=path, token=token: run(
+                    path, compile_date, backend=backend, cancel=token, cache=cache))
+                current = (path, fut, token, time.perf_counter())
+
+            if stop is not None:
+                stop.wait(poll)
+            else:
+                time.sleep(poll)
+    finally:
+        if current is not None:
+            current[2].cancel()
+        pool.close()
 
-        front_pages = merge_pdfs(toc_pdf, sheets, output_pdf)
 
-    # 注意：這兩行在 with 區塊「外面」
-    add_global_page_numbers(output_pdf, front_pages)
-    apply_bookmarks(output_pdf, front_pages, sheets)
+def print_batch_summary(rows):
+    print("\n=== 批次結果 ===")
+    print(f"{'活頁簿':<30} {'表數':>4} {'頁數':>5} {'匯出(s)':>8} {'組裝(s)':>8}  狀態")
+    for row in rows:
+        print(
+            f"{row['excel'].name:<30} {row['sheets']:>4} {row['pages']:>5} "
+            f"{row['export_s']:>8.1f} {row['post_s']:>8.1f}  {row['status']}"
+        )
+    ok = sum(1 for row in rows if row["status"] == "OK")
+    total = sum(row["export_s"] + row["post_s"] for row in rows)
+    print(f"成功 {ok} / {len(rows)} 本，累計 {total:.1f} 秒")
 
-    return output_pdf
 
+def main(argv=None):
+    """
+    不帶參數：舊版行為（程式目錄中唯一的 .xlsx）
+    --batch：批次處理多本活頁簿，例如
+        python excel_to_pdf_with_bookmarks.py --batch "2024/*.xlsx" --date 114年11月編製
+    --watch：監看資料夾，存檔後自動重新產生該本的 PDF，例如
+        python excel_to_pdf_with_bookmarks.py --watch D:\報表 --date 114年11月編製
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Excel 多工作表 → PDF")
+    parser.add_argument("--batch", nargs="+", metavar="XLSX",
+                        help="活頁簿路徑或萬用字元，可寫成「路徑=編製日期」")
+    parser.add_argument("--watch", metavar="DIR",
+                        help="監看資料夾，活頁簿存檔後自動重新產生 PDF（需 --date）")
+    parser.add_argument("--date", help="預設編製日期，例如 114年11月編製")
+    parser.add_argument("--backend", help="匯出後端（com / xlsx / simulated）")
+    parser.add_argument("--workers", type=int, help="平行匯出的行程數")
+    parser.add_argument("--pipeline", type=int,
+                        help="管線模式：清理空白頁的行程數（匯出下一張的同時清理上一張）")
+    parser.add_argument("--in-memory", action="store_true", default=None,
+                        help="各階段之間以記憶體交接，只寫出最後的 PDF")
+    parser.add_argument("--linearize", action="store_true", default=None,
+                        help="輸出線性化（Fast Web View）PDF，瀏覽器可先顯示封面與目次")
+    parser.add_argument("--index", action="store_true", default=None,
+                        help="在輸出 PDF 旁寫出全文索引（可用 text_index.py 跨報表查詢）")
+    parser.add_argument("--trace", action="store_true", help="結束時顯示各階段耗時摘要")
+    args = parser.parse_args(argv)
+
+    global TRACE_PRINT, LINEARIZE_OUTPUT, TEXT_INDEX
+    if args.trace:
+        TRACE_PRINT = True
+    if args.linearize:
+        LINEARIZE_OUTPUT = True
+    if args.index:
+        TEXT_INDEX = True
+
+    if args.watch:
+        if not args.date:
+            raise RuntimeError("監看模式需要以 --date 指定編製日期")
+        try:
+            watch_folder(Path(args.watch), args.date, backend=args.backend)
+        except KeyboardInterrupt:
+            print("\n[監看] 結束")
+        return
+
+    if not args.batch:
+        legacy_main()
+        return
+
+    jobs = expand_batch_jobs(args.batch, args.date)
+    if not jobs:
+        raise RuntimeError("找不到任何 Excel 檔")
+
+    rows = run_batch(jobs, backend=args.backend, workers=args.workers, pipeline=args.pipeline,
+                     in_memory=args.in_memory)
+    print_batch_summary(rows)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,850 @@
+# -*- coding: utf-8 -*-
+"""
+工作表匯出後端
+- ExcelComBackend：透過 COM 控制 Excel 匯出（原本的做法，需 Windows + Excel）
+- XlsxRenderBackend：直接讀取 .xlsx（儲存格、合併範圍、列印範圍），
+  以 reportlab 繪製 PDF，不需要 Excel，可在 Linux 批次主機執行
+- SimulatedBackend：模擬匯出延遲的替身，供測試與效能量測
+
+export_sheets_to_pdfs 只透過 ExportBackend 介面操作，換後端不影響其餘流程
+"""
+
+import copy
+import os
+import re
+import time as _time
+from datetime import date, datetime, time
+from pathlib import Path
+
+
+# --------------------------------------------------
+# 標題工具
+# --------------------------------------------------
+
+def clean_title(text) -> str:
+    """去掉前置編號，例如 '1. xxx' -> 'xxx'"""
+    if not text:
+        return ""
+    return re.sub(r"^\s*\d+[\.\、\s]*", "", str(text)).strip()
+
+
+def is_blank(v) -> bool:
+    if v is None:
+        return True
+    s = str(v).strip()
+    return s == ""
+
+
+def title_from_values(values) -> str:
+    """第一列由左到右，第一個非空白值（經 clean_title）做為表頭"""
+    for v in values:
+        if not is_blank(v):
+            t = clean_title(v)
+            if t:
+                return t
+    return ""
+
+
+def title_from_xlsx_values(values) -> str:
+    """
+    同 title_from_values，但先把直接讀 .xlsx 得到的值轉成 Excel COM .Value 的型別：
+    COM 對數字一律回傳 float（2024 → 2024.0），經 clean_title 後為 "0"。
+    這裡刻意沿用 COM 的格式（不是修正），各後端與 xlsx_titles 讀到的標題才會與 com 後端一致
+    """
+    return title_from_values(
+        float(v) if isinstance(v, int) and not isinstance(v, bool) else v for v in values
+    )
+
+
+def get_title_from_first_row(ws, max_cols=80) -> str:
+    """
+    依規則：抓「第一列」從左到右掃描，第一個非空白儲存格的值做為表頭
+    若第一列找不到，再退回使用 A1 或 sheet name
+    （ws 為 Excel COM 的 Worksheet）
+    """
+    # 1) 掃第一列 1..max_cols
+    try:
+        row1 = ws.Range(ws.Cells(1, 1), ws.Cells(1, max_cols)).Value
+        # row1 可能是 tuple(tuple(...)) 或 tuple(...)
+        if row1:
+            # 轉成一維
+            if isinstance(row1, tuple) and len(row1) == 1 and isinstance(row1[0], tuple):
+                vals = list(row1[0])
+            elif isinstance(row1, tuple):
+                vals = list(row1)
+            else:
+                vals = [row1]
+
+            t = title_from_values(vals)
+            if t:
+                return t
+    except Exception:
+        pass
+
+    # 2) fallback：A1
+    try:
+        v = ws.Range("A1").Value
+        t = clean_title(v)
+        if t:
+            return t
+    except Exception:
+        pass
+
+    return ""
+
+
+# --------------------------------------------------
+# 後端介面
+# --------------------------------------------------
+
+class ExportBackend:
+    """
+    匯出後端介面
+    生命週期：start() → [open_workbook() → 逐張 export_sheet() → close_workbook()] × N → stop()
+    也可用 with 敘述自動 start / stop
+    """
+
+    name = ""
+    # 輸出結果會改變時（繪製邏輯、匯出參數）請遞增，使舊的快取失效
+    version = "1"
+
+    def start(self):
+        """啟動後端（例如 Excel 程式），可重複呼叫"""
+
+    def stop(self):
+        """關閉後端並釋放資源"""
+
+    def is_alive(self) -> bool:
+        """健康檢查：已啟動的後端是否仍可使用（常駐的工作階段借出前會先檢查）"""
+        return True
+
+    def kill(self) -> bool:
+        """
+        強制終止後端（匯出看門狗逾時時由另一條執行緒呼叫），使卡住的 export_sheet 失敗返回
+        之後須 stop() → start() 才能再使用；不支援時回傳 False
+        """
+        return False
+
+    def open_workbook(self, excel_path: Path):
+        raise NotImplementedError
+
+    def close_workbook(self, wb):
+        raise NotImplementedError
+
+    def iter_sheets(self, wb):
+        """依活頁簿中的順序回傳工作表"""
+        raise NotImplementedError
+
+    def sheet_name(self, sheet) -> str:
+        raise NotImplementedError
+
+    def get_title(self, sheet) -> str:
+        """第一列第一個非空白值；找不到回傳空字串"""
+        raise NotImplementedError
+
+    def export_sheet(self, sheet, pdf_path: Path):
+        """將單一工作表匯出成 pdf_path，失敗時丟出例外"""
+        raise NotImplementedError
+
+    def sheet_fingerprint(self, sheet):
+        """
+        工作表儲存格資料與列印設定的指紋（bytes），供快取判斷是否需要重新匯出
+        回傳 None 表示不支援，該工作表一律重新匯出
+        """
+        return None
+
+    def for_worker(self) -> "ExportBackend":
+        """平行匯出時交給子行程的新實例（未啟動、可 pickle）"""
+        return copy.copy(self)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --------------------------------------------------
+# Excel COM
+# --------------------------------------------------
+
+class ExcelComBackend(ExportBackend):
+    """
+    new_instance=True 時一定啟動獨立的 Excel 行程（DispatchEx），
+    不會連到使用者已開啟的 Excel；平行匯出的每個子行程與看門狗保護的匯出都用這種方式
+    dispatch：可替換的 dispatch(prog_id) → Application 物件，測試時傳入假的 COM 物件；
+              None → win32com（Dispatch / DispatchEx）
+    """
+
+    name = "com"
+
+    def __init__(self, new_instance: bool = False, dispatch=None):
+        self.new_instance = new_instance
+        self.dispatch = dispatch
+        self.excel = None
+        self.pid = None
+
+    def start(self):
+        if self.excel is not None:
+            return
+        dispatch = self.dispatch
+        if dispatch is None:
+            import pythoncom
+            import win32com.client as win32
+
+            pythoncom.CoInitialize()
+            dispatch = win32.DispatchEx if self.new_instance else win32.Dispatch
+        excel = dispatch("Excel.Application")
+        excel.Visible = False
+        excel.DisplayAlerts = False
+        self.excel = excel
+        self.pid = self._process_id(excel)
+
+    @staticmethod
+    def _process_id(excel):
+        """Excel 行程的 PID（看門狗強制終止用）；取不到時回傳 None"""
+        try:
+            import win32process
+
+            return win32process.GetWindowThreadProcessId(excel.Hwnd)[1]
+        except Exception:
+            return None
+
+    def stop(self):
+        if self.excel is None:
+            return
+        try:
+            self.excel.Quit()
+        finally:
+            self.excel = None
+            self.pid = None
+
+    def kill(self) -> bool:
+        """
+        終止 Excel 行程（Windows 上 os.kill 即 TerminateProcess），等待中的 COM 呼叫隨即失敗
+        只終止自己啟動的行程（new_instance=True）：Dispatch 可能連到使用者正在使用的 Excel
+        """
+        import signal
+
+        if not self.new_instance or self.pid is None:
+            return False
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except OSError:
+            return False
+        return True
+
+    def is_alive(self) -> bool:
+        """Excel 當掉或被關閉時，存取任何屬性都會丟出 COM 錯誤"""
+        if self.excel is None:
+            return False
+        try:
+            self.excel.Workbooks.Count
+            return True
+        except Exception:
+            return False
+
+    def open_workbook(self, excel_path: Path):
+        return self.excel.Workbooks.Open(str(excel_path))
+
+    def close_workbook(self, wb):
+        wb.Close(False)
+
+    def iter_sheets(self, wb):
+        return list(wb.Worksheets)
+
+    def sheet_name(self, sheet) -> str:
+        return sheet.Name
+
+    def get_title(self, sheet) -> str:
+        return get_title_from_first_row(sheet)
+
+    def for_worker(self):
+        return ExcelComBackend(new_instance=True, dispatch=self.dispatch)
+
+    def sheet_fingerprint(self, sheet):
+        """
+        已用範圍的 XML 試算表值（xlRangeValueXMLSpreadsheet：值、公式、合併，
+        以及每格的字型 / 填滿 / 框線 / 數值格式 / 對齊）、列印設定、分頁位置與圖形
+        取不到 XML 時回傳 None（格式變動無從判斷，一律重新匯出）
+        """
+        used = sheet.UsedRange
+        xml = self._range_xml(used)
+        if xml is None:
+            return None
+        setup = sheet.PageSetup
+        parts = [
+            used.Address,
+            xml,
+            used.ColumnWidth,
+            used.RowHeight,
+            setup.PrintArea, setup.PrintTitleRows, setup.PrintTitleColumns,
+            setup.Orientation, setup.PaperSize, setup.Zoom,
+            setup.FitToPagesWide, setup.FitToPagesTall,
+            setup.LeftMargin, setup.RightMargin, setup.TopMargin, setup.BottomMargin,
+            setup.HeaderMargin, setup.FooterMargin,
+            setup.CenterHorizontally, setup.CenterVertically,
+            setup.LeftHeader, setup.CenterHeader, setup.RightHeader,
+            setup.LeftFooter, setup.CenterFooter, setup.RightFooter,
+            setup.PrintGridlines, setup.PrintHeadings, setup.BlackAndWhite,
+            setup.Order, setup.FirstPageNumber,
+            [b.Location.Address for b in sheet.HPageBreaks],
+            [b.Location.Address for b in sheet.VPageBreaks],
+            [
+                (s.Name, s.Type, s.Visible, s.Left, s.Top, s.Width, s.Height)
+                for s in sheet.Shapes
+            ],
+        ]
+        return repr(parts).encode("utf-8")
+
+    @staticmethod
+    def _range_xml(rng):
+        """Range.Value(11)（xlRangeValueXMLSpreadsheet）；帶參數的屬性須直接以 IDispatch 取得"""
+        try:
+            import pythoncom
+
+            ole = rng._oleobj_
+            dispid = ole.GetIDsOfNames("Value")
+            return ole.Invoke(dispid, 0, pythoncom.DISPATCH_PROPERTYGET, True, 11)
+        except Exception:
+            return None
+
+    def export_sheet(self, sheet, pdf_path: Path):
+        sheet.ExportAsFixedFormat(
+            Type=0,  # xlTypePDF
+            Filename=str(pdf_path),
+            OpenAfterPublish=False
+        )
+
+
+# --------------------------------------------------
+# 直接讀取 .xlsx + reportlab 繪製
+# --------------------------------------------------
+
+RENDER_FONT = "MSung-Light"  # reportlab 內建繁中 CID 字型，不需字型檔
+
+_PAPER_SIZES = {
+    1: (612.0, 792.0),     # Letter
+    8: (841.89, 1190.55),  # A3
+    9: (595.28, 841.89),   # A4
+}
+_DEFAULT_COL_WIDTH = 8.43   # 字元數
+_DEFAULT_ROW_HEIGHT = 15.0  # pt
+_CELL_PAD = 2.0
+
+
+def _col_width_pt(chars: float) -> float:
+    """Excel 欄寬（字元數）→ pt：像素約 chars * 7 + 5，1 px = 0.75 pt"""
+    return (chars * 7 + 5) * 0.75
+
+
+def _parse_ref_range(ref: str):
+    """'$A$1:$H$40' → (min_col, min_row, max_col, max_row)"""
+    from openpyxl.utils.cell import range_boundaries
+
+    return range_boundaries(ref.replace("$", ""))
+
+
+def _print_range(ws):
+    """列印範圍；未設定時使用已用範圍"""
+    area = ws.print_area
+    if area:
+        # 可能有多個範圍（以逗號分隔），只取第一個
+        first = area.split(",")[0]
+        return _parse_ref_range(first.split("!")[-1])
+    return _parse_ref_range(ws.calculate_dimension())
+
+
+def _print_title_rows(ws):
+    rows = ws.print_title_rows
+    if not rows:
+        return []
+    start, _, end = rows.replace("$", "").partition(":")
+    return list(range(int(start), int(end or start) + 1))
+
+
+def _format_value(cell) -> str:
+    v = cell.value
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, datetime):
+        return v.strftime("%Y/%m/%d %H:%M") if (v.hour or v.minute) else v.strftime("%Y/%m/%d")
+    if isinstance(v, date):
+        return v.strftime("%Y/%m/%d")
+    if isinstance(v, time):
+        return v.strftime("%H:%M")
+    if isinstance(v, (int, float)):
+        fmt = cell.number_format or "General"
+        if fmt == "General":
+            return f"{v:.10g}" if isinstance(v, float) else str(v)
+        m = re.search(r"0\.(0+)", fmt)
+        decimals = len(m.group(1)) if m else 0
+        if "%" in fmt:
+            return f"{v * 100:.{decimals}f}%"
+        if "," in fmt:
+            return f"{v:,.{decimals}f}"
+        return f"{v:.{decimals}f}"
+    return str(v)
+
+
+class XlsxRenderBackend(ExportBackend):
+    """
+    不依賴 Excel 的匯出：
+    - 儲存格值使用活頁簿中快取的計算結果（data_only）
+    - 支援列印範圍、列印標題列、合併儲存格、隱藏列欄、框線、
+      對齊、紙張方向 / 大小、邊界、縮放與「調整為 N 頁寬」、手動分頁
+    版面為近似 Excel 的結果，不保證逐點相同
+    """
+
+    name = "xlsx"
+
+    def __init__(self, font_name: str = RENDER_FONT):
+        self.font_name = font_name
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(UnicodeCIDFont(self.font_name))
+        self._started = True
+
+    def for_worker(self):
+        return XlsxRenderBackend(self.font_name)
+
+    def sheet_fingerprint(self, sheet):
+        ws = sheet
+        setup = ws.page_setup
+        margins = ws.page_margins
+        props = ws.sheet_properties.pageSetUpPr
+        parts = [
+            [
+                (c.coordinate, c.value, c.number_format, c.font.sz if c.font is not None else None,
+                 c.alignment.horizontal if c.alignment is not None else None,
+                 repr(c.border) if c.has_style else None)
+                for row in ws.iter_rows() for c in row if c.value is not None or c.has_style
+            ],
+            sorted(str(r) for r in ws.merged_cells.ranges),
+            sorted((k, d.width, d.hidden, d.min, d.max) for k, d in ws.column_dimensions.items()),
+            sorted((k, d.height, d.hidden) for k, d in ws.row_dimensions.items()),
+            ws.print_area, ws.print_title_rows,
+            setup.orientation, setup.paperSize, setup.scale, setup.fitToWidth, setup.fitToHeight,
+            props.fitToPage if props is not None else None,
+            margins.left, margins.right, margins.top, margins.bottom,
+            ws.print_options.horizontalCentered,
+            [b.id for b in ws.row_breaks.brk], [b.id for b in ws.col_breaks.brk],
+            self.font_name,
+        ]
+        return repr(parts).encode("utf-8")
+
+    def open_workbook(self, excel_path: Path):
+        import openpyxl
+
+        return openpyxl.load_workbook(str(excel_path), data_only=True)
+
+    def close_workbook(self, wb):
+        wb.close()
+
+    def iter_sheets(self, wb):
+        return list(wb.worksheets)
+
+    def sheet_name(self, sheet) -> str:
+        return sheet.title
+
+    def get_title(self, sheet, max_cols=80) -> str:
+        # 不可超出已用範圍：iter_rows 會建立不存在的儲存格，使已用範圍變大
+        max_col = min(max_cols, sheet.max_column)
+        for row in sheet.iter_rows(min_row=1, max_row=1, max_col=max_col, values_only=True):
+            return title_from_xlsx_values(row)
+        return ""
+
+    # ---------- 版面計算 ----------
+
+    def _layout(self, ws):
+        min_col, min_row, max_col, max_row = _print_range(ws)
+
+        default_w = ws.sheet_format.defaultColWidth or _DEFAULT_COL_WIDTH
+        widths, hidden_cols = {}, set()
+        for dim in ws.column_dimensions.values():
+            if dim.min is None:
+                continue
+            for idx in range(dim.min, dim.max + 1):
+                if dim.hidden:
+                    hidden_cols.add(idx)
+                if dim.customWidth and dim.width:
+                    widths[idx] = dim.width
+
+        default_h = ws.sheet_format.defaultRowHeight or _DEFAULT_ROW_HEIGHT
+        cols = [c for c in range(min_col, max_col + 1) if c not in hidden_cols]
+        rows = []
+        heights = {}
+        for r in range(min_row, max_row + 1):
+            dim = ws.row_dimensions.get(r)
+            if dim is not None and dim.hidden:
+                continue
+            rows.append(r)
+            heights[r] = (dim.height if dim is not None and dim.height else default_h)
+
+        col_w = {c: _col_width_pt(widths.get(c, default_w)) for c in cols}
+        return cols, rows, col_w, heights
+
+    def _page_geometry(self, ws):
+        setup = ws.page_setup
+        paper = _PAPER_SIZES.get(int(setup.paperSize or 9), _PAPER_SIZES[9])
+        if setup.orientation == "landscape":
+            paper = (paper[1], paper[0])
+
+        margins = ws.page_margins
+        left = (margins.left if margins.left is not None else 0.7) * 72
+        right = (margins.right if margins.right is not None else 0.7) * 72
+        top = (margins.top if margins.top is not None else 0.75) * 72
+        bottom = (margins.bottom if margins.bottom is not None else 0.75) * 72
+        return paper, (left, right, top, bottom)
+
+    @staticmethod
+    def _split(items, sizes, avail, breaks=()):
+        """依可用長度與手動分頁切段"""
+        chunks, cur, used = [], [], 0.0
+        for it in items:
+            size = sizes[it]
+            if cur and (used + size > avail or it in breaks):
+                chunks.append(cur)
+                cur, used = [], 0.0
+            cur.append(it)
+            used += size
+        if cur:
+            chunks.append(cur)
+        return chunks
+
+    def _paginate(self, ws) -> dict:
+        """分頁結果：欄 / 列切段、列印標題列、縮放與版面尺寸（匯出與頁數預估共用）"""
+        cols, rows, col_w, row_h = self._layout(ws)
+        (page_w, page_h), (m_left, m_right, m_top, m_bottom) = self._page_geometry(ws)
+        avail_w = page_w - m_left - m_right
+        avail_h = page_h - m_top - m_bottom
+
+        title_rows = [r for r in _print_title_rows(ws) if r in row_h]
+        body_rows = [r for r in rows if r not in title_rows]
+        title_h = sum(row_h[r] for r in title_rows)
+
+        # 縮放
+        scale = (ws.page_setup.scale or 100) / 100.0
+        props = ws.sheet_properties.pageSetUpPr
+        if props is not None and props.fitToPage:
+            total_w = sum(col_w.values()) or 1.0
+            total_h = sum(row_h.values()) or 1.0
+            fit_w = ws.page_setup.fitToWidth
+            fit_h = ws.page_setup.fitToHeight
+            fit_w = 1 if fit_w is None else int(fit_w)
+            fit_h = 1 if fit_h is None else int(fit_h)
+            scale = 1.0
+            if fit_w > 0:
+                scale = min(scale, avail_w * fit_w / total_w)
+            if fit_h > 0:
+                scale = min(scale, avail_h * fit_h / total_h)
+
+        row_breaks = {brk.id + 1 for brk in ws.row_breaks.brk}
+        col_breaks = {brk.id + 1 for brk in ws.col_breaks.brk}
+
+        col_chunks = self._split(cols, col_w, avail_w / scale, col_breaks)
+        row_chunks = self._split(body_rows, row_h, avail_h / scale - title_h, row_breaks)
+        if not row_chunks:
+            row_chunks = [[]]
+        return {
+            "col_chunks": col_chunks, "row_chunks": row_chunks, "title_rows": title_rows,
+            "col_w": col_w, "row_h": row_h, "scale": scale,
+            "page": (page_w, page_h), "margins": (m_left, m_right, m_top, m_bottom),
+        }
+
+    def predict_pages(self, ws) -> int:
+        """
+        不繪製、只依分頁結果預估頁數（Excel 的順序：先往下、再往右）
+        沒有任何值的頁面會在空白頁清理時移除，因此不計入
+        只走訪已存在的儲存格（iter_rows 會替範圍內每一格建立物件），每格一次
+        """
+        layout = self._paginate(ws)
+        col_chunk = {c: k for k, cols in enumerate(layout["col_chunks"]) for c in cols}
+        row_chunk = {r: k for k, rows in enumerate(layout["row_chunks"]) for r in rows}
+        title_rows = set(layout["title_rows"])
+        n_rows = len(layout["row_chunks"])
+
+        filled = set()  # (欄切段, 列切段)
+        for (r, c), cell in ws._cells.items():
+            ci = col_chunk.get(c)
+            if ci is None or is_blank(cell.value):
+                continue
+            if r in title_rows:
+                # 列印標題列每頁都印
+                filled.update((ci, ri) for ri in range(n_rows))
+            elif r in row_chunk:
+                filled.add((ci, row_chunk[r]))
+        return len(filled)
+
+    # ---------- 繪製 ----------
+
+    def export_sheet(self, sheet, pdf_path: Path):
+        from reportlab.pdfgen import canvas
+
+        ws = sheet
+        layout = self._paginate(ws)
+        col_w, row_h = layout["col_w"], layout["row_h"]
+        title_rows, scale = layout["title_rows"], layout["scale"]
+        page_w, page_h = layout["page"]
+        m_left, m_right, m_top, _ = layout["margins"]
+        avail_w = page_w - m_left - m_right
+
+        merged = {}
+        covered = set()
+        for rng in ws.merged_cells.ranges:
+            merged[(rng.min_row, rng.min_col)] = (rng.max_row, rng.max_col)
+            for r in range(rng.min_row, rng.max_row + 1):
+                for c in range(rng.min_col, rng.max_col + 1):
+                    if (r, c) != (rng.min_row, rng.min_col):
+                        covered.add((r, c))
+
+        centered = bool(ws.print_options.horizontalCentered)
+
+        c = canvas.Canvas(str(pdf_path), pagesize=(page_w, page_h))
+        # Excel 預設「先往下、再往右」
+        for chunk_cols in layout["col_chunks"]:
+            for chunk_rows in layout["row_chunks"]:
+                page_rows = title_rows + chunk_rows
+                used_w = sum(col_w[col] for col in chunk_cols) * scale
+                x0 = m_left + ((avail_w - used_w) / 2 if centered else 0)
+                c.saveState()
+                c.translate(x0, page_h - m_top)
+                c.scale(scale, scale)
+                self._draw_block(c, ws, page_rows, chunk_cols, col_w, row_h, merged, covered)
+                c.restoreState()
+                c.showPage()
+        c.save()
+
+    def _draw_block(self, c, ws, page_rows, page_cols, col_w, row_h, merged, covered):
+        """原點在區塊左上角，y 向下為負"""
+        xs, x = {}, 0.0
+        for col in page_cols:
+            xs[col] = x
+            x += col_w[col]
+        ys, y = {}, 0.0
+        for r in page_rows:
+            ys[r] = y
+            y -= row_h[r]
+
+        for r in page_rows:
+            for col in page_cols:
+                if (r, col) in covered:
+                    continue
+                cell = ws.cell(row=r, column=col)
+                cx, cy = xs[col], ys[r]
+                w, h = col_w[col], row_h[r]
+
+                if (r, col) in merged:
+                    max_r, max_c = merged[(r, col)]
+                    w = sum(col_w[cc] for cc in page_cols if col <= cc <= max_c)
+                    h = sum(row_h[rr] for rr in page_rows if r <= rr <= max_r)
+                    self._draw_borders(c, ws.cell(row=max_r, column=max_c).border, cx, cy, w, h,
+                                       sides=("right", "bottom"))
+                    self._draw_borders(c, cell.border, cx, cy, w, h, sides=("left", "top"))
+                else:
+                    self._draw_borders(c, cell.border, cx, cy, w, h)
+
+                text = _format_value(cell)
+                if text:
+                    self._draw_text(c, cell, text, cx, cy, w, h)
+
+    @staticmethod
+    def _draw_borders(c, border, x, y, w, h, sides=("left", "right", "top", "bottom")):
+        if border is None:
+            return
+        lines = {
+            "left": (x, y, x, y - h),
+            "right": (x + w, y, x + w, y - h),
+            "top": (x, y, x + w, y),
+            "bottom": (x, y - h, x + w, y - h),
+        }
+        for side in sides:
+            style = getattr(border, side).style
+            if not style:
+                continue
+            c.setLineWidth(1.5 if style in ("medium", "thick", "double") else 0.5)
+            c.line(*lines[side])
+
+    def _draw_text(self, c, cell, text, x, y, w, h):
+        size = float(cell.font.sz or 11) if cell.font is not None else 11.0
+        c.setFont(self.font_name, size)
+
+        align = cell.alignment.horizontal if cell.alignment is not None else None
+        if align in (None, "general"):
+            align = "right" if isinstance(cell.value, (int, float)) and not isinstance(cell.value, bool) else "left"
+
+        valign = cell.alignment.vertical if cell.alignment is not None else None
+        if valign == "top":
+            ty = y - size - _CELL_PAD
+        elif valign == "center":
+            ty = y - h / 2 - size * 0.35
+        else:
+            ty = y - h + _CELL_PAD + size * 0.2
+
+        if align in ("center", "centerContinuous", "distributed", "justify"):
+            c.drawCentredString(x + w / 2, ty, text)
+        elif align == "right":
+            c.drawRightString(x + w - _CELL_PAD, ty, text)
+        else:
+            c.drawString(x + _CELL_PAD, ty, text)
+
+
+# --------------------------------------------------
+# 替身後端（測試 / 效能量測用）
+# --------------------------------------------------
+
+class SimulatedBackend(ExportBackend):
+    """
+    不需 Excel 的替身：以 openpyxl 唯讀模式讀取儲存格值，
+    每張工作表等待 latency 秒模擬 Excel 匯出，再輸出多頁表格 PDF
+    - rows_per_page：每頁列數，頁數 = ceil(列數 / rows_per_page)
+    - 只有格式、沒有值的列照樣畫框線但不畫文字（同 Excel 會多印出空白頁）
+    - blank_pages：每張工作表尾端另外附加的空白頁數
+    - hang_sheets：{工作表名稱: 次數}，這些工作表的前幾次匯出會卡住，直到 kill()
+                   （模擬 Excel 卡在印表機對話框，供看門狗測試）
+    """
+
+    name = "simulated"
+    max_cols = 12
+
+    def __init__(self, latency: float = 0.0, rows_per_page: int = 40, blank_pages: int = 0,
+                 font_name: str = "MSung-Light", hang_sheets=None):
+        self.latency = latency
+        self.rows_per_page = rows_per_page
+        self.blank_pages = blank_pages
+        self.font_name = font_name
+        self.hang_sheets = dict(hang_sheets or {})
+        self._killed = False
+
+    def start(self):
+        self._killed = False
+
+    def is_alive(self) -> bool:
+        return not self._killed
+
+    def kill(self) -> bool:
+        self._killed = True
+        return True
+
+    def open_workbook(self, excel_path: Path):
+        import openpyxl
+
+        wb = openpyxl.load_workbook(str(excel_path), read_only=True, data_only=True)
+        try:
+            sheets = []
+            for ws in wb.worksheets:
+                rows = [
+                    tuple(_format_value(cell) for cell in row)
+                    for row in ws.iter_rows(max_col=self.max_cols)
+                ]
+                first_row = next(ws.iter_rows(min_row=1, max_row=1, max_col=80, values_only=True), ())
+                sheets.append({
+                    "name": ws.title,
+                    "title": title_from_xlsx_values(first_row),
+                    "rows": rows,
+                })
+            return sheets
+        finally:
+            wb.close()
+
+    def close_workbook(self, wb):
+        pass
+
+    def iter_sheets(self, wb):
+        return list(wb)
+
+    def sheet_name(self, sheet) -> str:
+        return sheet["name"]
+
+    def get_title(self, sheet) -> str:
+        return sheet["title"]
+
+    def sheet_fingerprint(self, sheet):
+        return repr((sheet, self.rows_per_page, self.blank_pages)).encode("utf-8")
+
+    def export_sheet(self, sheet, pdf_path: Path):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfgen import canvas
+
+        if self.hang_sheets.get(sheet["name"], 0) > 0:
+            self.hang_sheets[sheet["name"]] -= 1
+            while not self._killed:
+                _time.sleep(0.05)
+        if self._killed:
+            raise RuntimeError("後端已被終止")
+
+        if self.latency:
+            _time.sleep(self.latency)
+
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+            pdfmetrics.registerFont(UnicodeCIDFont(self.font_name))
+
+        rows = sheet["rows"]
+        ncols = max((len(r) for r in rows), default=1) or 1
+        page_w, page_h = A4
+        left, top, row_h = 36, page_h - 40, 18
+        col_w = (page_w - 2 * left) / ncols
+
+        c = canvas.Canvas(str(pdf_path), pagesize=A4)
+        for start in range(0, max(len(rows), 1), self.rows_per_page):
+            chunk = rows[start:start + self.rows_per_page]
+            c.setFont(self.font_name, 9)
+            c.setLineWidth(0.5)
+            for i, row in enumerate(chunk):
+                y = top - (i + 1) * row_h
+                for k in range(ncols):
+                    c.rect(left + k * col_w, y, col_w, row_h)
+                    text = row[k] if k < len(row) else ""
+                    if text:
+                        c.drawString(left + k * col_w + 2, y + 5, text[:24])
+            c.showPage()
+        for _ in range(self.blank_pages):
+            c.showPage()
+        c.save()
+
+
+# --------------------------------------------------
+# 取得後端
+# --------------------------------------------------
+
+# 預設匯出後端：com（Excel）或 xlsx（不需 Excel）；可用環境變數 EXCEL_PDF_BACKEND 切換
+# 放在這裡（而非 excel_to_pdf_with_bookmarks）是為了讓 GUI 不必在啟動時載入 pypdf / reportlab
+DEFAULT_BACKEND = os.environ.get("EXCEL_PDF_BACKEND", "com")
+
+BACKENDS = {
+    ExcelComBackend.name: ExcelComBackend,
+    XlsxRenderBackend.name: XlsxRenderBackend,
+    SimulatedBackend.name: SimulatedBackend,
+}
+
+
+def get_backend(backend=None) -> ExportBackend:
+    """
+    backend 可為：
+    - None：使用預設（com）
+    - 字串：BACKENDS 中的名稱
+    - ExportBackend 類別或實例
+    """
+    if backend is None:
+        backend = ExcelComBackend.name
+    if isinstance(backend, str):
+        try:
+            backend = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(f"未知的匯出後端：{backend}（可用：{', '.join(BACKENDS)}）") from None
+    if isinstance(backend, type):
+        backend = backend()
+    return backend
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+工作表匯出的看門狗
+- 每張工作表的匯出有時限：超過時限就強制終止後端（ExportBackend.kill，
+  Excel 卡在印表機驅動程式的對話框時，COM 呼叫會因此立即失敗返回）
+- 呼叫端重新啟動後端、重新開啟活頁簿後重試，超過重試次數即略過該工作表
+- 無法終止的後端（kill 回傳 False，例如連到使用者自己開啟的 Excel）：
+  不重新啟動也不重試，匯出返回後直接略過該工作表
+- 整體時限（deadline）：到期後剩下的工作表一律略過，每張的時限也不會超過剩餘時間，
+  匯出階段最長的執行時間因此有上限
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SheetTimeout(Exception):
+    """單張工作表匯出超過時限；killed：後端是否已被強制終止"""
+
+    def __init__(self, sheet_name: str, timeout: float, killed: bool = True):
+        super().__init__(f"{sheet_name} 匯出超過 {timeout:g} 秒")  # 未滿 1 秒不顯示成 0
+        self.sheet_name = sheet_name
+        self.timeout = timeout
+        self.killed = killed
+
+
+class ExportWatchdog:
+    """
+    用法：
+        watchdog = ExportWatchdog(sheet_timeout=300, retries=1, deadline_s=3600)
+        with watchdog.guard(backend, sheet_name):
+            backend.export_sheet(ws, pdf_path)      # 逾時 → SheetTimeout
+
+    只含數值，可 pickle，平行匯出的子行程共用同一個整體時限
+    sheet_timeout：每張工作表的秒數，0 / None = 不限
+    deadline_s：從建立起算的整體秒數，0 / None = 不限
+    """
+
+    def __init__(self, sheet_timeout: float = None, retries: int = 1, deadline_s: float = None):
+        self.sheet_timeout = sheet_timeout or None
+        self.retries = max(0, retries)
+        # 以 time.time() 記錄，子行程也能使用同一個到期時間
+        self.deadline = time.time() + deadline_s if deadline_s else None
+
+    def remaining(self):
+        """距整體時限的秒數；不限時回傳 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout_for_next(self):
+        """下一張工作表的時限：每張的時限與整體剩餘時間取較小者；都不限時回傳 None"""
+        limits = [t for t in (self.sheet_timeout, self.remaining()) if t is not None]
+        return min(limits) if limits else None
+
+    @contextmanager
+    def guard(self, backend, sheet_name: str):
+        """
+        時限內未完成就呼叫 backend.kill()，並以 SheetTimeout 取代原本的例外
+        kill() 回傳 False 時無法中斷匯出，返回後同樣丟出 SheetTimeout（killed=False）
+        """
+        timeout = self.timeout_for_next()
+        if timeout is None:
+            yield
+            return
+
+        fired = threading.Event()
+        killed = []
+
+        def fire():
+            fired.set()
+            killed.append(backend.kill())
+
+        timer = threading.Timer(timeout, fire)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        except Exception as e:
+            if fired.is_set():
+                timer.join()
+                raise SheetTimeout(sheet_name, timeout, all(killed)) from e
+            raise
+        finally:
+            timer.cancel()
+        if fired.is_set():
+            # 剛好在時限到時完成（後端已被終止），或後端無法終止：仍視為逾時
+            timer.join()
+            raise SheetTimeout(sheet_name, timeout, all(killed))
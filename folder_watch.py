@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+監看資料夾中的活頁簿變更（不需額外套件，定期比對修改時間與大小）
+- Excel 存檔時會連續寫入好幾次：檔案變更後要安靜 debounce 秒才算「存好了」
+- 忽略 ~$ 開頭的鎖定檔（與 legacy_main 相同）
+
+用法：
+    watcher = FolderWatcher(folder, debounce=2.0)
+    while True:
+        changed, ready = watcher.poll()
+        # changed：這次輪詢發現有變動的活頁簿（可用來取消正在進行的舊版本轉換）
+        # ready：變動後已安靜 debounce 秒、可以重新轉換的活頁簿
+        time.sleep(1)
+"""
+
+import time
+from pathlib import Path
+
+WATCH_PATTERNS = ("*.xlsx", "*.xlsm")
+
+
+class FolderWatcher:
+    def __init__(self, folder, debounce: float = 2.0, patterns=WATCH_PATTERNS):
+        self.folder = Path(folder)
+        self.debounce = debounce
+        self.patterns = patterns
+        # 開始監看時已存在的檔案不算變更
+        self.snapshot = self._scan()
+        self.pending = {}  # 路徑 → 最後一次看到變動的時間
+
+    def _scan(self) -> dict:
+        """{路徑: (mtime_ns, size)}"""
+        state = {}
+        for pattern in self.patterns:
+            for path in self.folder.glob(pattern):
+                if path.name.startswith("~$"):
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue  # 存檔途中暫時不存在
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def poll(self, now: float = None):
+        """回傳 (changed, ready)，兩者皆為路徑清單（依名稱排序）"""
+        now = time.monotonic() if now is None else now
+        state = self._scan()
+
+        changed = sorted(p for p, sig in state.items() if self.snapshot.get(p) != sig)
+        for path in changed:
+            self.pending[path] = now
+        # 刪除（或改名）的檔案不必再轉換
+        for path in list(self.pending):
+            if path not in state:
+                del self.pending[path]
+        self.snapshot = state
+
+        ready = sorted(p for p, t in self.pending.items() if now - t >= self.debounce)
+        for path in ready:
+            del self.pending[path]
+        return changed, ready
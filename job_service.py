@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+本機轉檔服務（多位同仁共用一台裝有 Excel 的主機，不必各自在桌機上開 Excel）
+- 標準函式庫的 HTTP 伺服器：上傳活頁簿與編製日期 → 排入佇列 → 背景 worker 轉檔 → 下載 PDF
+- 佇列存在磁碟：每個工作一個目錄（活頁簿、job.json、輸出 PDF 與執行紀錄），
+  服務重新啟動後，尚未完成的工作重新排隊
+- worker 數可設定；每個 worker 各自一個常駐的匯出後端（session_pool.SessionPool，
+  COM 後端即獨立的 Excel 行程），彼此同時轉檔
+- --backend simulated 可在沒有 Excel 的電腦上測試整個流程
+
+API：
+    POST /jobs?date=114年11月編製&name=報表.xlsx   內容為活頁簿本身
+                                                   → 202 {"id": ..., "status": "queued", ...}
+    GET  /jobs                                     所有工作（新的在前）
+    GET  /jobs/<id>                                單一工作：狀態、進度、排隊 / 執行秒數、各階段秒數
+    GET  /jobs/<id>/pdf                            下載結果（status 為 done 時）
+
+用法：
+    python job_service.py --port 8765 --workers 2 --jobs-dir D:\\pdf_jobs
+    curl --data-binary @報表.xlsx "http://127.0.0.1:8765/jobs?date=114年11月編製&name=報表.xlsx"
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlsplit
+
+from cache_paths import cache_base
+from export_backends import DEFAULT_BACKEND, get_backend
+from run_trace import ProgressEstimator, Tracer
+from session_pool import SessionPool
+
+DEFAULT_PORT = int(os.environ.get("EXCEL_PDF_SERVICE_PORT", "8765"))
+DEFAULT_WORKERS = int(os.environ.get("EXCEL_PDF_SERVICE_WORKERS", "2"))
+# 上傳的活頁簿大小上限
+MAX_UPLOAD_BYTES = int(os.environ.get("EXCEL_PDF_SERVICE_MAX_MB", "100")) * 1024 * 1024
+
+_EXCEL_SUFFIXES = (".xlsx", ".xlsm", ".xls")
+_DATE_PATTERN = re.compile(r"\d{3}年\d{1,2}月編製")
+_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]+$")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# --------------------------------------------------
+# 工作佇列（存在磁碟）
+# --------------------------------------------------
+
+class JobStore:
+    """
+    檔案配置：
+        <jobs_dir>/<id>/job.json        狀態（每次變更都整份改寫，先寫暫存檔再 os.replace）
+        <jobs_dir>/<id>/<活頁簿檔名>     上傳的活頁簿
+        <jobs_dir>/<id>/<主檔名>_merged.pdf / .run.json   run() 的輸出
+    """
+
+    def __init__(self, jobs_dir):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.jobs = {}
+        for meta in self.jobs_dir.glob("*/job.json"):
+            try:
+                job = json.loads(meta.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            self.jobs[job["id"]] = job
+
+    def create(self, name: str, compile_date: str, data: bytes) -> dict:
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir()
+        (job_dir / name).write_bytes(data)
+        job = {
+            "id": job_id,
+            "name": name,
+            "compile_date": compile_date,
+            "status": "queued",
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "queue_s": None,
+            "run_s": None,
+            "stages": {},
+            "error": None,
+            "output": None,
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._save(job)
+        return job
+
+    def update(self, job_id: str, **fields) -> dict:
+        with self._lock:
+            job = self.jobs[job_id]
+            job.update(fields)
+            self._save(job)
+            return dict(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def all(self):
+        with self._lock:
+            return sorted((dict(job) for job in self.jobs.values()),
+                          key=lambda job: job["created_at"], reverse=True)
+
+    def unfinished(self):
+        """排隊中或執行到一半（服務中斷）的工作，依建立順序"""
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if job["status"] in ("queued", "running")]
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def _save(self, job: dict):
+        path = self.job_dir(job["id"]) / "job.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(job, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# --------------------------------------------------
+# worker
+# --------------------------------------------------
+
+class JobService:
+    """
+    用法：
+        service = JobService("D:/pdf_jobs", workers=2, backend="com")
+        service.start()
+        job = service.submit("報表.xlsx", "114年11月編製", data)
+        ...
+        service.stop()
+    """
+
+    def __init__(self, jobs_dir, workers: int = None, backend=None):
+        self.store = JobStore(jobs_dir)
+        self.workers = max(1, DEFAULT_WORKERS if workers is None else workers)
+        self.backend = DEFAULT_BACKEND if backend is None else backend
+        self.progress = {}  # id → 0~100（只在記憶體，不寫入 job.json）
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pools = []
+
+    def start(self):
+        for job in self.store.unfinished():
+            if job["status"] == "running":
+                print(f"[info] 工作 {job['id']} 上次未完成，重新排隊")
+                self.store.update(job["id"], status="queued", started_at=None)
+            self._queue.put(job["id"])
+
+        for k in range(self.workers):
+            # 每個 worker 一個獨立的後端（COM：DispatchEx 啟動的獨立 Excel）
+            pool = SessionPool(lambda: get_backend(self.backend).for_worker())
+            pool.start()
+            thread = threading.Thread(target=self._loop, args=(pool,), name=f"job-worker-{k}",
+                                      daemon=True)
+            thread.start()
+            self._pools.append(pool)
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """不再取新工作（排隊中的留到下次啟動）；執行中的工作做完後關閉各 worker 的後端"""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        for pool in self._pools:
+            pool.close(timeout)
+        self._threads.clear()
+        self._pools.clear()
+
+    def submit(self, name: str, compile_date: str, data: bytes) -> dict:
+        """
+        name：活頁簿檔名（只取檔名部分）；compile_date：例如 114年11月編製
+        格式不符時丟出 ValueError
+        """
+        name = Path(name or "").name
+        if not name.lower().endswith(_EXCEL_SUFFIXES) or name.startswith("~$"):
+            raise ValueError(f"不是 Excel 活頁簿：{name or '（未指定檔名）'}")
+        if not _DATE_PATTERN.fullmatch(compile_date or ""):
+            raise ValueError("編製日期格式錯誤，請使用格式：114年11月編製")
+        if not data:
+            raise ValueError("活頁簿內容是空的")
+        job = self.store.create(name, compile_date, data)
+        self._queue.put(job["id"])
+        return job
+
+    def status(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is not None and job["status"] == "running":
+            job["progress"] = self.progress.get(job_id)
+        return job
+
+    def output_path(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != "done" or not job["output"]:
+            return None
+        return self.store.job_dir(job_id) / job["output"]
+
+    def _loop(self, pool):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping.is_set():
+                break
+            self._process(job_id, pool)
+
+    def _process(self, job_id: str, pool):
+        # 延後載入：轉換引擎（pypdf、reportlab）只在真的要轉檔時才需要
+        from excel_to_pdf_with_bookmarks import run
+
+        job = self.store.get(job_id)
+        excel_path = self.store.job_dir(job_id) / job["name"]
+        started = time.time()
+        created = datetime.fromisoformat(job["created_at"]).timestamp()
+        self.store.update(job_id, status="running", started_at=_now(),
+                          queue_s=round(max(0.0, started - created), 3))
+
+        estimator = ProgressEstimator()
+
+        def progress(event):
+            estimator.update(event)
+            self.progress[job_id] = round(estimator.fraction * 100, 1)
+
+        tracer = Tracer(progress=progress)
+        fields = {}
+        try:
+            output_pdf = pool.run(lambda backend: run(excel_path, job["compile_date"],
+                                                      backend=backend, tracer=tracer))
+            fields = {"status": "done", "output": Path(output_pdf).name}
+        except Exception as e:
+            fields = {"status": "failed", "error": str(e)}
+        finally:
+            self.progress.pop(job_id, None)
+            stages = {name: round(t["wall_s"], 3) for name, t in tracer.totals().items()}
+            job = self.store.update(job_id, finished_at=_now(),
+                                    run_s=round(time.time() - started, 3), stages=stages, **fields)
+        print(f"[{job['status']}] {job_id} {job['name']}（{job['run_s']:.1f} 秒）")
+
+
+# --------------------------------------------------
+# HTTP
+# --------------------------------------------------
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """self.server.service 為 JobService"""
+
+    server_version = "HealthStatsPdf/1.0"
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            return self._json(404, {"error": "找不到"})
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return self._json(411, {"error": "需要 Content-Length 與活頁簿內容"})
+        if length > MAX_UPLOAD_BYTES:
+            return self._json(413, {"error": f"活頁簿超過 {MAX_UPLOAD_BYTES // 1024 // 1024} MB"})
+        data = self.rfile.read(length)
+
+        try:
+            job = self.server.service.submit(query.get("name"), query.get("date"), data)
+        except ValueError as e:
+            return self._json(400, {"error": str(e)})
+        self._json(202, job, location=f"/jobs/{job['id']}")
+
+    def do_GET(self):
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        service = self.server.service
+
+        if parts == ["jobs"]:
+            return self._json(200, service.store.all())
+        if len(parts) < 2 or parts[0] != "jobs" or not _ID_PATTERN.match(parts[1]):
+            return self._json(404, {"error": "找不到"})
+
+        job_id = parts[1]
+        job = service.status(job_id)
+        if job is None:
+            return self._json(404, {"error": f"沒有這個工作：{job_id}"})
+        if len(parts) == 2:
+            return self._json(200, job)
+        if parts[2:] == ["pdf"]:
+            path = service.output_path(job_id)
+            if path is None or not path.exists():
+                return self._json(409, {"error": f"工作尚未完成（{job['status']}）"})
+            return self._file(path)
+        self._json(404, {"error": "找不到"})
+
+    def _json(self, code: int, body, location: str = None):
+        data = json.dumps(body, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if location:
+            self.send_header("Location", location)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _file(self, path: Path):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(path.name)}")
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+
+def make_server(service: JobService, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.service = service
+    return server
+
+
+def default_jobs_dir() -> Path:
+    """cache_paths.cache_base() 下的 jobs"""
+    return cache_base() / "jobs"
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Excel 多工作表 → PDF 轉檔服務")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="監聽位址（預設只接受本機；0.0.0.0 開放給區網）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="同時轉檔的數量（每個各自一個 Excel）")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND,
+                        help="匯出後端（com / xlsx / simulated）")
+    parser.add_argument("--jobs-dir", default=None, help="工作佇列目錄")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.jobs_dir or default_jobs_dir(), args.workers, args.backend)
+    service.start()
+    server = make_server(service, args.host, args.port)
+    print(f"轉檔服務：http://{args.host}:{args.port}/jobs（worker {service.workers} 個，"
+          f"後端 {args.backend}，佇列 {service.store.jobs_dir}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("停止中：等待執行中的工作完成...")
+        service.stop()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    # 平行匯出 / 管線模式的子行程需要
+    multiprocessing.freeze_support()
+    main()
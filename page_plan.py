@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+匯出前預估各工作表頁數（目次頁碼規劃）
+- 直接以 openpyxl 讀取 .xlsx / .xlsm，依列印範圍、列印標題列、手動分頁、
+  隱藏列欄、縮放與已用範圍分頁（與 xlsx 後端的版面計算相同，不繪製）
+- 沒有任何值的頁面視為會被空白頁清理移除，不計入
+- 只是預估：Excel 的實際分頁可能不同，匯出完成後須以實際頁數核對
+- 須完整載入活頁簿（列印設定在唯讀模式下讀不到），檔案太大時由 can_plan 排除
+
+用法：
+    predicted = predict_page_counts(xlsx_path)   # {工作表名稱: 預估頁數}
+"""
+
+from pathlib import Path
+
+PLANNABLE_SUFFIXES = (".xlsx", ".xlsm")
+
+
+def can_plan(excel_path, max_bytes: int = None) -> bool:
+    """.xlsx / .xlsm，且檔案不超過 max_bytes（None = 不限）"""
+    excel_path = Path(excel_path)
+    if excel_path.suffix.lower() not in PLANNABLE_SUFFIXES:
+        return False
+    if max_bytes is not None:
+        try:
+            return excel_path.stat().st_size <= max_bytes
+        except OSError:
+            return False
+    return True
+
+
+def predict_page_counts(excel_path) -> dict:
+    """{工作表名稱: 預估頁數}，依活頁簿中的順序"""
+    import openpyxl
+
+    from export_backends import XlsxRenderBackend
+
+    layout = XlsxRenderBackend()
+    wb = openpyxl.load_workbook(str(excel_path), data_only=True)
+    try:
+        return {ws.title: layout.predict_pages(ws) for ws in wb.worksheets}
+    finally:
+        wb.close()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+輸出 PDF 線性化（Fast Web View）
+- 線性化的 PDF 把第一頁（封面）需要的物件、提示表（hint tables）放在檔案開頭，
+  瀏覽器邊下載邊顯示，不必等整份檔案下載完
+- pypdf 不支援線性化：有 pikepdf 就用 pikepdf，否則使用 PATH 上的 qpdf 指令
+- check_linearized 直接檢查檔案開頭的線性化參數字典，不需額外套件
+"""
+
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+# 線性化參數字典必須是檔案中的第一個物件，位於開頭 1024 bytes 內
+_HEADER_BYTES = 1024
+_FIRST_OBJ = re.compile(rb"\d+\s+\d+\s+obj\s*<<(.*?)>>", re.S)
+
+
+def _linearize_with_pikepdf(src: Path, dest: Path) -> bool:
+    try:
+        import pikepdf
+    except ImportError:
+        return False
+    with pikepdf.open(src) as pdf:
+        pdf.save(dest, linearize=True)
+    return True
+
+
+def _linearize_with_qpdf(src: Path, dest: Path) -> bool:
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        return False
+    proc = subprocess.run([qpdf, "--linearize", str(src), str(dest)],
+                          capture_output=True, text=True)
+    # qpdf 結束碼 3 = 成功但有警告
+    if proc.returncode not in (0, 3):
+        raise RuntimeError(f"qpdf 線性化失敗：{proc.stderr.strip()}")
+    return True
+
+
+def linearize_pdf(pdf_path: Path) -> Path:
+    """把 pdf_path 改寫成線性化 PDF（先寫暫存檔再取代），並檢查結果"""
+    pdf_path = Path(pdf_path)
+    tmp = pdf_path.with_suffix(".lin.pdf")
+    try:
+        if not (_linearize_with_pikepdf(pdf_path, tmp) or _linearize_with_qpdf(pdf_path, tmp)):
+            raise RuntimeError("輸出線性化需要 pikepdf（pip install pikepdf）或 qpdf 指令")
+        ok, reason = check_linearized(tmp)
+        if not ok:
+            raise RuntimeError(f"線性化結果檢查失敗：{reason}")
+        os.replace(tmp, pdf_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return pdf_path
+
+
+def check_linearized(pdf_path: Path) -> tuple:
+    """
+    檢查 PDF 是否為線性化檔案
+    - 第一個物件是 /Linearized 參數字典
+    - /L（檔案長度）與實際大小相同（線性化後又被修改、附加的檔案會不符）
+    - 有 /H（提示表位置）、/O（第一頁物件編號）、/N（頁數）
+    有 pikepdf 時另以 qpdf 的完整檢查確認提示表內容
+    回傳：(是否線性化, 原因說明)
+    """
+    pdf_path = Path(pdf_path)
+    with open(pdf_path, "rb") as f:
+        head = f.read(_HEADER_BYTES)
+    m = _FIRST_OBJ.search(head)
+    if m is None or b"/Linearized" not in m.group(1):
+        return False, "檔案開頭沒有線性化參數字典"
+    params = m.group(1)
+
+    length = re.search(rb"/L\s+(\d+)", params)
+    if length is None or int(length.group(1)) != pdf_path.stat().st_size:
+        return False, "線性化參數 /L 與檔案大小不符"
+    for key in (rb"/H", rb"/O", rb"/N"):
+        if re.search(re.escape(key) + rb"\s*[\[\d]", params) is None:
+            return False, f"線性化參數缺少 {key.decode()}"
+
+    try:
+        import pikepdf
+    except ImportError:
+        return True, "OK"
+    from io import StringIO
+
+    messages = StringIO()
+    with pikepdf.open(pdf_path) as pdf:
+        if not pdf.check_linearization(messages):
+            return False, f"提示表內容與檔案不符：{messages.getvalue().strip()}"
+    return True, "OK"
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+記憶體內交接的 PDF 緩衝區
+- 工作表 PDF（已清理空白頁）與目次直接以記憶體緩衝區交給下一個階段，
+  不必寫入暫存目錄再讀回；只有最後的輸出 PDF 寫入磁碟
+- 所有緩衝區合計超過 budget 後，新的緩衝區直接寫到暫存檔（spill），記憶體用量有上限
+- 各階段拿到的 PDF 可能是路徑（Path）或緩衝區，一律透過 pdf_source / pdf_size / pdf_bytes 存取
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+
+class PdfSpool:
+    """
+    用法：
+        spool = PdfSpool(64 * 1024 * 1024, temp_dir)
+        buf = spool.store(data)     # SpooledTemporaryFile
+        PdfReader(pdf_source(buf))
+        spool.close()
+    """
+
+    def __init__(self, budget: int, spill_dir=None):
+        self.budget = budget
+        self.spill_dir = str(spill_dir) if spill_dir is not None else None
+        self.in_memory = 0
+        self.spilled = 0
+        self._buffers = []
+
+    def store(self, data: bytes):
+        """存入一份 PDF，回傳可讀取的緩衝區（位置在開頭）"""
+        # max_size=0：不自動轉存，是否寫到暫存檔由總量決定
+        buf = tempfile.SpooledTemporaryFile(max_size=0, dir=self.spill_dir)
+        buf.write(data)
+        if self.in_memory + len(data) > self.budget:
+            buf.rollover()
+            self.spilled += len(data)
+        else:
+            self.in_memory += len(data)
+        buf.seek(0)
+        self._buffers.append(buf)
+        return buf
+
+    def close(self):
+        for buf in self._buffers:
+            buf.close()
+        self._buffers.clear()
+        self.in_memory = self.spilled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_buffer(pdf) -> bool:
+    return hasattr(pdf, "read")
+
+
+def pdf_source(pdf):
+    """給 PdfReader 的來源：路徑轉成字串，緩衝區倒回開頭"""
+    if is_buffer(pdf):
+        pdf.seek(0)
+        return pdf
+    return str(pdf)
+
+
+def pdf_size(pdf) -> int:
+    if is_buffer(pdf):
+        pos = pdf.tell()
+        pdf.seek(0, 2)
+        size = pdf.tell()
+        pdf.seek(pos)
+        return size
+    return Path(pdf).stat().st_size
+
+
+def pdf_bytes(pdf) -> bytes:
+    if is_buffer(pdf):
+        pdf.seek(0)
+        return pdf.read()
+    return Path(pdf).read_bytes()
+
+
+def copy_pdf(pdf, dest: Path):
+    """把路徑或緩衝區的內容寫到 dest"""
+    if is_buffer(pdf):
+        pdf.seek(0)
+        with open(dest, "wb") as f:
+            shutil.copyfileobj(pdf, f)
+    else:
+        shutil.copyfile(pdf, dest)
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+串流式 PDF 寫出器（記憶體用量與總頁數無關）
+- 每加入一份來源 PDF，就把它的頁面與相關物件立即寫入輸出檔，
+  接著丟棄該來源的所有物件，記憶體只需容納「目前這一份」
+- 最後才寫頁面樹、書籤、交互參照表（xref）與 trailer
+- 物件一律以一般物件寫出（不使用物件串流），與 PdfWriter 預設相同
+- dedup=True：內容相同的字型、圖片等物件（含其引用的子物件）整份輸出只寫一次，
+  未壓縮的串流改以 FlateDecode 壓縮；省下的位元組數記在 stats
+"""
+
+import copy
+import hashlib
+from io import BytesIO
+
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+    TextStringObject,
+)
+
+_CATALOG = 1
+_PAGES = 2
+
+# 未壓縮且不小於此大小的串流在 dedup 模式下改以 FlateDecode 壓縮
+_RECOMPRESS_MIN_BYTES = 256
+
+
+class _ObjectHasher:
+    """
+    來源 PDF 物件的內容雜湊（同一份 reader 內有效）
+    雜湊涵蓋物件本身與它引用的所有子物件（子物件以其雜湊代入），
+    所以不同來源中「整棵子樹相同」的物件才會得到相同的鍵
+    頁面、有 /Parent 的物件（註解、書籤）與循環引用不參與共用，回傳 None
+    """
+
+    def __init__(self):
+        self._memo = {}  # (idnum, generation) → (digest, 串流位元組數) 或 None
+        self._active = set()
+
+    def key(self, ref: IndirectObject):
+        """回傳 (digest, 子樹的串流位元組數)；不可共用時回傳 None"""
+        ident = (ref.idnum, ref.generation)
+        if ident in self._memo:
+            return self._memo[ident]
+        if ident in self._active:
+            return None  # 循環引用
+        self._active.add(ident)
+        try:
+            h = hashlib.sha256()
+            sizes = [0]
+            ok = self._feed(h, ref.get_object(), sizes)
+            result = (h.digest(), sizes[0]) if ok else None
+        finally:
+            self._active.discard(ident)
+        self._memo[ident] = result
+        return result
+
+    def _feed(self, h, obj, sizes) -> bool:
+        if isinstance(obj, IndirectObject):
+            child = self.key(obj)
+            if child is None:
+                return False
+            h.update(b"R")
+            h.update(child[0])
+            sizes[0] += child[1]
+            return True
+        if isinstance(obj, DictionaryObject):
+            if "/Parent" in obj or obj.get("/Type") in ("/Page", "/Pages"):
+                return False
+            h.update(b"S" if isinstance(obj, StreamObject) else b"D")
+            for k in sorted(obj.keys()):
+                h.update(k.encode("utf-8", "surrogatepass"))
+                if not self._feed(h, obj.raw_get(k), sizes):
+                    return False
+            if isinstance(obj, StreamObject):
+                data = obj._data or b""
+                h.update(len(data).to_bytes(8, "big"))
+                h.update(data)
+                sizes[0] += len(data)
+            h.update(b"E")
+            return True
+        if isinstance(obj, ArrayObject):
+            h.update(b"A")
+            for v in obj:
+                if not self._feed(h, v, sizes):
+                    return False
+            h.update(b"E")
+            return True
+        buf = BytesIO()
+        obj.write_to_stream(buf, None)
+        h.update(b"P")
+        h.update(buf.getvalue())
+        h.update(b" ")
+        return True
+
+
+class StreamingPdfWriter:
+    """
+    用法：
+        with open(path, "wb") as f:
+            w = StreamingPdfWriter(f)
+            w.add_pages(PdfReader(...))
+            ...
+            w.add_outline([("封面", 0), ...])
+            w.close()
+    dedup=True 時 stats 記錄共用的物件數（shared_objects）、因此省下的串流位元組
+    （dedup_bytes）與重新壓縮省下的位元組（recompress_bytes）
+    """
+
+    def __init__(self, stream, dedup: bool = False):
+        self.stream = stream
+        self.dedup = dedup
+        self.offsets = [None, None, None]  # 0 號保留；1 = Catalog、2 = 頁面樹根
+        self.page_refs = []
+        self._outline_ref = None
+        self._shared = {}  # 內容雜湊 → 輸出物件編號（跨來源 PDF）
+        self.stats = {"shared_objects": 0, "dedup_bytes": 0, "recompress_bytes": 0}
+        stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    # ---------- 物件 ----------
+
+    def _alloc(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def _write(self, num: int, obj):
+        if self.dedup:
+            obj = self._recompress(obj)
+        self.offsets[num] = self.stream.tell()
+        self.stream.write(f"{num} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self.stream, None)
+        self.stream.write(b"\nendobj\n")
+
+    def _recompress(self, obj):
+        """未壓縮的大串流改以 FlateDecode 寫出（變大就維持原樣）"""
+        if not isinstance(obj, StreamObject) or "/Filter" in obj:
+            return obj
+        data = obj._data or b""
+        if len(data) < _RECOMPRESS_MIN_BYTES:
+            return obj
+        encoded = obj.flate_encode()
+        saved = len(data) - len(encoded._data)
+        if saved <= 0:
+            return obj
+        self.stats["recompress_bytes"] += saved
+        return encoded
+
+    def add_object(self, obj) -> IndirectObject:
+        """立即寫出一個新物件，回傳其參照"""
+        num = self._alloc()
+        self._write(num, obj)
+        return IndirectObject(num, 0, self)
+
+    def content_stream(self, data: bytes) -> IndirectObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return self.add_object(stream)
+
+    # ---------- 複製來源 PDF ----------
+
+    def add_pages(self, reader, stamp=None, stamp_fonts=None) -> int:
+        """
+        將 reader 的所有頁面寫入輸出檔
+        stamp：可選，stamp(頁面在輸出檔中的 index, MediaBox) → bytes 或 None，
+               回傳的內容串流會疊加在該頁最上層
+        stamp_fonts：{資源名稱: 字型參照}，加入有 stamp 的頁面的 /Font 資源
+        回傳：加入的頁數
+        """
+        mapping = {}
+        queue = []
+        hasher = _ObjectHasher() if self.dedup else None
+
+        def ref_for(ref: IndirectObject) -> IndirectObject:
+            key = (ref.idnum, ref.generation)
+            num = mapping.get(key)
+            if num is None:
+                content = hasher.key(ref) if hasher is not None else None
+                if content is not None and content[0] in self._shared:
+                    # 先前的來源已寫出相同內容 → 直接指向它，整棵子樹都不必再寫
+                    num = self._shared[content[0]]
+                    self.stats["shared_objects"] += 1
+                    self.stats["dedup_bytes"] += content[1]
+                else:
+                    num = self._alloc()
+                    queue.append((num, ref))
+                    if content is not None:
+                        self._shared[content[0]] = num
+                mapping[key] = num
+            return IndirectObject(num, 0, self)
+
+        def translate(obj):
+            if isinstance(obj, IndirectObject):
+                return ref_for(obj)
+            if isinstance(obj, StreamObject):
+                # 以 items() 取原始值：new[k] 會解開間接參照，
+                # 指向其他串流的項目（例如影像的 /SMask）會被整個內嵌進來
+                new = copy.copy(obj)
+                for k, v in list(obj.items()):
+                    new[k] = translate(v)
+                return new
+            if isinstance(obj, DictionaryObject):
+                return DictionaryObject({k: translate(v) for k, v in obj.items()})
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(translate(v) for v in obj)
+            return obj
+
+        # 來源的頁面樹節點一律對應到輸出的頁面樹根（/Parent 因此不會拉進整棵樹）
+        root_pages = reader.trailer["/Root"].raw_get("/Pages")
+        nodes = [root_pages]
+        while nodes:
+            node_ref = nodes.pop()
+            if isinstance(node_ref, IndirectObject):
+                mapping[(node_ref.idnum, node_ref.generation)] = _PAGES
+            node = node_ref.get_object()
+            if node.get("/Type") == "/Pages":
+                nodes.extend(node.raw_get("/Kids") if "/Kids" in node else [])
+
+        # 先為每一頁配號，其他物件（連結、註解）指向頁面時才會對到新頁面
+        pages = list(reader.pages)
+        page_nums = []
+        for page in pages:
+            ref = page.indirect_reference
+            num = self._alloc()
+            if ref is not None:
+                mapping[(ref.idnum, ref.generation)] = num
+            page_nums.append(num)
+
+        for page, num in zip(pages, page_nums):
+            new_page = DictionaryObject()
+            for k, v in page.items():
+                if k == "/Parent":
+                    continue
+                new_page[k] = translate(v)
+            new_page[NameObject("/Parent")] = IndirectObject(_PAGES, 0, self)
+
+            data = stamp(len(self.page_refs), page.mediabox) if stamp is not None else None
+            if data:
+                self._stamp(page, new_page, data, stamp_fonts or {}, translate)
+
+            self._write(num, new_page)
+            self.page_refs.append(IndirectObject(num, 0, self))
+
+            # 把這一頁拉進來的物件全部寫出
+            while queue:
+                obj_num, ref = queue.pop()
+                self._write(obj_num, translate(ref.get_object()))
+
+        return len(pages)
+
+    def _stamp(self, page, new_page, data: bytes, fonts: dict, translate):
+        """原內容以 q / Q 包住，再疊加 data；Resources 複製一層，不影響共用的資源"""
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else DictionaryObject()
+        new_res = DictionaryObject({k: translate(v) for k, v in resources.items()})
+        font_dict = resources.get("/Font")
+        font_dict = font_dict.get_object() if font_dict is not None else DictionaryObject()
+        new_fonts = DictionaryObject({k: translate(v) for k, v in font_dict.items()})
+        for name, ref in fonts.items():
+            new_fonts[NameObject(name)] = ref
+        new_res[NameObject("/Font")] = new_fonts
+        new_page[NameObject("/Resources")] = new_res
+
+        contents = page.get("/Contents")
+        if contents is None:
+            parts = []
+        elif isinstance(contents.get_object(), ArrayObject):
+            parts = [translate(v) for v in contents.get_object()]
+        else:
+            parts = [translate(contents)]
+
+        new_page[NameObject("/Contents")] = ArrayObject(
+            [self.content_stream(b"q\n"), *parts, self.content_stream(b"Q\n" + data)]
+        )
+
+    # ---------- 書籤 / 收尾 ----------
+
+    def add_outline(self, entries):
+        """entries：[(標題, 頁面 index), ...]，單層書籤"""
+        if not entries:
+            return
+        root_num = self._alloc()
+        nums = [self._alloc() for _ in entries]
+        for i, ((title, page_index), num) in enumerate(zip(entries, nums)):
+            item = DictionaryObject({
+                NameObject("/Title"): TextStringObject(title),
+                NameObject("/Parent"): IndirectObject(root_num, 0, self),
+                NameObject("/Dest"): ArrayObject([self.page_refs[page_index], NameObject("/Fit")]),
+            })
+            if i > 0:
+                item[NameObject("/Prev")] = IndirectObject(nums[i - 1], 0, self)
+            if i < len(nums) - 1:
+                item[NameObject("/Next")] = IndirectObject(nums[i + 1], 0, self)
+            self._write(num, item)
+
+        self._write(root_num, DictionaryObject({
+            NameObject("/Type"): NameObject("/Outlines"),
+            NameObject("/First"): IndirectObject(nums[0], 0, self),
+            NameObject("/Last"): IndirectObject(nums[-1], 0, self),
+            NameObject("/Count"): NumberObject(len(nums)),
+        }))
+        self._outline_ref = IndirectObject(root_num, 0, self)
+
+    def close(self):
+        """寫出頁面樹、Catalog、xref 與 trailer"""
+        self._write(_PAGES, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self.page_refs),
+            NameObject("/Count"): NumberObject(len(self.page_refs)),
+        }))
+
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(_PAGES, 0, self),
+        })
+        if self._outline_ref is not None:
+            catalog[NameObject("/Outlines")] = self._outline_ref
+        self._write(_CATALOG, catalog)
+
+        xref = self.stream.tell()
+        size = len(self.offsets)
+        out = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+        for offset in self.offsets[1:]:
+            if offset is None:
+                out.append("0000000000 65535 f \n")
+            else:
+                out.append(f"{offset:010d} 00000 n \n")
+        out.append(f"trailer\n<< /Size {size} /Root {_CATALOG} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self.stream.write("".join(out).encode("ascii"))
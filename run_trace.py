@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+執行紀錄（各階段耗時）
+- 每個階段記錄：牆鐘時間、CPU 時間（該執行緒）、結束時的行程記憶體高峰、
+  寫出的位元組數、輸入 / 輸出頁數
+- 工作表層級（匯出、空白頁清理）每張一筆，可找出特別慢的工作表
+- 整次執行的結果寫成 JSON（放在輸出 PDF 旁），終端機摘要可選擇是否顯示
+- 同時負責進度回報與取消：每個階段開始前檢查取消，開始 / 結束時送出進度事件
+
+進度事件（dict）：
+    {"type": "stage", "stage": 名稱, "state": "start" | "done", ...}
+    {"type": "sheet", "sheet": 名稱, "index": 第幾張（0 起）, "total": 總張數,
+     "status": "ok" | "cache" | "skip", "pages": 頁數}
+
+用法：
+    tracer = Tracer(progress=print, cancel=CancelToken())
+    with tracer.stage("toc") as rec:
+        ...
+        rec["pages_out"] = 3
+    write_report(tracer.report(excel=...), path)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+def peak_rss():
+    """目前行程的記憶體高峰（bytes）；無法取得時回傳 None"""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+            get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+                                 wintypes.DWORD]
+            if get_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                        counters.cb):
+                return counters.PeakWorkingSetSize
+        except Exception:
+            pass
+        return None
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+# --------------------------------------------------
+# 取消
+# --------------------------------------------------
+
+class Cancelled(Exception):
+    """使用者取消；run() 收到後清理暫存檔與後端再往外拋"""
+
+
+class CancelToken:
+    """
+    由其他執行緒呼叫 cancel()，流程在工作表之間、階段之間以 check() 檢查
+    event 可換成 multiprocessing.Manager().Event()，讓平行匯出的子行程也看得到
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled("已取消")
+
+
+# --------------------------------------------------
+# 紀錄
+# --------------------------------------------------
+
+class Tracer:
+    """
+    收集各階段紀錄；records 為 dict 的 list，可 pickle，
+    子行程各自建立 Tracer，把 records 回傳給主行程再 extend
+    progress：progress(event) 回呼；會在執行流程的執行緒中呼叫，GUI 須自行轉回主執行緒
+    cancel：CancelToken；每個階段開始前檢查
+    """
+
+    def __init__(self, progress=None, cancel=None):
+        self.records = []
+        self.progress = progress
+        self.cancel = cancel
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    # ---------- 進度 / 取消 ----------
+
+    def emit(self, event: dict):
+        if self.progress is not None:
+            self.progress(event)
+
+    def check(self):
+        """已取消就拋出 Cancelled"""
+        if self.cancel is not None:
+            self.cancel.check()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.cancelled
+
+    # ---------- 階段 ----------
+
+    @contextmanager
+    def stage(self, name: str, **info):
+        """
+        計時一個階段；yield 的 dict 可在區塊內補上
+        pages_in / pages_out / bytes_written 等欄位
+        開始前先檢查取消；發生例外時記錄 error 後照常拋出
+        """
+        self.check()
+        self.emit({"type": "stage", "stage": name, "state": "start", **info})
+        rec = {"stage": name, **info}
+        t0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        try:
+            yield rec
+        except BaseException as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rec["wall_s"] = time.perf_counter() - t0
+            rec["cpu_s"] = time.thread_time() - cpu0
+            rec["peak_rss"] = peak_rss()
+            rec["pid"] = os.getpid()
+            self.records.append(rec)
+        self.emit({"type": "stage", "stage": name, "state": "done", **info})
+
+    def extend(self, records):
+        self.records.extend(records)
+
+    # ---------- 彙整 ----------
+
+    def totals(self) -> dict:
+        """依階段名稱加總：{name: {"count", "wall_s", "cpu_s", "bytes_written"}}，依首次出現順序"""
+        out = {}
+        for rec in self.records:
+            t = out.setdefault(rec["stage"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                              "bytes_written": 0})
+            t["count"] += 1
+            t["wall_s"] += rec["wall_s"]
+            t["cpu_s"] += rec["cpu_s"]
+            t["bytes_written"] += rec.get("bytes_written") or 0
+        return out
+
+    def report(self, **extra) -> dict:
+        peaks = [rec["peak_rss"] for rec in self.records if rec.get("peak_rss")]
+        return {
+            **extra,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_s": time.perf_counter() - self._t0,
+            "cpu_s": time.process_time() - self._cpu0,
+            "peak_rss": max(peaks) if peaks else peak_rss(),
+            "totals": self.totals(),
+            "stages": self.records,
+        }
+
+
+def print_report(report: dict, slowest: int = 5):
+    """終端機摘要：各階段合計，以及最慢的幾張工作表"""
+    mb = 1024 * 1024
+    peak = report.get("peak_rss")
+    print("\n=== 執行紀錄 ===")
+    print(f"總計 {report['wall_s']:.1f} 秒（CPU {report['cpu_s']:.1f} 秒）"
+          + (f"，記憶體高峰 {peak / mb:.0f} MB" if peak else ""))
+    print(f"{'階段':<16} {'次數':>5} {'秒數':>8} {'CPU(s)':>8} {'寫出(MB)':>9}")
+    for name, t in report["totals"].items():
+        print(f"{name:<16} {t['count']:>5} {t['wall_s']:>8.2f} {t['cpu_s']:>8.2f} "
+              f"{t['bytes_written'] / mb:>9.1f}")
+
+    per_sheet = {}
+    for rec in report["stages"]:
+        if rec.get("sheet"):
+            per_sheet[rec["sheet"]] = per_sheet.get(rec["sheet"], 0.0) + rec["wall_s"]
+    if per_sheet:
+        print("最慢的工作表：")
+        for sheet, secs in sorted(per_sheet.items(), key=lambda kv: -kv[1])[:slowest]:
+            print(f"  {sheet:<30} {secs:>8.2f} 秒")
+
+
+# --------------------------------------------------
+# 進度換算（GUI 用）
+# --------------------------------------------------
+
+class ProgressEstimator:
+    """
+    把進度事件換算成完成比例與預估剩餘秒數
+    - 匯出（每張工作表）佔 EXPORT_SHARE，其後的目次 / 組裝階段平分其餘部分
+    - 剩餘時間以目前速度等比例推估
+    """
+
+    EXPORT_SHARE = 0.9
+    POST_STAGES = ("toc", "merge", "page_numbers", "bookmarks", "write")
+
+    def __init__(self):
+        self.total_sheets = None
+        self.done_sheets = set()
+        self.post_done = set()
+        self.post_stages = self.POST_STAGES
+        self.message = ""
+        self._t0 = time.perf_counter()
+
+    def update(self, event: dict):
+        if event.get("type") == "sheet":
+            self.total_sheets = event.get("total") or self.total_sheets
+            self.done_sheets.add(event.get("index"))
+            status = {"ok": "完成", "cache": "沿用快取", "skip": "略過"}.get(event.get("status"), "")
+            self.message = f"工作表 {len(self.done_sheets)}/{self.total_sheets}：{event.get('sheet')} {status}"
+        elif event.get("type") == "stage":
+            name = event.get("stage")
+            if name == "merge" and event.get("streaming"):
+                # 串流組裝：頁碼在 merge 中完成、沒有獨立的 write 階段
+                self.post_stages = ("toc", "merge", "bookmarks")
+            if name in self.post_stages:
+                if event.get("state") == "done":
+                    self.post_done.add(name)
+                else:
+                    self.message = {"toc": "產生目次", "merge": "合併 PDF", "page_numbers": "加上頁碼",
+                                    "bookmarks": "加入書籤", "write": "寫出 PDF"}[name]
+
+    @property
+    def fraction(self) -> float:
+        if self.total_sheets:
+            export = min(1.0, len(self.done_sheets) / self.total_sheets)
+        else:
+            export = 0.0
+        post = len(self.post_done) / len(self.post_stages)
+        return min(1.0, export * self.EXPORT_SHARE + post * (1 - self.EXPORT_SHARE))
+
+    def eta(self):
+        """預估剩餘秒數；進度太少時無法估計，回傳 None"""
+        f = self.fraction
+        if f < 0.02:
+            return None
+        elapsed = time.perf_counter() - self._t0
+        return elapsed / f * (1 - f)
+
+
+def write_report(report: dict, path: Path):
+    """寫出 JSON（先寫暫存檔再取代）"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str),
+                   encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def report_path_for(output_pdf: Path) -> Path:
+    """xxx_merged.pdf → xxx_merged.run.json"""
+    output_pdf = Path(output_pdf)
+    return output_pdf.with_name(f"{output_pdf.stem}.run.json")
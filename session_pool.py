@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+常駐的匯出工作階段（GUI 用）
+- 程式啟動時就在背景開好 Excel，按下「開始轉換」不必再等 Excel 啟動與載入增益集
+- COM 物件只能在建立它的執行緒使用，因此由一條專屬執行緒持有後端，
+  所有轉換都排進這條執行緒執行（submit / run）
+- 每次使用前做健康檢查（ExportBackend.is_alive），閒置時也定期檢查，
+  Excel 已當掉就重新啟動
+- 處理 max_uses 本活頁簿、或轉換發生錯誤後回收：關閉 Excel 再立即重開
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from run_trace import Cancelled
+
+# 處理幾本活頁簿後重開 Excel（避免長時間執行累積的記憶體與狀態問題）
+# 可用環境變數 EXCEL_PDF_POOL_MAX_USES 設定
+DEFAULT_MAX_USES = int(os.environ.get("EXCEL_PDF_POOL_MAX_USES", "20"))
+
+# 閒置時每隔幾秒檢查一次 Excel 是否還活著
+HEALTH_CHECK_INTERVAL = 60.0
+
+
+class SessionPool:
+    """
+    用法：
+        pool = SessionPool(lambda: ExcelComBackend(new_instance=True))
+        pool.start()                       # 背景啟動 Excel
+        pdf = pool.run(lambda backend: run(path, date, backend=backend))
+        pool.close()
+
+    factory：回傳未啟動的 ExportBackend；每次（重新）啟動都呼叫一次
+    """
+
+    def __init__(self, factory, max_uses: int = None, health_interval: float = None):
+        self.factory = factory
+        self.max_uses = DEFAULT_MAX_USES if max_uses is None else max_uses
+        self.health_interval = HEALTH_CHECK_INTERVAL if health_interval is None else health_interval
+        self.backend = None
+        self.uses = 0
+        self.restarts = 0
+        self.last_error = None
+        self.ready = threading.Event()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    # ---------- 對外 ----------
+
+    def start(self):
+        """啟動專屬執行緒，並在其中先開好後端；可重複呼叫"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="export-session", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn) -> Future:
+        """在專屬執行緒中執行 fn(backend)，回傳 Future"""
+        self.start()
+        fut = Future()
+        self._queue.put((fut, fn))
+        return fut
+
+    def run(self, fn):
+        """submit 並等待結果（例外照常拋出）"""
+        return self.submit(fn).result()
+
+    def close(self, timeout: float = None):
+        """關閉後端並結束執行緒；正在執行的工作會先做完"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- 專屬執行緒 ----------
+
+    def _loop(self):
+        self._warm_up()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.health_interval)
+            except queue.Empty:
+                # 閒置中：Excel 若已當掉就重開，下一次轉換仍是熱的
+                if self.backend is not None and not self.backend.is_alive():
+                    self._recycle("健康檢查失敗")
+                continue
+            if item is None:
+                break
+
+            fut, fn = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                backend = self._acquire()
+                result = fn(backend)
+            except Cancelled as e:
+                # 使用者取消不是後端的問題，不必重開
+                fut.set_exception(e)
+            except BaseException as e:
+                # 先交回結果，再重開（不讓呼叫端等 Excel 重新啟動）
+                fut.set_exception(e)
+                self._recycle(f"轉換失敗：{e}")
+            else:
+                self.uses += 1
+                fut.set_result(result)
+                if self.uses >= self.max_uses:
+                    self._recycle(f"已處理 {self.uses} 本")
+
+        self._stop_backend()
+
+    def _warm_up(self):
+        """啟動後端；失敗時只記下錯誤，下次使用時再試"""
+        try:
+            self._acquire()
+        except Exception as e:
+            self.last_error = e
+            print(f"[info] 背景啟動匯出後端失敗：{e}")
+
+    def _acquire(self):
+        """回傳可用的後端：尚未啟動就啟動，健康檢查失敗就重開"""
+        if self.backend is not None and not self.backend.is_alive():
+            print("[info] 匯出後端已無回應，重新啟動")
+            self._stop_backend()
+            self.restarts += 1
+        if self.backend is None:
+            backend = self.factory()
+            backend.start()
+            self.backend = backend
+            self.uses = 0
+            self.ready.set()
+        return self.backend
+
+    def _recycle(self, reason: str):
+        """關閉目前的後端並立即重開"""
+        print(f"[info] 重新啟動匯出後端（{reason}）")
+        self._stop_backend()
+        self.restarts += 1
+        self._warm_up()
+
+    def _stop_backend(self):
+        backend, self.backend = self.backend, None
+        self.ready.clear()
+        if backend is not None:
+            try:
+                backend.stop()
+            except Exception:
+                pass
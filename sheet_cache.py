@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+工作表 PDF 快取（跨次執行保留）
+- 以「工作表內容指紋 + 後端名稱 / 版本 + 空白頁判斷設定」的 SHA-256 為鍵
+- 存放已移除空白頁的工作表 PDF，以及標題、頁數（開啟全文索引時另存各頁文字）
+- 超過容量上限時，依最近使用時間（LRU）淘汰
+- 寫入中途中斷留下的暫存檔（*.tmp），超過 STALE_TMP_S 秒未更動即在淘汰時刪除
+
+檔案配置：
+    <cache_dir>/<key>.pdf   已清理的工作表 PDF（mtime 即最近使用時間）
+    <cache_dir>/<key>.json  {"title": ..., "pages": ..., "text": [...]（選用）}
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from cache_paths import cache_base
+from pdf_spool import copy_pdf
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+# 暫存檔超過幾秒未更動視為殘留（寫入中的暫存檔不會這麼久）
+STALE_TMP_S = 3600
+
+
+class SheetCache:
+    """
+    可 pickle（只含路徑與上限），平行匯出的子行程可共用同一個快取目錄
+    寫入一律先寫暫存檔再 os.replace，多行程同時存取也不會讀到半個檔案
+    """
+
+    def __init__(self, cache_dir, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---------- 鍵 ----------
+
+    @staticmethod
+    def make_key(fingerprint: bytes, *parts) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(str(part).encode("utf-8"))
+            h.update(b"\0")
+        h.update(fingerprint)
+        return h.hexdigest()
+
+    def _paths(self, key: str):
+        return self.cache_dir / f"{key}.pdf", self.cache_dir / f"{key}.json"
+
+    # ---------- 讀寫 ----------
+
+    def get(self, key: str, dest_pdf: Path):
+        """命中時把 PDF 複製到 dest_pdf，回傳 {"title", "pages"[, "text"]}；未命中回傳 None"""
+        pdf, meta = self._paths(key)
+        try:
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            shutil.copyfile(pdf, dest_pdf)
+            os.utime(pdf)  # 更新最近使用時間
+        except (OSError, ValueError):
+            return None
+        return info
+
+    def get_bytes(self, key: str):
+        """同 get，但直接回傳 (PDF 內容, {"title", "pages"[, "text"]})；未命中回傳 None"""
+        pdf, meta = self._paths(key)
+        try:
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            data = pdf.read_bytes()
+            os.utime(pdf)
+        except (OSError, ValueError):
+            return None
+        return data, info
+
+    def put(self, key: str, pdf_path, title: str, pages: int, text=None):
+        """
+        pdf_path 可為路徑或記憶體緩衝區（見 pdf_spool）
+        text：各頁文字 list（全文索引用）；None → 不存
+        """
+        pdf, meta = self._paths(key)
+        # 暫存檔名須各自唯一（mkstemp）：job_service 在同一個行程內以多條執行緒同時執行 run()，
+        # 以 PID 命名時兩條執行緒會寫到同一個暫存檔
+        tmp_pdf = tmp_meta = None
+        try:
+            tmp_pdf = self._mktemp(key, ".pdf.tmp")
+            tmp_meta = self._mktemp(key, ".json.tmp")
+            copy_pdf(pdf_path, tmp_pdf)
+            info = {"title": title, "pages": pages}
+            if text is not None:
+                info["text"] = text
+            tmp_meta.write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_pdf, pdf)
+            os.replace(tmp_meta, meta)
+        except OSError:
+            for tmp in (tmp_pdf, tmp_meta):
+                if tmp is not None:
+                    tmp.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def _mktemp(self, key: str, suffix: str) -> Path:
+        fd, name = tempfile.mkstemp(suffix=suffix, prefix=f"{key}.", dir=self.cache_dir)
+        os.close(fd)
+        return Path(name)
+
+    def evict(self):
+        """刪除殘留的暫存檔；總容量超過 max_bytes 時，從最久未使用的項目開始刪除"""
+        stale = time.time() - STALE_TMP_S
+        for tmp in self.cache_dir.glob("*.tmp"):
+            try:
+                if tmp.stat().st_mtime < stale:
+                    tmp.unlink()
+            except OSError:
+                continue
+
+        entries = []
+        total = 0
+        for pdf in self.cache_dir.glob("*.pdf"):
+            try:
+                st = pdf.stat()
+                meta_size = pdf.with_suffix(".json").stat().st_size
+            except OSError:
+                continue
+            size = st.st_size + meta_size
+            entries.append((st.st_mtime, size, pdf))
+            total += size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, pdf in entries:
+            if total <= self.max_bytes:
+                break
+            pdf.unlink(missing_ok=True)
+            pdf.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for f in self.cache_dir.glob("*"):
+            if f.suffix in (".pdf", ".json", ".tmp"):
+                f.unlink(missing_ok=True)
+
+
+def default_cache_dir() -> Path:
+    """cache_paths.cache_base() 下的 sheets"""
+    return cache_base() / "sheets"
+
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+共用的測試資料：合成活頁簿（benchmark.make_workbook）以替身後端匯出的工作表 PDF 與目次
+不需 Excel；工作表快取與執行紀錄一律關閉
+"""
+
+import contextlib
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.pop("EXCEL_PDF_CACHE_DIR", None)
+os.environ["EXCEL_PDF_RUN_REPORT"] = "0"
+
+COMPILE_DATE = "114年11月編製"
+
+
+@pytest.fixture(scope="session")
+def workbook(tmp_path_factory):
+    from benchmark import make_workbook
+
+    path = tmp_path_factory.mktemp("wb") / "report.xlsx"
+    make_workbook(path, sheets=4, rows=60, blank_fraction=0.2)
+    return path
+
+
+@pytest.fixture(scope="session")
+def report_inputs(workbook, tmp_path_factory):
+    """(目次 PDF, 工作表清單)；目次含封面與附註圖（帶 /SMask 的影像）"""
+    import excel_to_pdf_with_bookmarks as pipeline
+    from benchmark import ROWS_PER_PAGE
+    from export_backends import SimulatedBackend
+
+    work = tmp_path_factory.mktemp("sheets")
+    backend = SimulatedBackend(rows_per_page=ROWS_PER_PAGE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheets = pipeline.export_sheets_to_pdfs(workbook, work, backend=backend, workers=1)
+        toc_pdf = work / "toc.pdf"
+        pipeline.generate_toc_pdf(toc_pdf, pipeline.build_toc_items(sheets), COMPILE_DATE)
+    return toc_pdf, sheets
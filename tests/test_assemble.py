@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+單次組裝（assemble_report）、串流組裝與舊版三步驟的輸出須一致：頁數、每頁文字（含頁碼）與書籤
+平行匯出 / 管線模式的 run() 須與逐張匯出一致
+"""
+
+import contextlib
+import io
+import shutil
+
+import pytest
+from pypdf import PdfReader
+
+import excel_to_pdf_with_bookmarks as pipeline
+
+
+def _summary(pdf_path):
+    reader = PdfReader(str(pdf_path))
+
+    def walk(items):
+        for item in items:
+            if isinstance(item, list):
+                yield from walk(item)
+            else:
+                yield item.title, reader.get_destination_page_number(item)
+
+    texts = [page.extract_text() for page in reader.pages]
+    return len(reader.pages), texts, list(walk(reader.outline))
+
+
+@pytest.fixture(scope="module")
+def legacy(report_inputs, tmp_path_factory):
+    """舊版：merge_pdfs → add_global_page_numbers → apply_bookmarks"""
+    toc_pdf, sheets = report_inputs
+    out = tmp_path_factory.mktemp("legacy") / "legacy.pdf"
+    with contextlib.redirect_stdout(io.StringIO()):
+        front_pages = pipeline.merge_pdfs(toc_pdf, sheets, out)
+        pipeline.add_global_page_numbers(out, front_pages)
+        pipeline.apply_bookmarks(out, front_pages, sheets)
+    return front_pages, _summary(out)
+
+
+@pytest.mark.parametrize("stream, dedup", [(False, False), (True, False), (True, True)],
+                         ids=["single-writer", "stream", "stream-dedup"])
+def test_assemble_matches_legacy(report_inputs, legacy, tmp_path, stream, dedup):
+    toc_pdf, sheets = report_inputs
+    out = tmp_path / "out.pdf"
+    with contextlib.redirect_stdout(io.StringIO()):
+        front_pages = pipeline.assemble_report(toc_pdf, sheets, out,
+                                               memory_budget=0 if stream else 1 << 40,
+                                               dedup=dedup)
+    legacy_front, legacy_summary = legacy
+    assert front_pages == legacy_front
+    pages, texts, outline = _summary(out)
+    assert pages == legacy_summary[0] == front_pages + sum(item["pages"] for item in sheets)
+    assert texts == legacy_summary[1]
+    assert outline == legacy_summary[2]
+    assert len(outline) >= len(sheets)
+
+
+def _run(workbook, dest_dir):
+    """以替身後端（每張工作表尾端多一頁空白頁）對活頁簿的複本執行 run()"""
+    from benchmark import ROWS_PER_PAGE
+    from conftest import COMPILE_DATE
+    from export_backends import SimulatedBackend
+
+    dest_dir.mkdir()
+    xlsx = dest_dir / workbook.name
+    shutil.copy(workbook, xlsx)
+    backend = SimulatedBackend(rows_per_page=ROWS_PER_PAGE, blank_pages=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return pipeline.run(xlsx, COMPILE_DATE, backend=backend)
+
+
+@pytest.mark.parametrize("setting, value", [("EXPORT_WORKERS", 2), ("PIPELINE_WORKERS", 2)],
+                         ids=["workers=2", "pipeline=2"])
+def test_parallel_run_matches_serial(workbook, tmp_path, monkeypatch, setting, value):
+    """EXCEL_PDF_WORKERS / EXCEL_PDF_PIPELINE：工作表順序、頁面順序與書籤須與逐張匯出相同"""
+    monkeypatch.setattr(pipeline, "EXPORT_WORKERS", 1)
+    monkeypatch.setattr(pipeline, "PIPELINE_WORKERS", 0)
+    serial = _summary(_run(workbook, tmp_path / "serial"))
+
+    monkeypatch.setattr(pipeline, setting, value)
+    parallel = _summary(_run(workbook, tmp_path / "parallel"))
+
+    assert parallel == serial
+    titles = [title for title, _ in serial[2]]
+    assert len(titles) == len(set(titles)) > 2
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""空白頁判斷：fast 策略須與 exact（完整文字擷取）的保留 / 移除結果一致"""
+
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, NameObject,
+                           NumberObject)
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import excel_to_pdf_with_bookmarks as pipeline
+
+
+def _pages(draw_pages):
+    """draw_pages：每頁一個 draw(c) 函式；回傳 pypdf 頁面 list"""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for draw in draw_pages:
+        draw(c)
+        c.showPage()
+    c.save()
+    return list(PdfReader(BytesIO(buf.getvalue())).pages)
+
+
+def _spaces(c):
+    for i in range(10):
+        c.drawString(72, 700 - i * 14, "   ")
+
+
+def _text(c):
+    c.drawString(72, 700, "臺北市衛生統計摘要 Health statistics")
+
+
+def _short(c):
+    c.drawString(72, 700, "p. 3")
+
+
+def _empty(c):
+    c.rect(72, 600, 200, 100)
+
+
+def _cjk_spaces(c):
+    # MSung-Light（UniCNS-UCS2-H）：全形空格 U+3000 的位元組為 0x30 0x00
+    c.setFont("MSung-Light", 12)
+    for i in range(10):
+        c.drawString(72, 700 - i * 14, "\u3000" * 20)
+
+
+def _cjk_text(c):
+    c.setFont("MSung-Light", 12)
+    c.drawString(72, 700, "臺北市衛生統計摘要臺北市衛生統計")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _cid_font():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    pdfmetrics.registerFont(UnicodeCIDFont("MSung-Light"))
+
+
+@pytest.mark.parametrize("draw, blank", [(_spaces, True), (_text, False), (_short, True),
+                                         (_empty, True), (_cjk_spaces, True),
+                                         (_cjk_text, False)],
+                         ids=["spaces", "text", "short", "empty", "cjk-spaces", "cjk-text"])
+def test_fast_matches_exact(draw, blank):
+    (page,) = _pages([draw])
+    assert pipeline.is_blank_page(page, strategy="exact") is blank
+    assert pipeline.is_blank_page(page, strategy="fast") is blank
+
+
+def _raw_page(font, content: bytes):
+    """以指定的字型字典（/F1）與內容串流建立單頁"""
+    writer = PdfWriter()
+    page = writer.add_blank_page(*A4)
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+    })
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page[NameObject("/Contents")] = writer._add_object(stream)
+    buf = BytesIO()
+    writer.write(buf)
+    return PdfReader(BytesIO(buf.getvalue())).pages[0]
+
+
+def _identity_h_spaces():
+    """Type0 / Identity-H，ToUnicode 將字形 3 對應到空格"""
+    cmap = DecodedStreamObject()
+    cmap.set_data(b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+                  b"/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+                  b"1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+                  b"1 beginbfchar <0003> <0020> endbfchar\n"
+                  b"endcmap CMapName currentdict /CMap defineresource pop end end")
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type0"),
+        NameObject("/BaseFont"): NameObject("/Dummy"),
+        NameObject("/Encoding"): NameObject("/Identity-H"),
+        NameObject("/DescendantFonts"): ArrayObject([DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/CIDFontType2"),
+            NameObject("/BaseFont"): NameObject("/Dummy"),
+            NameObject("/CIDSystemInfo"): DictionaryObject(),
+        })]),
+        NameObject("/ToUnicode"): cmap,
+    })
+    return font, b"BT /F1 12 Tf <" + b"0003" * 30 + b"> Tj ET"
+
+
+def _differences_spaces():
+    """Type1 / WinAnsi，/Differences 將 A 對應到 /space"""
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): DictionaryObject({
+            NameObject("/Type"): NameObject("/Encoding"),
+            NameObject("/BaseEncoding"): NameObject("/WinAnsiEncoding"),
+            NameObject("/Differences"): ArrayObject([NumberObject(65), NameObject("/space")]),
+        }),
+    })
+    return font, b"BT /F1 12 Tf (" + b"A" * 30 + b") Tj ET"
+
+
+@pytest.mark.parametrize("make", [_identity_h_spaces, _differences_spaces],
+                         ids=["identity-h-spaces", "differences-spaces"])
+def test_fast_matches_exact_on_whitespace_glyphs(make):
+    """非空白位元組、但擷取結果全是空白的頁面"""
+    page = _raw_page(*make())
+    assert pipeline.is_blank_page(page, strategy="exact") is True
+    assert pipeline.is_blank_page(page, strategy="fast") is True
+
+
+def test_scan_counts_only_nonblank_bytes():
+    data = b"BT /F1 12 Tf (   ) Tj (\\040\\t\\n) Tj <20 0a> Tj (ab\\(c) Tj <4142> Tj ET"
+    stats = pipeline.scan_content_stream(data)
+    assert stats["text_ops"] == 5
+    assert stats["text_bytes"] == 4 + 2
+
+
+def test_fast_matches_exact_on_exported_sheets(workbook, tmp_path):
+    """替身後端直接匯出（未清理，含尾端只有框線的空白頁）的每一頁"""
+    from export_backends import SimulatedBackend
+
+    backend = SimulatedBackend(blank_pages=1)
+    wb = backend.open_workbook(workbook)
+    decisions = []
+    for n, sheet in enumerate(backend.iter_sheets(wb)):
+        pdf_path = tmp_path / f"{n}.pdf"
+        backend.export_sheet(sheet, pdf_path)
+        for page in PdfReader(str(pdf_path)).pages:
+            fast = pipeline.is_blank_page(page, strategy="fast")
+            assert fast == pipeline.is_blank_page(page, strategy="exact")
+            decisions.append(fast)
+    assert any(decisions) and not all(decisions)
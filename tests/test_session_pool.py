@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""常駐工作階段：健康檢查、處理 max_uses 本後回收、失敗後重開、close(timeout)"""
+
+import contextlib
+import io
+import shutil
+import threading
+import time
+
+import pytest
+
+import excel_to_pdf_with_bookmarks as pipeline
+from conftest import COMPILE_DATE
+from export_backends import ExportBackend, SimulatedBackend
+from run_trace import Cancelled
+from session_pool import SessionPool
+
+
+class _FakeBackend(ExportBackend):
+    """記錄啟動 / 關閉；alive=False 時健康檢查失敗"""
+
+    name = "fake"
+
+    def __init__(self, log):
+        self.log = log
+        self.alive = True
+
+    def start(self):
+        self.log.append(("start", self))
+
+    def stop(self):
+        self.log.append(("stop", self))
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+@pytest.fixture
+def pool():
+    log = []
+    pools = []
+
+    def make(**kwargs):
+        p = SessionPool(lambda: _FakeBackend(log), **kwargs)
+        p.log = log
+        pools.append(p)
+        return p
+
+    yield make
+    for p in pools:
+        p.close(timeout=5)
+
+
+def _quiet(fn):
+    def wrapped(backend):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(backend)
+    return wrapped
+
+
+def test_warm_up_and_reuse(pool):
+    p = pool()
+    p.start()
+    assert p.ready.wait(5)
+    first = p.run(lambda backend: backend)
+    assert p.run(lambda backend: backend) is first
+    assert p.uses == 2 and p.restarts == 0
+    assert [event for event, _ in p.log] == ["start"]
+
+
+def test_failed_health_check_restarts_before_use(pool):
+    p = pool()
+    first = p.run(lambda backend: backend)
+    first.alive = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        second = p.run(lambda backend: backend)
+    assert second is not first
+    assert ("stop", first) in p.log
+    assert p.restarts == 1
+
+
+def test_idle_health_check_recycles(pool):
+    p = pool(health_interval=0.05)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = p.run(lambda backend: backend)
+        first.alive = False
+        deadline = time.time() + 5
+        while p.restarts == 0 and time.time() < deadline:
+            time.sleep(0.02)
+    assert p.restarts == 1
+    assert p.run(lambda backend: backend) is not first
+
+
+def test_recycles_after_max_uses(pool):
+    p = pool(max_uses=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        used = [p.run(lambda backend: backend) for _ in range(3)]
+    assert used[0] is used[1] and used[2] is not used[0]
+    assert ("stop", used[0]) in p.log
+    assert p.restarts == 1 and p.uses == 1
+
+
+def test_error_restarts_but_cancel_does_not(pool):
+    p = pool()
+
+    def fail(backend):
+        raise RuntimeError("Excel 當掉")
+
+    def cancel(backend):
+        raise Cancelled("已取消")
+
+    first = p.run(lambda backend: backend)
+    with pytest.raises(Cancelled):
+        p.run(cancel)
+    assert p.run(lambda backend: backend) is first
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with pytest.raises(RuntimeError):
+            p.run(fail)
+        second = p.run(lambda backend: backend)
+    assert second is not first
+    assert p.restarts == 1
+
+
+def test_close_stops_backend_and_honours_timeout(pool):
+    p = pool()
+    backend = p.run(lambda backend: backend)
+    release = threading.Event()
+    fut = p.submit(lambda backend: release.wait(5))
+
+    t0 = time.perf_counter()
+    p.close(timeout=0.1)
+    assert time.perf_counter() - t0 < 2
+    assert not fut.done()  # 正在執行的工作不會被中斷
+
+    release.set()
+    assert fut.result(timeout=5) is True
+    deadline = time.time() + 5
+    while ("stop", backend) not in p.log and time.time() < deadline:
+        time.sleep(0.02)
+    assert ("stop", backend) in p.log
+
+
+def test_runs_pipeline_with_simulated_backend(workbook, tmp_path):
+    xlsx = tmp_path / workbook.name
+    shutil.copy(workbook, xlsx)
+    p = SessionPool(lambda: SimulatedBackend())
+    try:
+        outputs = [
+            p.run(_quiet(lambda backend: pipeline.run(xlsx, COMPILE_DATE, backend=backend,
+                                                      workers=1)))
+            for _ in range(2)
+        ]
+    finally:
+        p.close(timeout=5)
+    assert outputs[0] == outputs[1] == pipeline.output_path_for(xlsx)
+    assert outputs[0].stat().st_size > 0
+    assert p.uses == 2 and p.restarts == 0
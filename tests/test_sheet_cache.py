@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""工作表快取：內容變動才重新匯出、LRU 淘汰、殘留暫存檔清理"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+import openpyxl
+
+import excel_to_pdf_with_bookmarks as pipeline
+import sheet_cache
+from export_backends import SimulatedBackend
+from sheet_cache import SheetCache
+
+
+class _CountingBackend(SimulatedBackend):
+    """記錄實際匯出的工作表（以 SimulatedBackend 的指紋判斷快取）"""
+
+    def __init__(self, exported):
+        super().__init__(blank_pages=1)
+        self.exported = exported
+
+    def export_sheet(self, sheet, pdf_path):
+        self.exported.append(sheet["name"])
+        super().export_sheet(sheet, pdf_path)
+
+
+def _export(xlsx, work, cache):
+    exported = []
+    work.mkdir()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheets = pipeline.export_sheets_to_pdfs(xlsx, work, backend=_CountingBackend(exported),
+                                                workers=1, cache=cache)
+    return [(item["sheet"], item["title"], item["pages"]) for item in sheets], exported
+
+
+def test_hit_and_miss_on_content_change(workbook, tmp_path):
+    xlsx = tmp_path / workbook.name
+    shutil.copy(workbook, xlsx)
+    cache = SheetCache(tmp_path / "cache")
+
+    first, exported = _export(xlsx, tmp_path / "1", cache)
+    names = [name for name, _, _ in first]
+    assert exported == names
+
+    second, exported = _export(xlsx, tmp_path / "2", cache)
+    assert exported == []
+    assert second == first
+
+    wb = openpyxl.load_workbook(xlsx)
+    wb[names[1]]["B5"] = "已修改"
+    wb.save(xlsx)
+    third, exported = _export(xlsx, tmp_path / "3", cache)
+    assert exported == [names[1]]
+    assert third == first
+
+
+def _put(cache, key, tmp_path, size=1000):
+    src = tmp_path / f"{key}.src.pdf"
+    src.write_bytes(b"%PDF-" + b"x" * size)
+    cache.put(key, src, f"標題 {key}", 1)
+
+
+def test_lru_eviction(tmp_path):
+    cache = SheetCache(tmp_path / "cache", max_bytes=2600)
+    _put(cache, "a", tmp_path)
+    _put(cache, "b", tmp_path)
+    os.utime(cache.cache_dir / "a.pdf", (100, 100))
+    os.utime(cache.cache_dir / "b.pdf", (200, 200))
+
+    # 讀取 a → a 變成最近使用，b 最久未使用
+    assert cache.get("a", tmp_path / "out.pdf")["title"] == "標題 a"
+    _put(cache, "c", tmp_path)
+
+    assert cache.get("b", tmp_path / "out.pdf") is None
+    assert not (cache.cache_dir / "b.json").exists()
+    assert cache.get("a", tmp_path / "out.pdf") is not None
+    assert cache.get("c", tmp_path / "out.pdf") is not None
+
+
+def test_stale_tmp_files_are_removed(tmp_path, monkeypatch):
+    cache = SheetCache(tmp_path / "cache")
+    stale = cache.cache_dir / "dead.1234.pdf.tmp"
+    fresh = cache.cache_dir / "live.5678.pdf.tmp"
+    stale.write_bytes(b"partial")
+    fresh.write_bytes(b"partial")
+    old = time.time() - sheet_cache.STALE_TMP_S - 10
+    os.utime(stale, (old, old))
+
+    _put(cache, "a", tmp_path)
+    assert not stale.exists()
+    assert fresh.exists()  # 可能是其他行程正在寫入
+
+
+def test_concurrent_puts_publish_a_complete_entry(tmp_path):
+    """同一個鍵由多條執行緒同時寫入（job_service）：結果須為其中一份完整的內容"""
+    cache = SheetCache(tmp_path / "cache")
+    sources = []
+    for i in range(8):
+        src = tmp_path / f"{i}.pdf"
+        src.write_bytes(b"%PDF-" + bytes([65 + i]) * 200_000)
+        sources.append(src)
+    threads = [threading.Thread(target=cache.put, args=("k", src, "t", 1)) for src in sources]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    data = (cache.cache_dir / "k.pdf").read_bytes()
+    assert data in [src.read_bytes() for src in sources]
+    assert json.loads((cache.cache_dir / "k.json").read_text(encoding="utf-8"))["pages"] == 1
+    assert sorted(p.name for p in cache.cache_dir.iterdir()) == ["k.json", "k.pdf"]
+
+
+def test_default_dirs_share_cache_base(tmp_path, monkeypatch):
+    import job_service
+    import toc_generator
+    from cache_paths import cache_base
+
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    assert cache_base() == tmp_path / "health_stats_pdf"
+    assert sheet_cache.default_cache_dir() == cache_base() / "sheets"
+    assert job_service.default_jobs_dir() == cache_base() / "jobs"
+    assert toc_generator.cache_base is cache_base  # CACHE_BASE 在 import 時即決定
+
+    monkeypatch.delenv("LOCALAPPDATA")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert cache_base() == tmp_path / ".cache" / "health_stats_pdf"
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""GUI 啟動：import app 不得載入轉換引擎等重量級模組，且在時間上限內完成"""
+
+import benchmark
+
+
+def test_import_app_is_light():
+    result = benchmark.measure_startup(repeat=3)
+    assert benchmark.check_startup(result) == []
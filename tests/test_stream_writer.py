@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""串流組裝（StreamingPdfWriter）的輸出須為合法 PDF：以 qpdf（pikepdf）做語法檢查"""
+
+import contextlib
+import io
+import shutil
+import subprocess
+
+import pytest
+
+pikepdf = pytest.importorskip("pikepdf")
+
+import excel_to_pdf_with_bookmarks as pipeline
+
+
+def _stream(report_inputs, out, dedup):
+    toc_pdf, sheets = report_inputs
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline.stream_assemble_report(toc_pdf, sheets, out, dedup=dedup)
+    return out
+
+
+@pytest.mark.parametrize("dedup", [False, True], ids=["plain", "dedup"])
+def test_streamed_output_passes_qpdf_check(report_inputs, tmp_path, dedup):
+    out = _stream(report_inputs, tmp_path / "out.pdf", dedup)
+    with pikepdf.open(out) as pdf:
+        assert pdf.check_pdf_syntax() == []
+        # 讀出每個物件，確認串流內容都能解碼
+        for obj in pdf.objects:
+            if isinstance(obj, pikepdf.Stream):
+                obj.read_bytes()
+
+    if shutil.which("qpdf"):
+        result = subprocess.run(["qpdf", "--check", str(out)], capture_output=True, text=True)
+        assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_stream_keeps_smask_indirect(report_inputs, tmp_path):
+    """影像的 /SMask 須維持為間接參照（內嵌串流是不合法的 PDF）"""
+    out = _stream(report_inputs, tmp_path / "out.pdf", dedup=False)
+    smasks = 0
+    with pikepdf.open(out) as pdf:
+        for obj in pdf.objects:
+            if isinstance(obj, pikepdf.Stream) and "/SMask" in obj:
+                assert obj.SMask.is_indirect
+                smasks += 1
+    assert smasks > 0
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""全文索引：run(..., index=True) 寫出的索引以 trigram（≥ 3 字）或 LIKE（< 3 字）查詢"""
+
+import contextlib
+import io
+import shutil
+import sqlite3
+
+import pytest
+from pypdf import PdfReader
+
+import excel_to_pdf_with_bookmarks as pipeline
+import text_index
+from benchmark import ROWS_PER_PAGE
+from conftest import COMPILE_DATE
+from export_backends import SimulatedBackend
+
+
+@pytest.fixture(scope="module")
+def report(workbook, tmp_path_factory):
+    """(輸出 PDF, 各頁文字, 前置頁數)"""
+    xlsx = tmp_path_factory.mktemp("index") / workbook.name
+    shutil.copy(workbook, xlsx)
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = pipeline.run(xlsx, COMPILE_DATE,
+                              backend=SimulatedBackend(rows_per_page=ROWS_PER_PAGE),
+                              workers=1, index=True)
+    reader = PdfReader(str(output))
+    texts = [page.extract_text() for page in reader.pages]
+    first_sheet = reader.outline[2]  # 封面、目次之後的第一張工作表
+    return output, texts, reader.get_destination_page_number(first_sheet)
+
+
+def _tokenizer(output):
+    con = sqlite3.connect(str(text_index.index_path_for(output)))
+    try:
+        return dict(con.execute("SELECT key, value FROM report"))["tokenizer"]
+    finally:
+        con.close()
+
+
+@pytest.mark.parametrize("term", ["信義", "大安區"], ids=["like-2", "trigram-3"])
+def test_search_hits_and_pdf_page_offset(report, term):
+    output, texts, front_pages = report
+    hits = text_index.search(term, output.parent)
+
+    expected = [n + 1 for n, text in enumerate(texts) if n >= front_pages and term in text]
+    assert expected
+    assert [hit["pdf_page"] for hit in hits] == expected
+    for hit in hits:
+        assert hit["pdf"] == output
+        assert hit["compile_date"] == COMPILE_DATE
+        assert hit["page"] == hit["pdf_page"] - front_pages
+        assert term in hit["snippet"]
+    assert [hit["sheet_page"] for hit in hits] == list(range(1, len(hits) + 1))
+
+
+@pytest.mark.parametrize("query", ["大安區 第41里", "大安區 41"], ids=["trigram", "like"])
+def test_multiple_terms_on_same_page(report, query):
+    """各詞須出現在同一頁；含 < 3 字的詞時整個查詢改走 LIKE"""
+    output, texts, front_pages = report
+    terms = query.split()
+    expected = [n + 1 for n, text in enumerate(texts)
+                if n >= front_pages and all(t in text for t in terms)]
+    assert expected
+    assert [hit["pdf_page"] for hit in text_index.search(query, output.parent)] == expected
+
+
+def test_index_uses_trigram_when_available(report):
+    """≥ 3 字的詞走 trigram MATCH；SQLite 沒有 trigram 時退回 unicode61（全部走 LIKE）"""
+    output, _, _ = report
+    con = sqlite3.connect(":memory:")
+    try:
+        con.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        pytest.skip("此 SQLite 沒有 trigram 斷詞")
+    finally:
+        con.close()
+    assert _tokenizer(output) == "trigram"
+
+
+def test_search_misses_and_limit(report):
+    output, _, _ = report
+    assert text_index.search("不存在的字串", output.parent) == []
+    assert text_index.search("   ", output.parent) == []
+    assert len(text_index.search("區第", output.parent, limit=3)) == 3
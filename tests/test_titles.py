@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""標題：xlsx_titles、xlsx 後端與替身後端讀到的標題須與 com 後端（數字為 float）一致"""
+
+import openpyxl
+import pytest
+
+from export_backends import SimulatedBackend, XlsxRenderBackend, title_from_values
+from xlsx_titles import read_sheet_titles
+
+# (第一列的值, COM .Value 會得到的值)
+FIRST_ROWS = {
+    "數字": ([2024, "標題"], [2024.0, "標題"]),
+    "小數": ([3.5], [3.5]),
+    "布林": ([True], [True]),
+    "編號": ([None, "1. 表頭"], [None, "1. 表頭"]),
+    "空白": (["   ", "表二"], ["   ", "表二"]),
+}
+
+
+@pytest.fixture(scope="module")
+def titles_xlsx(tmp_path_factory):
+    path = tmp_path_factory.mktemp("titles") / "titles.xlsx"
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for name, (values, _) in FIRST_ROWS.items():
+        ws = wb.create_sheet(name)
+        for col, value in enumerate(values, start=1):
+            if value is not None:
+                ws.cell(row=1, column=col, value=value)
+        ws["A3"] = "資料"
+    wb.save(path)
+    return path
+
+
+def test_xlsx_readers_match_com(titles_xlsx):
+    expected = {name: title_from_values(com) for name, (_, com) in FIRST_ROWS.items()}
+    assert expected["數字"] == "0"  # COM 的 "2024.0" 經 clean_title
+
+    assert read_sheet_titles(titles_xlsx) == expected
+
+    wb = openpyxl.load_workbook(titles_xlsx, data_only=True)
+    try:
+        assert {ws.title: XlsxRenderBackend().get_title(ws) for ws in wb.worksheets} == expected
+    finally:
+        wb.close()
+
+    backend = SimulatedBackend()
+    sheets = backend.iter_sheets(backend.open_workbook(titles_xlsx))
+    assert {backend.sheet_name(s): backend.get_title(s) for s in sheets} == expected
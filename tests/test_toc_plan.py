@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""目次提前產生：預估頁數全對才沿用預先產生的目次，否則依實際頁數重新產生"""
+
+import contextlib
+import io
+import shutil
+
+import pytest
+from pypdf import PdfReader
+
+import excel_to_pdf_with_bookmarks as pipeline
+from benchmark import ROWS_PER_PAGE
+from conftest import COMPILE_DATE
+from export_backends import SimulatedBackend
+from run_trace import Tracer
+
+
+def _run(workbook, dest_dir, planning: bool, monkeypatch):
+    monkeypatch.setattr(pipeline, "TOC_PLANNING", planning)
+    dest_dir.mkdir()
+    xlsx = dest_dir / workbook.name
+    shutil.copy(workbook, xlsx)
+    tracer = Tracer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = pipeline.run(xlsx, COMPILE_DATE,
+                              backend=SimulatedBackend(rows_per_page=ROWS_PER_PAGE),
+                              workers=1, tracer=tracer)
+    (toc,) = [rec for rec in tracer.records if rec["stage"] == "toc"]
+    reader = PdfReader(str(output))
+    return toc, [page.extract_text() for page in reader.pages]
+
+
+@pytest.fixture(scope="module")
+def actual_pages(report_inputs):
+    _, sheets = report_inputs
+    return {item["sheet"]: item["pages"] for item in sheets}
+
+
+@pytest.fixture
+def baseline(workbook, tmp_path, monkeypatch):
+    """不預估時的輸出（每頁文字，含目次頁碼）"""
+    toc, texts = _run(workbook, tmp_path / "baseline", False, monkeypatch)
+    assert "plan_reused" not in toc
+    return texts
+
+
+def test_wrong_prediction_regenerates_toc(workbook, tmp_path, monkeypatch, actual_pages,
+                                          baseline):
+    wrong = {name: pages + 1 for name, pages in actual_pages.items()}
+    monkeypatch.setattr(pipeline, "predict_page_counts", lambda path: dict(wrong))
+
+    # 依錯誤預估先產生的目次，頁碼確實與實際不同
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = pipeline.plan_toc(workbook, COMPILE_DATE, None, Tracer())
+    planned_toc = [page.extract_text() for page in PdfReader(io.BytesIO(plan["toc"])).pages]
+    assert planned_toc != baseline[:len(planned_toc)]
+
+    toc, texts = _run(workbook, tmp_path / "planned", True, monkeypatch)
+    assert toc["plan_reused"] is False
+    assert toc["plan_hits"] == 0
+    assert texts == baseline
+
+
+def test_correct_prediction_reuses_toc(workbook, tmp_path, monkeypatch, actual_pages, baseline):
+    monkeypatch.setattr(pipeline, "predict_page_counts", lambda path: dict(actual_pages))
+
+    toc, texts = _run(workbook, tmp_path / "planned", True, monkeypatch)
+    assert toc["plan_reused"] is True
+    assert toc["plan_accuracy"] == 1.0
+    assert texts == baseline
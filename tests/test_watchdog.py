@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""匯出看門狗：只終止自己啟動的 Excel；無法終止的後端逾時時不重試"""
+
+import time
+
+import pytest
+
+from export_backends import ExcelComBackend, SimulatedBackend
+from export_watchdog import ExportWatchdog, SheetTimeout
+
+
+class _FakeExcel:
+    Visible = False
+    DisplayAlerts = False
+
+    def Quit(self):
+        pass
+
+
+class _Unkillable:
+    def kill(self):
+        return False
+
+
+def test_attached_excel_is_never_killed(monkeypatch):
+    killed = []
+    monkeypatch.setattr("os.kill", lambda pid, sig: killed.append(pid))
+
+    attached = ExcelComBackend(dispatch=lambda prog_id: _FakeExcel())
+    attached.start()
+    attached.pid = 1234
+    assert attached.kill() is False
+
+    own = attached.for_worker()
+    own.start()
+    own.pid = 5678
+    assert own.kill() is True
+    assert killed == [5678]
+
+
+def test_guard_reports_unkillable_backend():
+    watchdog = ExportWatchdog(sheet_timeout=0.05)
+    with pytest.raises(SheetTimeout) as exc:
+        with watchdog.guard(_Unkillable(), "表1"):
+            time.sleep(0.2)
+    assert exc.value.killed is False
+    assert "超過 0.05 秒" in str(exc.value)
+
+
+def test_hung_sheet_is_killed_and_retried(workbook, tmp_path):
+    backend = SimulatedBackend(hang_sheets={"表1": 1})
+    backend.start()
+    wb = backend.open_workbook(workbook)
+    sheet = backend.iter_sheets(wb)[0]
+    watchdog = ExportWatchdog(sheet_timeout=0.2)
+    with pytest.raises(SheetTimeout) as exc:
+        with watchdog.guard(backend, "表1"):
+            backend.export_sheet(sheet, tmp_path / "a.pdf")
+    assert exc.value.killed is True
+
+    backend.start()
+    with watchdog.guard(backend, "表1"):
+        backend.export_sheet(sheet, tmp_path / "a.pdf")
+    assert (tmp_path / "a.pdf").stat().st_size > 0
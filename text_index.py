@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+報表全文索引（SQLite FTS5，放在輸出 PDF 旁的附檔）
+- 文字來自空白頁清理時的擷取結果，寫索引時不再讀取 PDF
+- 每頁一筆：工作表名稱、目次標題、工作表內第幾頁、邏輯頁碼（同目次 / 頁尾頁碼）、PDF 頁次
+- search() 跨多份報表查詢，只讀索引檔，不開啟任何 PDF
+
+檔案：xxx_merged.pdf → xxx_merged.search.db
+
+查詢（命令列）：
+    python text_index.py 結核病 D:\\報表封存 --limit 20
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+INDEX_SUFFIX = ".search.db"
+
+# trigram 斷詞（SQLite 3.34+）可查詢中文字串中的任意片段；
+# 舊版 SQLite 退回 unicode61（中文整段視為一個詞），查詢改用 LIKE
+_TOKENIZERS = ("trigram", "unicode61")
+
+
+def index_path_for(output_pdf: Path) -> Path:
+    """xxx_merged.pdf → xxx_merged.search.db"""
+    output_pdf = Path(output_pdf)
+    return output_pdf.with_name(f"{output_pdf.stem}{INDEX_SUFFIX}")
+
+
+def build_entries(sheets, front_pages: int):
+    """
+    sheets：export_sheets_to_pdfs 的結果，item["text"] 為各頁文字（依頁序）
+    front_pages：封面 + 目次頁數（assemble_report 的回傳值）
+    回傳：每頁一筆 dict（sheet / title / sheet_page / page / pdf_page / text）
+    """
+    entries = []
+    logical_page = 1
+    for item in sheets:
+        texts = item.get("text") or []
+        for offset in range(item["pages"]):
+            entries.append({
+                "sheet": item["sheet"],
+                "title": item["title"],
+                "sheet_page": offset + 1,
+                "page": logical_page + offset,
+                "pdf_page": front_pages + logical_page + offset,
+                "text": texts[offset] if offset < len(texts) else "",
+            })
+        logical_page += item["pages"]
+    return entries
+
+
+def _create_pages_table(con) -> str:
+    for tokenizer in _TOKENIZERS:
+        try:
+            con.execute(
+                "CREATE VIRTUAL TABLE pages USING fts5("
+                "text, sheet UNINDEXED, title UNINDEXED, sheet_page UNINDEXED, page UNINDEXED, "
+                f"pdf_page UNINDEXED, tokenize='{tokenizer}')"
+            )
+            return tokenizer
+        except sqlite3.OperationalError:
+            continue
+    raise RuntimeError("此 SQLite 不支援 FTS5，無法建立全文索引")
+
+
+def write_index(index_path: Path, entries, **meta) -> Path:
+    """
+    寫出索引檔（先寫暫存檔再取代，查詢端不會讀到寫到一半的索引）
+    meta：報表資訊（pdf 檔名、活頁簿、編製日期等），存在 report 表
+    """
+    index_path = Path(index_path)
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(str(tmp))
+    try:
+        tokenizer = _create_pages_table(con)
+        con.execute("CREATE TABLE report (key TEXT PRIMARY KEY, value TEXT)")
+        info = {**meta, "tokenizer": tokenizer, "pages": len(entries),
+                "created_at": datetime.now().isoformat(timespec="seconds")}
+        con.executemany("INSERT INTO report VALUES (?, ?)",
+                        [(k, str(v)) for k, v in info.items()])
+        con.executemany(
+            "INSERT INTO pages (text, sheet, title, sheet_page, page, pdf_page) "
+            "VALUES (:text, :sheet, :title, :sheet_page, :page, :pdf_page)",
+            entries,
+        )
+        con.commit()
+    except BaseException:
+        con.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    con.close()
+    os.replace(tmp, index_path)
+    return index_path
+
+
+# --------------------------------------------------
+# 查詢
+# --------------------------------------------------
+
+def iter_index_files(roots):
+    """roots：索引檔或資料夾（遞迴尋找 *.search.db），依路徑排序、去除重複"""
+    if isinstance(roots, (str, Path)):
+        roots = [roots]
+    found = set()
+    for root in roots:
+        root = Path(root)
+        if root.is_dir():
+            found.update(root.rglob(f"*{INDEX_SUFFIX}"))
+        elif root.name.endswith(INDEX_SUFFIX) and root.exists():
+            found.add(root)
+    return sorted(found)
+
+
+def _snippet(text: str, terms, width: int = 30) -> str:
+    """第一個查詢詞前後各 width 字，換行改為空白"""
+    text = " ".join(text.split())
+    pos = min((i for i in (text.find(t) for t in terms) if i >= 0), default=0)
+    start = max(0, pos - width)
+    end = min(len(text), pos + width + max(len(t) for t in terms))
+    return ("…" if start > 0 else "") + text[start:end] + ("…" if end < len(text) else "")
+
+
+def _query_index(index_path: Path, terms, limit: int):
+    con = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        meta = dict(con.execute("SELECT key, value FROM report"))
+        if meta.get("tokenizer") == "trigram" and all(len(t) >= 3 for t in terms):
+            # 每個詞當作片語，詞之間為 AND
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+            where, params = "pages MATCH ?", [match]
+        else:
+            # 短於 3 字的詞無法以 trigram 查詢
+            escaped = [t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                       for t in terms]
+            where = " AND ".join("text LIKE ? ESCAPE '\\'" for _ in terms)
+            params = [f"%{t}%" for t in escaped]
+        rows = con.execute(
+            f"SELECT sheet, title, sheet_page, page, pdf_page, text FROM pages "
+            f"WHERE {where} ORDER BY CAST(pdf_page AS INTEGER) LIMIT ?",
+            params + [limit],
+        ).fetchall()
+    finally:
+        con.close()
+    return meta, rows
+
+
+def search(query: str, roots, limit: int = 50):
+    """
+    跨多份報表查詢；query 以空白分隔多個詞（須全部出現在同一頁）
+    roots：索引檔或資料夾（見 iter_index_files）
+    回傳：[{"pdf", "compile_date", "sheet", "title", "sheet_page", "page", "pdf_page",
+            "snippet"}, ...]，依報表路徑、頁次排序，最多 limit 筆
+    """
+    terms = query.split()
+    if not terms:
+        return []
+    hits = []
+    for index_path in iter_index_files(roots):
+        if len(hits) >= limit:
+            break
+        try:
+            meta, rows = _query_index(index_path, terms, limit - len(hits))
+        except sqlite3.Error as e:
+            print(f"[info] 無法讀取索引 {index_path}：{e}")
+            continue
+        pdf = index_path.with_name(meta.get("pdf") or index_path.name[:-len(INDEX_SUFFIX)] + ".pdf")
+        for sheet, title, sheet_page, page, pdf_page, text in rows:
+            hits.append({
+                "pdf": pdf,
+                "compile_date": meta.get("compile_date", ""),
+                "sheet": sheet,
+                "title": title,
+                "sheet_page": int(sheet_page),
+                "page": int(page),
+                "pdf_page": int(pdf_page),
+                "snippet": _snippet(text, terms),
+            })
+    return hits
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查詢報表全文索引（不開啟 PDF）")
+    parser.add_argument("query", help="查詢字串，多個詞以空白分隔")
+    parser.add_argument("roots", nargs="*", default=["."], help="索引檔或資料夾（預設目前目錄）")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    hits = search(args.query, args.roots, args.limit)
+    for hit in hits:
+        print(f"{hit['pdf'].name}  第 {hit['page']} 頁（PDF 第 {hit['pdf_page']} 頁）"
+              f"  {hit['title']}")
+        print(f"    {hit['snippet']}")
+    print(f"共 {len(hits)} 筆")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ toc_generator.py
 - 封面使用 cover.png
 - 封面副標再左移、放大 5pt、粗體
 - 右下角文字放大 5pt、粗體
+- 字型在第一次產生目錄時才載入，解析結果快取於磁碟
+- 封面圖與附註圖預先轉成 PDF 範本（Form XObject）快取於磁碟，
+  每次只畫日期等文字，再把範本疊上去，圖片不必重新解碼
 """
 
 from reportlab.pdfgen import canvas
@@ -13,7 +16,22 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor
 from pathlib import Path
+from io import BytesIO
+import copy
+import functools
+import hashlib
+import json
+import operator
+import os
+import pickle
 import re
+import threading
+import weakref
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+
+from cache_paths import cache_base
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
 LEFT_MARGIN = 60
@@ -26,14 +44,238 @@ BASE_DIR = Path(__file__).parent
 COVER_IMAGE = BASE_DIR / "cover.png"
 INFO_IMAGE = BASE_DIR / "additionalinfo.png"
 
-FONT_PATH = r"C:\Windows\Fonts\msjh.ttc"
-pdfmetrics.registerFont(TTFont("msjh", FONT_PATH))
-pdfmetrics.registerFont(TTFont("msjh-bold", FONT_PATH))
+# 字型檔可用環境變數 TOC_FONT_PATH 指定
+FONT_PATH = os.environ.get("TOC_FONT_PATH", r"C:\Windows\Fonts\msjh.ttc")
+CACHE_BASE = cache_base()
+# 解析後的字型存在這裡，之後啟動不必再解析整個 TTC
+FONT_CACHE_DIR = CACHE_BASE / "fonts"
+# 封面 / 附註圖範本
+TEMPLATE_CACHE_DIR = CACHE_BASE / "templates"
+# 範本的繪製方式改變時調高，舊範本即失效
+TEMPLATE_VERSION = "1"
+# 找不到字型檔時改用 reportlab 內建的繁中字型（不內嵌）
+FALLBACK_FONT = "MSung-Light"
+
+# 實際使用的字型名稱（ensure_fonts 之後才確定）
+FONT = "msjh"
+FONT_BOLD = "msjh-bold"
+_FONT_LOCK = threading.Lock()
+_TEMPLATE_LOCK = threading.Lock()
 
 GREEN = HexColor("#3A9D7C")
 BLACK = HexColor("#000000")
 
 
+def _font_cache_file(font_path: Path) -> Path:
+    import reportlab
+
+    st = font_path.stat()
+    key = f"{font_path.resolve()}|{st.st_size}|{st.st_mtime_ns}|{reportlab.Version}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return FONT_CACHE_DIR / f"{font_path.stem}-{digest}.pickle"
+
+
+def _load_ttfont(name: str, font_path: Path) -> TTFont:
+    """先讀磁碟快取；沒有才解析字型檔，並寫入快取"""
+    cache_file = _font_cache_file(font_path)
+    try:
+        with open(cache_file, "rb") as f:
+            font = pickle.load(f)
+        font.fontName = name
+        font.state = weakref.WeakKeyDictionary()
+        return font
+    except Exception:
+        pass
+
+    font = TTFont(name, str(font_path))
+    try:
+        # reportlab 以 lambda 保存的縮放函式無法序列化，換成等價的 partial
+        face = font.face
+        if hasattr(face, "_pdfScale"):
+            upem = face.unitsPerEm
+            face._pdfScale = functools.partial(operator.mul, 1 if upem == 1000 else 1000 / upem)
+        # state 內是各文件的字型子集狀態，不可序列化也不需要保存
+        state, font.state = font.state, None
+        try:
+            data = pickle.dumps(font, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            font.state = state
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, cache_file)
+    except Exception:
+        pass
+    return font
+
+
+def ensure_fonts(font_path=None):
+    """
+    第一次產生目錄時才載入字型：
+    - 一般 / 粗體共用同一份解析結果（字型檔只解析一次）
+    - 解析結果快取在 FONT_CACHE_DIR
+    - 字型檔不存在時改用 FALLBACK_FONT
+    - 可在背景執行緒預先呼叫（GUI 顯示視窗後暖機），與轉換同時呼叫也只載入一次
+    """
+    global FONT, FONT_BOLD
+
+    with _FONT_LOCK:
+        registered = pdfmetrics.getRegisteredFontNames()
+        if FONT in registered and FONT_BOLD in registered:
+            return
+
+        path = Path(font_path or FONT_PATH)
+        if not path.exists():
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+            print(f"[info] 找不到字型 {path}，改用 {FALLBACK_FONT}")
+            if FALLBACK_FONT not in registered:
+                pdfmetrics.registerFont(UnicodeCIDFont(FALLBACK_FONT))
+            FONT = FONT_BOLD = FALLBACK_FONT
+            return
+
+        regular = _load_ttfont("msjh", path)
+        bold = copy.copy(regular)
+        bold.fontName = "msjh-bold"
+        bold.encoding = copy.deepcopy(regular.encoding)
+        bold.state = weakref.WeakKeyDictionary()
+
+        pdfmetrics.registerFont(regular)
+        pdfmetrics.registerFont(bold)
+        FONT, FONT_BOLD = "msjh", "msjh-bold"
+
+
+# =========================
+# 封面 / 附註圖範本
+# =========================
+
+def _template_key() -> str:
+    """圖片內容 + 版面常數；任一改變就重建範本"""
+    h = hashlib.sha256()
+    h.update(repr((TEMPLATE_VERSION, PAGE_WIDTH, PAGE_HEIGHT, LEFT_MARGIN)).encode("ascii"))
+    for path in (COVER_IMAGE, INFO_IMAGE):
+        h.update(b"\0")
+        if path.exists():
+            h.update(path.read_bytes())
+    return h.hexdigest()[:32]
+
+
+def _build_template(pdf_path: Path) -> dict:
+    """
+    範本 PDF：
+    - 第 1 頁（有 cover.png 時）：整頁封面圖
+    - 下一頁（有 additionalinfo.png 時）：頁面大小即附註圖在目錄頁上的大小
+    回傳 meta：{"cover": 頁 index 或 None, "info": 頁 index 或 None, "info_size": [w, h]}
+    """
+    meta = {"cover": None, "info": None, "info_size": None}
+    c = canvas.Canvas(str(pdf_path), pagesize=A4)
+    page = 0
+
+    if COVER_IMAGE.exists():
+        img = ImageReader(str(COVER_IMAGE))
+        c.drawImage(img, 0, 0, PAGE_WIDTH, PAGE_HEIGHT, preserveAspectRatio=True, anchor="c")
+        c.showPage()
+        meta["cover"] = page
+        page += 1
+
+    if INFO_IMAGE.exists():
+        img = ImageReader(str(INFO_IMAGE))
+        iw, ih = img.getSize()
+        img_w = PAGE_WIDTH - 2 * LEFT_MARGIN
+        img_h = ih * (img_w / iw)
+        c.setPageSize((img_w, img_h))
+        c.drawImage(img, 0, 0, img_w, img_h, mask="auto")
+        c.showPage()
+        meta["info"] = page
+        meta["info_size"] = [img_w, img_h]
+        page += 1
+
+    if page == 0:
+        c.showPage()  # 空 PDF 無法存檔
+    c.save()
+    return meta
+
+
+def load_template():
+    """
+    回傳 (範本 PDF 路徑, meta)；快取不存在或已失效才重建
+    寫入先寫暫存檔再 os.replace，多個程式同時產生也不會讀到半個檔案；
+    同一程式內的多條執行緒（轉檔服務的 worker）以鎖排隊，暫存檔名不會相撞
+    """
+    with _TEMPLATE_LOCK:
+        return _load_template()
+
+
+def _load_template():
+    key = _template_key()
+    pdf_path = TEMPLATE_CACHE_DIR / f"cover-{key}.pdf"
+    meta_path = TEMPLATE_CACHE_DIR / f"cover-{key}.json"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if pdf_path.exists():
+            return pdf_path, meta
+    except (OSError, ValueError):
+        pass
+
+    TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_pdf = pdf_path.with_name(f"cover-{key}.{os.getpid()}.pdf.tmp")
+    tmp_meta = meta_path.with_name(f"cover-{key}.{os.getpid()}.json.tmp")
+    meta = _build_template(tmp_pdf)
+    tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp_pdf, pdf_path)
+    os.replace(tmp_meta, meta_path)
+    print("[info] 已重建封面範本")
+    return pdf_path, meta
+
+
+def _template_form(writer: PdfWriter, tpl_page):
+    """把範本的一頁包成 Form XObject 加入 writer（圖片串流原樣複製，不解碼）"""
+    form = DecodedStreamObject()
+    contents = tpl_page.get_contents()
+    form.set_data(contents.get_data() if contents is not None else b"")
+    form[NameObject("/Type")] = NameObject("/XObject")
+    form[NameObject("/Subtype")] = NameObject("/Form")
+    form[NameObject("/BBox")] = ArrayObject(tpl_page.mediabox)
+    resources = tpl_page.get("/Resources")
+    if resources is not None:
+        form[NameObject("/Resources")] = resources.get_object().clone(writer)
+    return writer._add_object(form)
+
+
+def _place_form(writer: PdfWriter, page, name: str, form_ref, x: float, y: float, under: bool):
+    """在頁面 (x, y) 畫出 Form XObject；under=True 時畫在原內容之下"""
+    resources = page.get("/Resources")
+    resources = DictionaryObject(resources.get_object()) if resources is not None else DictionaryObject()
+    xobjects = resources.get("/XObject")
+    xobjects = DictionaryObject(xobjects.get_object()) if xobjects is not None else DictionaryObject()
+    xobjects[NameObject(name)] = form_ref
+    resources[NameObject("/XObject")] = xobjects
+    page[NameObject("/Resources")] = resources
+
+    draw = DecodedStreamObject()
+    draw.set_data(f"q 1 0 0 1 {x:.4f} {y:.4f} cm {name} Do Q\n".encode("ascii"))
+    draw_ref = writer._add_object(draw)
+
+    contents = page.get("/Contents")
+    if contents is None:
+        parts = []
+    elif isinstance(contents.get_object(), ArrayObject):
+        parts = list(contents.get_object())
+    else:
+        parts = [contents]
+
+    if under:
+        page[NameObject("/Contents")] = ArrayObject([draw_ref, *parts])
+    else:
+        # 原內容以 q / Q 包住，避免其繪圖狀態影響範本位置
+        q, big_q = DecodedStreamObject(), DecodedStreamObject()
+        q.set_data(b"q\n")
+        big_q.set_data(b"Q\n")
+        page[NameObject("/Contents")] = ArrayObject(
+            [writer._add_object(q), *parts, writer._add_object(big_q), draw_ref]
+        )
+
+
 def parse_compile_date(text: str):
     m = re.search(r"(\d{3})年(\d{1,2})月", text)
     if not m:
@@ -53,28 +295,33 @@ def parse_compile_date(text: str):
 
 
 def draw_toc_header(c):
-    c.setFont("msjh", 18)
+    c.setFont(FONT, 18)
     c.setFillColor(BLACK)
     c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 60, "臺 北 市 衛 生 統 計 摘 要 速 報")
-    c.setFont("msjh", 22)
+    c.setFont(FONT, 22)
     c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 100, "目　次")
 
 
 def generate_toc_pdf(output_pdf, toc_items, compile_date_text):
     top_year_month, bottom_text = parse_compile_date(compile_date_text)
-    c = canvas.Canvas(str(output_pdf), pagesize=A4)
+    ensure_fonts()
+    template_pdf, template = load_template()
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    # (頁 index, 範本頁 index, x, y, 是否畫在文字下層)
+    placements = []
 
     # =========================
-    # 封面
+    # 封面（圖片由範本提供）
     # =========================
-    if COVER_IMAGE.exists():
-        img = ImageReader(str(COVER_IMAGE))
-        c.drawImage(img, 0, 0, PAGE_WIDTH, PAGE_HEIGHT, preserveAspectRatio=True, anchor="c")
+    if template["cover"] is not None:
+        placements.append((0, template["cover"], 0, 0, True))
 
     # 參考主標題左緣
     main_title = "衛生統計摘要速報"
     main_title_font_size = 36
-    main_title_width = c.stringWidth(main_title, "msjh", main_title_font_size)
+    main_title_width = c.stringWidth(main_title, FONT, main_title_font_size)
     main_title_left_x = PAGE_WIDTH / 2 - main_title_width / 2
 
     # 🔧【副標：左移 + 放大 + 粗體】
@@ -82,20 +329,20 @@ def generate_toc_pdf(output_pdf, toc_items, compile_date_text):
     subtitle_x = main_title_left_x - 45   # 再往左移
     subtitle_y = PAGE_HEIGHT - 180
 
-    c.setFont("msjh-bold", subtitle_font_size)
+    c.setFont(FONT_BOLD, subtitle_font_size)
     c.setFillColor(BLACK)
     c.drawString(subtitle_x, subtitle_y, top_year_month)
 
     c.setFillColor(GREEN)
     c.drawString(
-        subtitle_x + c.stringWidth(top_year_month + " ", "msjh-bold", subtitle_font_size),
+        subtitle_x + c.stringWidth(top_year_month + " ", FONT_BOLD, subtitle_font_size),
         subtitle_y,
         "臺北市"
     )
 
     # 🔧【右下角：放大 + 粗體】
     footer_font_size = 17  # 原 12 + 5
-    c.setFont("msjh-bold", footer_font_size)
+    c.setFont(FONT_BOLD, footer_font_size)
     c.setFillColor(GREEN)
     c.drawRightString(PAGE_WIDTH - 40, 75, "臺北市政府衛生局")
     c.drawRightString(PAGE_WIDTH - 40, 50, bottom_text)
@@ -107,16 +354,16 @@ def generate_toc_pdf(output_pdf, toc_items, compile_date_text):
     # 目錄
     # =========================
     draw_toc_header(c)
-    c.setFont("msjh", 12)
+    c.setFont(FONT, 12)
 
     y = PAGE_HEIGHT - 150
     for item in toc_items:
         left_text = f"{item['index']}. {item['title']}"
         c.drawString(LEFT_MARGIN, y, left_text)
 
-        text_width = c.stringWidth(left_text, "msjh", 12)
+        text_width = c.stringWidth(left_text, FONT, 12)
         dot_start_x = LEFT_MARGIN + text_width + 8
-        dots = "." * int((DOT_END_X - dot_start_x) / c.stringWidth(".", "msjh", 12))
+        dots = "." * int((DOT_END_X - dot_start_x) / c.stringWidth(".", FONT, 12))
 
         c.drawString(dot_start_x, y, dots)
         c.drawRightString(PAGE_NO_X, y, str(item["page"]))
@@ -125,22 +372,41 @@ def generate_toc_pdf(output_pdf, toc_items, compile_date_text):
         if y < BOTTOM_MARGIN + 40:
             c.showPage()
             draw_toc_header(c)
-            c.setFont("msjh", 12)
+            c.setFont(FONT, 12)
             y = PAGE_HEIGHT - 150
 
-    # additionalinfo.png
-    if INFO_IMAGE.exists():
-        img = ImageReader(str(INFO_IMAGE))
-        iw, ih = img.getSize()
-        img_w = PAGE_WIDTH - 2 * LEFT_MARGIN
-        img_h = ih * (img_w / iw)
+    # additionalinfo.png（由範本提供，這裡只決定位置）
+    if template["info"] is not None:
+        img_w, img_h = template["info_size"]
 
         if y - img_h < BOTTOM_MARGIN:
             c.showPage()
             draw_toc_header(c)
             y = PAGE_HEIGHT - 150
 
-        c.drawImage(img, LEFT_MARGIN, y - img_h, img_w, img_h, mask="auto")
+        placements.append((c.getPageNumber() - 1, template["info"], LEFT_MARGIN, y - img_h, False))
 
     c.showPage()
     c.save()
+
+    # =========================
+    # 疊上範本
+    # =========================
+    buf.seek(0)
+    writer = PdfWriter()
+    for page in PdfReader(buf).pages:
+        writer.add_page(page)
+
+    tpl_reader = PdfReader(str(template_pdf))
+    forms = {}
+    for page_index, tpl_index, x, y, under in placements:
+        if tpl_index not in forms:
+            forms[tpl_index] = _template_form(writer, tpl_reader.pages[tpl_index])
+        _place_form(writer, writer.pages[page_index], f"/Tpl{tpl_index}", forms[tpl_index], x, y, under)
+
+    # output_pdf 可為路徑或可寫入的緩衝區（記憶體內交接）
+    if hasattr(output_pdf, "write"):
+        writer.write(output_pdf)
+        return
+    with open(output_pdf, "wb") as f:
+        writer.write(f)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+直接從 .xlsx（zip）讀取各工作表標題，不經過 Excel COM
+- 規則同 get_title_from_first_row：第一列由左到右（最多 80 欄），
+  第一個非空白值經 clean_title 後做為標題；數值的格式同 COM（見 title_from_xlsx_values）
+- 以 iterparse 逐步讀取 xl/worksheets/sheetN.xml，讀完第一列就停止
+- sharedStrings.xml 只讀到需要的最大索引為止
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from export_backends import title_from_xlsx_values
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _col_index(ref: str) -> int:
+    """'AB1' → 28"""
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - 64)
+    return n
+
+
+def _sheet_parts(zf: zipfile.ZipFile):
+    """依活頁簿順序回傳 [(工作表名稱, zip 內路徑), ...]"""
+    rels = {}
+    with zf.open("xl/_rels/workbook.xml.rels") as f:
+        for rel in ET.parse(f).getroot().iter(f"{_NS_PKG_REL}Relationship"):
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                path = target.lstrip("/")
+            else:
+                path = posixpath.normpath(posixpath.join("xl", target))
+            rels[rel.get("Id")] = path
+
+    parts = []
+    with zf.open("xl/workbook.xml") as f:
+        for sheet in ET.parse(f).getroot().iter(f"{_NS_MAIN}sheet"):
+            parts.append((sheet.get("name"), rels.get(sheet.get(f"{_NS_REL}id"))))
+    return parts
+
+
+def _text_of(elem) -> str:
+    """<si> / <is>：串接所有 <t>（略過注音 <rPh>）"""
+    out = []
+    for child in elem:
+        if child.tag == f"{_NS_MAIN}t":
+            out.append(child.text or "")
+        elif child.tag == f"{_NS_MAIN}r":
+            t = child.find(f"{_NS_MAIN}t")
+            if t is not None:
+                out.append(t.text or "")
+    return "".join(out)
+
+
+def _first_row_cells(zf: zipfile.ZipFile, part: str, max_cols: int):
+    """
+    讀取第一列的儲存格，讀完第一列（或遇到後面的列）就停止
+    回傳：[(型別, 原始值), ...]，型別為 "s"（共用字串索引）或 "v"（已是值：
+          字串、bool 或數值，與 openpyxl 讀到的型別相同）
+    """
+    cells = []
+    with zf.open(part) as f:
+        in_row1 = False
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{_NS_MAIN}row":
+                    r = elem.get("r")
+                    if r is not None and int(r) != 1:
+                        break
+                    in_row1 = True
+                continue
+
+            if tag == f"{_NS_MAIN}c" and in_row1:
+                ref = elem.get("r")
+                if ref is not None and _col_index(ref) > max_cols:
+                    elem.clear()
+                    continue
+                t = elem.get("t", "n")
+                v = elem.find(f"{_NS_MAIN}v")
+                if t == "s" and v is not None:
+                    cells.append(("s", int(v.text)))
+                elif t == "inlineStr":
+                    is_ = elem.find(f"{_NS_MAIN}is")
+                    cells.append(("v", _text_of(is_) if is_ is not None else ""))
+                elif t == "str" and v is not None:
+                    cells.append(("v", v.text or ""))
+                elif t == "b" and v is not None:
+                    cells.append(("v", v.text == "1"))
+                elif t == "n" and v is not None:
+                    cells.append(("v", float(v.text)))
+                # t="e"（錯誤值）視為空白
+                elem.clear()
+            elif tag == f"{_NS_MAIN}row":
+                break
+            elif tag == f"{_NS_MAIN}sheetData":
+                break
+    return cells
+
+
+def _shared_strings(zf: zipfile.ZipFile, needed: set):
+    """只讀到需要的最大索引為止"""
+    if not needed or "xl/sharedStrings.xml" not in zf.namelist():
+        return {}
+    last = max(needed)
+    strings = {}
+    idx = 0
+    with zf.open("xl/sharedStrings.xml") as f:
+        for event, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag != f"{_NS_MAIN}si":
+                continue
+            if idx in needed:
+                strings[idx] = _text_of(elem)
+            elem.clear()
+            if idx >= last:
+                break
+            idx += 1
+    return strings
+
+
+def read_sheet_titles(xlsx_path, max_cols: int = 80) -> dict:
+    """
+    回傳 {工作表名稱: 標題}，依活頁簿順序；找不到標題的工作表為空字串
+    """
+    with zipfile.ZipFile(str(Path(xlsx_path))) as zf:
+        rows = []
+        needed = set()
+        for name, part in _sheet_parts(zf):
+            cells = _first_row_cells(zf, part, max_cols) if part in zf.namelist() else []
+            needed.update(raw for kind, raw in cells if kind == "s")
+            rows.append((name, cells))
+
+        strings = _shared_strings(zf, needed)
+
+    return {
+        name: title_from_xlsx_values(
+            strings.get(raw) if kind == "s" else raw for kind, raw in cells
+        )
+        for name, cells in rows
+    }